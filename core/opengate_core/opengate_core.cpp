@@ -216,6 +216,8 @@ void init_GateKineticEnergyFilter(py::module &);
 
 void init_GateDoseActor(py::module &m);
 
+void init_GateTLEDoseActor(py::module &m);
+
 void init_GateLETActor(py::module &m);
 
 void init_GateARFActor(py::module &m);
@@ -266,10 +268,20 @@ void init_GateDigitizerEnergyWindowsActor(py::module &m);
 
 void init_GateDigitizerProjectionActor(py::module &m);
 
+void init_GateDigitizerChainActor(py::module &m);
+
+void init_GateDigitizerCoincidenceSorterActor(py::module &m);
+
+void init_GateDigitizerDeadTimeActor(py::module &m);
+
+void init_GateDigitizerPileupActor(py::module &m);
+
 void init_GateDigiAttributeManager(py::module &m);
 
 void init_GateVDigiAttribute(py::module &m);
 
+void init_GateDigiCollection(py::module &m);
+
 void init_GateVSource(py::module &);
 
 void init_GateExceptionHandler(py::module &);
@@ -398,6 +410,7 @@ PYBIND11_MODULE(opengate_core, m) {
   init_GateKineticEnergyFilter(m);
   init_itk_image(m);
   init_GateDoseActor(m);
+  init_GateTLEDoseActor(m);
   init_GateLETActor(m);
   init_GateImageNestedParameterisation(m);
   init_GateRepeatParameterisation(m);
@@ -423,10 +436,15 @@ PYBIND11_MODULE(opengate_core, m) {
   init_GateDigitizerSpatialBlurringActor(m);
   init_GateDigitizerEnergyWindowsActor(m);
   init_GateDigitizerProjectionActor(m);
+  init_GateDigitizerChainActor(m);
+  init_GateDigitizerCoincidenceSorterActor(m);
+  init_GateDigitizerDeadTimeActor(m);
+  init_GateDigitizerPileupActor(m);
   init_GateARFActor(m);
   init_GateARFTrainingDatasetActor(m);
   init_GateDigiAttributeManager(m);
   init_GateVDigiAttribute(m);
+  init_GateDigiCollection(m);
   init_GateExceptionHandler(m);
   init_GateNTuple(m);
   init_GateHelpers(m);
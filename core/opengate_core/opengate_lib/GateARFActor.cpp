@@ -6,51 +6,145 @@
    ------------------------------------ -------------- */
 
 #include "GateARFActor.h"
+#include "G4AutoLock.hh"
 #include "G4RunManager.hh"
 #include "GateHelpers.h"
 #include "GateHelpersDict.h"
 
-GateARFActor::GateARFActor(py::dict &user_info) : GateVActor(user_info, false) {
+GateARFActor::GateARFActor(py::dict &user_info) : GateVActor(user_info, true) {
   fActions.insert("SteppingAction");
+  fActions.insert("BeginOfRunAction");
+  fActions.insert("EndOfRunAction");
   // Option: batch size
   fBatchSize = DictGetInt(user_info, "batch_size");
   fCurrentNumberOfHits = 0;
   fCurrentRunId = 0;
+  fMaxQueuedBatches = 2;
+  fStop = false;
+}
+
+GateARFActor::~GateARFActor() {
+  // (should already be stopped at the end of the simulation)
+  {
+    G4AutoLock lock(&fMutex);
+    fStop = true;
+  }
+  fQueueCondition.notify_one();
+  if (fThread.joinable())
+    fThread.join();
 }
 
 void GateARFActor::SetARFFunction(ARFFunctionType &f) { fApply = f; }
 
+void GateARFActor::StartSimulationAction() {
+  fStop = false;
+  fThread = std::thread(&GateARFActor::Loop, this);
+}
+
+void GateARFActor::EndSimulationAction() {
+  // the remaining batches are processed before the inference thread ends
+  {
+    G4AutoLock lock(&fMutex);
+    fStop = true;
+  }
+  fQueueCondition.notify_one();
+  if (fThread.joinable())
+    fThread.join();
+}
+
+void GateARFActor::BeginOfRunAction(const G4Run *run) {
+  auto &l = fThreadLocalData.Get();
+  l.fBatch.fRunId = run->GetRunID();
+}
+
+void GateARFActor::EndOfRunAction(const G4Run * /*run*/) {
+  // the last (incomplete) batch of the run
+  PushBatch(fThreadLocalData.Get().fBatch);
+}
+
 void GateARFActor::SteppingAction(G4Step *step) {
-  fCurrentNumberOfHits++;
+  auto &batch = fThreadLocalData.Get().fBatch;
 
   // get energy
   auto *pre = step->GetPreStepPoint();
-  fEnergy.push_back(pre->GetKineticEnergy());
+  batch.fEnergy.push_back(pre->GetKineticEnergy());
 
   // get position and transform to local
   auto pos =
       pre->GetTouchable()->GetHistory()->GetTopTransform().TransformPoint(
           pre->GetPosition());
-  fPositionX.push_back(pos[0]);
-  fPositionY.push_back(pos[1]);
+  batch.fPositionX.push_back(pos[0]);
+  batch.fPositionY.push_back(pos[1]);
 
   // get direction and transform to local
   auto dir = pre->GetMomentumDirection();
   dir = pre->GetTouchable()->GetHistory()->GetTopTransform().TransformAxis(dir);
-  fDirectionX.push_back(dir[0]);
-  fDirectionY.push_back(dir[1]);
-
-  // trigger the "apply" if the number of batch is reached or when a run is
-  // finished
-  auto rid = G4RunManager::GetRunManager()->GetCurrentRun()->GetRunID();
-  if (fCurrentNumberOfHits >= fBatchSize or rid != fCurrentRunId) {
-    fApply(this);
+  batch.fDirectionX.push_back(dir[0]);
+  batch.fDirectionY.push_back(dir[1]);
+
+  // give the batch to the inference thread when the batch size is reached
+  if ((int)batch.fEnergy.size() >= fBatchSize)
+    PushBatch(batch);
+}
+
+void GateARFActor::PushBatch(BatchType &batch) {
+  if (batch.fEnergy.empty())
+    return;
+  BatchType job;
+  job.fRunId = batch.fRunId;
+  // O(1): the thread keeps empty vectors, the job gets the values
+  job.fEnergy.swap(batch.fEnergy);
+  job.fPositionX.swap(batch.fPositionX);
+  job.fPositionY.swap(batch.fPositionY);
+  job.fDirectionX.swap(batch.fDirectionX);
+  job.fDirectionY.swap(batch.fDirectionY);
+  {
+    // wait if the inference thread is too late, to bound the memory
+    G4AutoLock lock(&fMutex);
+    fSpaceCondition.wait(
+        lock, [this] { return (int)fQueue.size() < fMaxQueuedBatches; });
+    fQueue.push_back(std::move(job));
+  }
+  fQueueCondition.notify_one();
+}
+
+void GateARFActor::Loop() {
+  G4AutoLock lock(&fMutex);
+  while (true) {
+    fQueueCondition.wait(lock, [this] { return fStop || !fQueue.empty(); });
+    if (fQueue.empty())
+      return;
+    // merge all queued batches of the same run
+    auto run_id = fQueue.front().fRunId;
     fEnergy.clear();
     fPositionX.clear();
     fPositionY.clear();
     fDirectionX.clear();
     fDirectionY.clear();
-    fCurrentNumberOfHits = 0;
-    fCurrentRunId = rid;
+    auto insert = [](std::vector<double> &v, const std::vector<double> &b) {
+      v.insert(v.end(), b.begin(), b.end());
+    };
+    while (!fQueue.empty() && fQueue.front().fRunId == run_id) {
+      const auto &b = fQueue.front();
+      insert(fEnergy, b.fEnergy);
+      insert(fPositionX, b.fPositionX);
+      insert(fPositionY, b.fPositionY);
+      insert(fDirectionX, b.fDirectionX);
+      insert(fDirectionY, b.fDirectionY);
+      fQueue.pop_front();
+    }
+    fSpaceCondition.notify_all();
+    // the threads continue the simulation while the batch is processed
+    lock.unlock();
+    Apply(run_id);
+    lock.lock();
   }
 }
+
+void GateARFActor::Apply(int run_id) {
+  fCurrentRunId = run_id;
+  fCurrentNumberOfHits = (int)fEnergy.size();
+  // (the GIL is acquired by the python function)
+  fApply(this);
+  fCurrentNumberOfHits = 0;
+}
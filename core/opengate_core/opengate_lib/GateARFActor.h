@@ -8,13 +8,26 @@
 #ifndef GateARFActor_h
 #define GateARFActor_h
 
+#include "G4Cache.hh"
+#include "G4Threading.hh"
 #include "GateHelpers.h"
 #include "GateVActor.h"
+#include <deque>
 #include <pybind11/stl.h>
+#include <thread>
 
 namespace py = pybind11;
 
 class GateARFActor : public GateVActor {
+  /*
+   The particles entering the detector are stored in thread local batches.
+   When a batch is full (or at the end of a run), it is pushed to a shared
+   queue and the thread continues the simulation.
+   A dedicated inference thread merges the queued batches of all threads
+   (of the same run) and calls the user "apply" function (python) on them.
+   The values of the merged batch are in the public vectors below, they are
+   only used by the inference thread.
+   */
 
 public:
   // Callback function
@@ -23,6 +36,21 @@ public:
   // Constructor
   explicit GateARFActor(py::dict &user_info);
 
+  ~GateARFActor() override;
+
+  // Called when the simulation start (master thread only)
+  void StartSimulationAction() override;
+
+  // Called when the simulation end (master thread only)
+  // Wait for all batches to be processed
+  void EndSimulationAction() override;
+
+  // Called every time a Run starts (all threads)
+  void BeginOfRunAction(const G4Run *run) override;
+
+  // Called every time a Run ends (all threads)
+  void EndOfRunAction(const G4Run *run) override;
+
   // Main function called every step in attached volume
   void SteppingAction(G4Step *) override;
 
@@ -39,10 +67,46 @@ public:
   // number of particle hitting the detector
   int fCurrentNumberOfHits;
 
+  // run of the batch given to the apply function
+  int fCurrentRunId;
+
+  // max number of batches waiting for the inference thread
+  int fMaxQueuedBatches;
+
 protected:
+  struct BatchType {
+    int fRunId = 0;
+    std::vector<double> fEnergy;
+    std::vector<double> fPositionX;
+    std::vector<double> fPositionY;
+    std::vector<double> fDirectionX;
+    std::vector<double> fDirectionY;
+  };
+
+  // Move the batch of the current thread to the inference queue
+  void PushBatch(BatchType &batch);
+
+  // Inference thread: merge the queued batches and apply
+  void Loop();
+
+  void Apply(int run_id);
+
   int fBatchSize;
-  int fCurrentRunId;
   ARFFunctionType fApply;
+
+  // inference thread and shared queue
+  std::thread fThread;
+  G4Mutex fMutex;
+  G4Condition fQueueCondition;
+  G4Condition fSpaceCondition;
+  std::deque<BatchType> fQueue;
+  bool fStop;
+
+  // During computation (thread local)
+  struct threadLocalT {
+    BatchType fBatch;
+  };
+  G4Cache<threadLocalT> fThreadLocalData;
 };
 
 #endif // GateARFActor_h
@@ -7,15 +7,20 @@
 
 #include "GateDoseActor.h"
 #include "G4Navigator.hh"
+#include "G4PhysicalVolumeStore.hh"
 #include "G4RandomTools.hh"
 #include "G4RunManager.hh"
 #include "GateHelpers.h"
 #include "GateHelpersDict.h"
 #include "GateHelpersImage.h"
+#include "itkImageFileWriter.h"
+#include <algorithm>
 
 // Mutex that will be used by thread to write in the edep/dose image
 G4Mutex SetPixelMutex = G4MUTEX_INITIALIZER;
 
+using namespace pybind11::literals;
+
 GateDoseActor::GateDoseActor(py::dict &user_info)
     : GateVActor(user_info, true) {
   // Create the image pointer
@@ -24,26 +29,71 @@ GateDoseActor::GateDoseActor(py::dict &user_info)
   // Action for this actor: during stepping
   fActions.insert("SteppingAction");
   fActions.insert("BeginOfRunAction");
+  fActions.insert("EndOfSimulationWorkerAction");
   fActions.insert("EndSimulationAction");
   // Option: compute uncertainty
   fUncertaintyFlag = DictGetBool(user_info, "uncertainty");
-  // Option: compute dose in Gray
-  fGrayFlag = DictGetBool(user_info, "gray");
+  fUncertaintyMethod = UncertaintyImage;
+  if (fUncertaintyFlag) {
+    auto method = DictGetStr(user_info, "uncertainty_method");
+    if (method == "event") {
+      fUncertaintyMethod = UncertaintyEventBuffer;
+      fActions.insert("EndOfEventAction");
+    } else if (method == "batch") {
+      fUncertaintyMethod = UncertaintyBatch;
+      fNumberOfBatches = DictGetInt(user_info, "number_of_batches");
+      fActions.insert("BeginOfEventAction");
+    } else if (method != "image") {
+      Fatal("Unknown uncertainty method '" + method +
+            "' for the actor: " + GetName());
+    }
+  }
+  // Option: compute dose in Gray (at each step, otherwise it is computed
+  // at the end from the edep and a density map, on the py side)
+  fGrayFlag = DictGetBool(user_info, "gray") and
+              DictGetStr(user_info, "gray_method") == "step";
   // translation
   fInitialTranslation = DictGetG4ThreeVector(user_info, "translation");
   // Hit type (random, pre, post etc)
-  fHitType = DictGetStr(user_info, "hit_type");
+  fHitType = StrToHitType(DictGetStr(user_info, "hit_type"));
+  // Option: voxel index from the replica numbers (grid of an ImageVolume)
+  fReplicaIndexFlag = DictGetBool(user_info, "replica_index");
+  // Option: thread local buffers, possibly shared by groups of threads
+  fThreadLocalBuffersFlag = DictGetBool(user_info, "thread_local_buffers");
+  fThreadsPerBuffer = DictGetInt(user_info, "threads_per_buffer");
+  // Option: one output image per run
+  fOutputPerRunFlag = DictGetBool(user_info, "output_per_run");
+  // Option: sparse scoring (always in thread local maps)
+  fSparseFlag = DictGetBool(user_info, "sparse");
+  if (fSparseFlag) {
+    fThreadLocalBuffersFlag = false;
+    // the edep per event is always stored in the event buffer
+    if (fUncertaintyFlag)
+      fActions.insert("EndOfEventAction");
+  }
 }
 
 void GateDoseActor::ActorInitialize() {
-  if (fUncertaintyFlag) {
+  if (fUncertaintyFlag and fUncertaintyMethod != UncertaintyBatch) {
     cpp_square_image = ImageType::New();
+  }
+  if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyImage) {
     cpp_temp_image = ImageType::New();
     cpp_last_id_image = ImageType::New();
   }
+  if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyBatch) {
+    cpp_batch_images.clear();
+    for (auto i = 0; i < fNumberOfBatches; i++)
+      cpp_batch_images.push_back(ImageType::New());
+  }
   if (fGrayFlag) {
     cpp_dose_image = ImageType::New();
   }
+  if (fOutputPerRunFlag) {
+    cpp_total_edep_image = ImageType::New();
+    if (fGrayFlag)
+      cpp_total_dose_image = ImageType::New();
+  }
 }
 
 void GateDoseActor::BeginOfRunAction(const G4Run *) {
@@ -53,81 +103,389 @@ void GateDoseActor::BeginOfRunAction(const G4Run *) {
   // compute volume of a dose voxel
   auto sp = cpp_edep_image->GetSpacing();
   fVoxelVolume = sp[0] * sp[1] * sp[2];
+  // precompute the point to index transform of this run
+  auto &l = fThreadLocalData.Get();
+  l.fIndexer.Update(cpp_edep_image);
+  if (fReplicaIndexFlag)
+    l.fImageVolume = G4PhysicalVolumeStore::GetInstance()->GetVolume(
+        fPhysicalVolumeName, false);
+  // Allocate (or retrieve) the buffers of this thread
+  if (fThreadLocalBuffersFlag)
+    InitializeThreadLocalBuffer();
+}
+
+void GateDoseActor::InitializeThreadLocalBuffer() {
+  auto &l = fThreadLocalData.Get();
+  if (l.fBuffer != nullptr)
+    return;
+  // Threads are grouped, each group shares the same buffers
+  auto thread_id = std::max(0, G4Threading::G4GetThreadId());
+  auto group = thread_id / fThreadsPerBuffer;
+  G4AutoLock mutex(&SetPixelMutex);
+  auto &buffer = fAccumulationBuffers[group];
+  if (buffer == nullptr) {
+    auto n = cpp_edep_image->GetLargestPossibleRegion().GetNumberOfPixels();
+    buffer = std::make_unique<AccumulationBuffer>();
+    if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyBatch) {
+      // one edep per batch
+      buffer->fEdep.resize(n * fNumberOfBatches, 0.0);
+    } else
+      buffer->fEdep.resize(n, 0.0);
+    if (fUncertaintyFlag and fUncertaintyMethod != UncertaintyBatch)
+      buffer->fSquare.resize(n, 0.0);
+    if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyImage) {
+      buffer->fTemp.resize(n, 0.0);
+      buffer->fLastId.resize(n, -1);
+    }
+    if (fGrayFlag)
+      buffer->fDose.resize(n, 0.0);
+  }
+  buffer->fNumberOfThreads++;
+  l.fBuffer = buffer.get();
 }
 
 void GateDoseActor::SteppingAction(G4Step *step) {
-  auto preGlobal = step->GetPreStepPoint()->GetPosition();
-  auto postGlobal = step->GetPostStepPoint()->GetPosition();
+  auto &l = fThreadLocalData.Get();
   auto touchable = step->GetPreStepPoint()->GetTouchable();
 
   // FIXME If the volume has multiple copy, touchable->GetCopyNumber(0) ?
 
-  // consider random position between pre and post
-  auto position = postGlobal;
-  if (fHitType == "pre") {
-    position = preGlobal;
-  }
-  if (fHitType == "random") {
-    auto x = G4UniformRand();
-    auto direction = postGlobal - preGlobal;
-    position = preGlobal + x * direction;
-  }
-  if (fHitType == "middle") {
-    auto direction = postGlobal - preGlobal;
-    position = preGlobal + 0.5 * direction;
-  }
-  auto localPosition =
-      touchable->GetHistory()->GetTransform(0).TransformPoint(position);
-
-  // convert G4ThreeVector to itk PointType
-  ImageType::PointType point;
-  point[0] = localPosition[0];
-  point[1] = localPosition[1];
-  point[2] = localPosition[2];
-
   // get edep in MeV (take weight into account)
   auto w = step->GetTrack()->GetWeight();
   auto edep = step->GetTotalEnergyDeposit() / CLHEP::MeV * w;
 
   // get pixel index
   ImageType::IndexType index;
-  bool isInside = cpp_edep_image->TransformPhysicalPointToIndex(point, index);
+  bool isInside;
+  if (fReplicaIndexFlag and touchable->GetHistoryDepth() >= 3 and
+      touchable->GetVolume(3) == l.fImageVolume) {
+    // The step is in a voxel of the ImageVolume (same grid as the image):
+    // replica numbers of the Y and X slices, then the Z voxel
+    index[0] = touchable->GetReplicaNumber(1);
+    index[1] = touchable->GetReplicaNumber(2);
+    index[2] = touchable->GetReplicaNumber(0);
+    isInside = true;
+  } else {
+    // consider random position between pre and post
+    auto position = GetHitPosition(step, fHitType);
+    auto localPosition =
+        touchable->GetHistory()->GetTransform(0).TransformPoint(position);
+    isInside = l.fIndexer.TransformPointToIndex(localPosition, index);
+  }
 
   // set value
   if (isInside) {
-    // With mutex (thread)
-    G4AutoLock mutex(&SetPixelMutex);
-
-    // If uncertainty: consider edep per event
-    if (fUncertaintyFlag) {
-      auto event_id =
-          G4RunManager::GetRunManager()->GetCurrentEvent()->GetEventID();
-      auto previous_id = cpp_last_id_image->GetPixel(index);
-      cpp_last_id_image->SetPixel(index, event_id);
-      if (event_id == previous_id) {
-        // Same event : continue temporary edep
-        ImageAddValue<ImageType>(cpp_temp_image, index, edep);
-      } else {
-        // Different event : update previous and start new event
-        auto e = cpp_temp_image->GetPixel(index);
-        ImageAddValue<ImageType>(cpp_edep_image, index, e);
-        ImageAddValue<ImageType>(cpp_square_image, index, e * e);
-        // new temp value
-        cpp_temp_image->SetPixel(index, edep);
-      }
-    } else {
-      ImageAddValue<ImageType>(cpp_edep_image, index, edep);
-    }
-
     // Compute the dose in Gray ?
+    double dose = 0;
     if (fGrayFlag) {
       auto *current_material = step->GetPreStepPoint()->GetMaterial();
       auto density = current_material->GetDensity();
-      auto dose = edep / density / fVoxelVolume / CLHEP::gray;
-      ImageAddValue<ImageType>(cpp_dose_image, index, dose);
+      dose = edep / density / fVoxelVolume / CLHEP::gray;
     }
 
+    AddValues(l, index, edep, dose);
   } // else : outside the image
 }
 
-void GateDoseActor::EndSimulationAction() {}
+void GateDoseActor::AddValues(threadLocalT &l,
+                              const ImageType::IndexType &index, double edep,
+                              double dose) {
+  // Sparse scoring: no lock, thread local map of the touched voxels
+  if (fSparseFlag) {
+    auto offset = cpp_edep_image->ComputeOffset(index);
+    if (fUncertaintyFlag)
+      l.fEventEdep[offset] += edep;
+    else
+      l.fSparseVoxels[offset].fEdep += edep;
+    if (fGrayFlag)
+      l.fSparseVoxels[offset].fDose += dose;
+    return;
+  }
+
+  // Uncertainty with event buffer: edep is stored until the end of the event
+  if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyEventBuffer) {
+    auto offset = cpp_edep_image->ComputeOffset(index);
+    l.fEventEdep[offset] += edep;
+    if (not fGrayFlag)
+      return;
+    // only the dose remains to be stored
+    edep = 0;
+  }
+
+  // Thread local buffers: only lock when the buffer is shared
+  if (fThreadLocalBuffersFlag) {
+    auto *buffer = l.fBuffer;
+    auto offset = cpp_edep_image->ComputeOffset(index);
+    G4AutoLock mutex(&buffer->fMutex, std::defer_lock);
+    if (fThreadsPerBuffer > 1)
+      mutex.lock();
+    AddValuesToBuffer(buffer, offset, edep, dose);
+    return;
+  }
+
+  // Uncertainty with batches: edep is stored in the image of the batch
+  if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyBatch) {
+    auto batch = l.fCurrentBatch;
+    G4AutoLock mutex(&SetPixelMutex);
+    ImageAddValue<ImageType>(cpp_batch_images[batch], index, edep);
+    if (fGrayFlag)
+      ImageAddValue<ImageType>(cpp_dose_image, index, dose);
+    return;
+  }
+
+  // With mutex (thread)
+  G4AutoLock mutex(&SetPixelMutex);
+
+  // If uncertainty: consider edep per event
+  if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyImage) {
+    auto event_id =
+        G4RunManager::GetRunManager()->GetCurrentEvent()->GetEventID();
+    auto previous_id = cpp_last_id_image->GetPixel(index);
+    cpp_last_id_image->SetPixel(index, event_id);
+    if (event_id == previous_id) {
+      // Same event : continue temporary edep
+      ImageAddValue<ImageType>(cpp_temp_image, index, edep);
+    } else {
+      // Different event : update previous and start new event
+      auto e = cpp_temp_image->GetPixel(index);
+      ImageAddValue<ImageType>(cpp_edep_image, index, e);
+      ImageAddValue<ImageType>(cpp_square_image, index, e * e);
+      // new temp value
+      cpp_temp_image->SetPixel(index, edep);
+    }
+  } else {
+    ImageAddValue<ImageType>(cpp_edep_image, index, edep);
+  }
+
+  // Store the dose in Gray
+  if (fGrayFlag) {
+    ImageAddValue<ImageType>(cpp_dose_image, index, dose);
+  }
+}
+
+void GateDoseActor::AddValuesToBuffer(AccumulationBuffer *buffer, size_t offset,
+                                      double edep, double dose) const {
+  // Same logic than with the images, but without global lock
+  if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyImage) {
+    auto event_id =
+        G4RunManager::GetRunManager()->GetCurrentEvent()->GetEventID();
+    if (buffer->fLastId[offset] == event_id) {
+      buffer->fTemp[offset] += edep;
+    } else {
+      auto e = buffer->fTemp[offset];
+      buffer->fEdep[offset] += e;
+      buffer->fSquare[offset] += e * e;
+      buffer->fTemp[offset] = edep;
+      buffer->fLastId[offset] = event_id;
+    }
+  } else if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyBatch) {
+    auto n = buffer->fEdep.size() / fNumberOfBatches;
+    auto batch = fThreadLocalData.Get().fCurrentBatch;
+    buffer->fEdep[batch * n + offset] += edep;
+  } else {
+    buffer->fEdep[offset] += edep;
+  }
+  if (fGrayFlag)
+    buffer->fDose[offset] += dose;
+}
+
+void GateDoseActor::BeginOfEventAction(const G4Event *event) {
+  // Events are dispatched in the batches according to their id
+  auto &l = fThreadLocalData.Get();
+  l.fCurrentBatch = event->GetEventID() % fNumberOfBatches;
+}
+
+void GateDoseActor::EndOfEventAction(const G4Event * /*event*/) {
+  // Fold the edep of the event into edep and squared edep
+  auto &l = fThreadLocalData.Get();
+  if (l.fEventEdep.empty())
+    return;
+  if (fSparseFlag) {
+    for (const auto &v : l.fEventEdep) {
+      auto &voxel = l.fSparseVoxels[v.first];
+      voxel.fEdep += v.second;
+      voxel.fSquare += v.second * v.second;
+    }
+  } else if (fThreadLocalBuffersFlag) {
+    auto *buffer = l.fBuffer;
+    G4AutoLock mutex(&buffer->fMutex, std::defer_lock);
+    if (fThreadsPerBuffer > 1)
+      mutex.lock();
+    for (const auto &v : l.fEventEdep) {
+      buffer->fEdep[v.first] += v.second;
+      buffer->fSquare[v.first] += v.second * v.second;
+    }
+  } else {
+    G4AutoLock mutex(&SetPixelMutex);
+    auto *edep = cpp_edep_image->GetBufferPointer();
+    auto *square = cpp_square_image->GetBufferPointer();
+    for (const auto &v : l.fEventEdep) {
+      edep[v.first] += v.second;
+      square[v.first] += v.second * v.second;
+    }
+  }
+  l.fEventEdep.clear();
+}
+
+void GateDoseActor::EndOfSimulationWorkerAction(const G4Run * /*lastRun*/) {
+  auto &l = fThreadLocalData.Get();
+  if (fSparseFlag) {
+    // Merge the sparse values of this thread
+    G4AutoLock mutex(&SetPixelMutex);
+    for (const auto &v : l.fSparseVoxels) {
+      auto &voxel = fSparseVoxels[v.first];
+      voxel.fEdep += v.second.fEdep;
+      voxel.fSquare += v.second.fSquare;
+      voxel.fDose += v.second.fDose;
+    }
+    SparseVoxelsMapType().swap(l.fSparseVoxels);
+    return;
+  }
+  if (!fThreadLocalBuffersFlag)
+    return;
+  if (l.fBuffer == nullptr)
+    return;
+  // The last thread of the group merges the buffer into the images
+  G4AutoLock mutex(&SetPixelMutex);
+  l.fBuffer->fNumberOfThreads--;
+  if (l.fBuffer->fNumberOfThreads == 0) {
+    MergeBuffer(l.fBuffer);
+    for (auto it = fAccumulationBuffers.begin();
+         it != fAccumulationBuffers.end(); ++it) {
+      if (it->second.get() == l.fBuffer) {
+        fAccumulationBuffers.erase(it);
+        break;
+      }
+    }
+  }
+  l.fBuffer = nullptr;
+}
+
+void GateDoseActor::MergeBuffer(AccumulationBuffer *buffer) {
+  // (the mutex must be locked by the caller)
+  auto n = cpp_edep_image->GetLargestPossibleRegion().GetNumberOfPixels();
+  auto *edep = cpp_edep_image->GetBufferPointer();
+  if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyBatch) {
+    for (auto b = 0; b < fNumberOfBatches; b++) {
+      auto *batch = cpp_batch_images[b]->GetBufferPointer();
+      for (size_t i = 0; i < n; i++)
+        batch[i] += buffer->fEdep[b * n + i];
+    }
+  } else if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyImage) {
+    // All events are terminated: the temporary values are flushed
+    auto *square = cpp_square_image->GetBufferPointer();
+    for (size_t i = 0; i < n; i++) {
+      auto e = buffer->fTemp[i];
+      edep[i] += buffer->fEdep[i] + e;
+      square[i] += buffer->fSquare[i] + e * e;
+    }
+  } else if (fUncertaintyFlag) {
+    auto *square = cpp_square_image->GetBufferPointer();
+    for (size_t i = 0; i < n; i++) {
+      edep[i] += buffer->fEdep[i];
+      square[i] += buffer->fSquare[i];
+    }
+  } else {
+    for (size_t i = 0; i < n; i++)
+      edep[i] += buffer->fEdep[i];
+  }
+  if (fGrayFlag) {
+    auto *dose = cpp_dose_image->GetBufferPointer();
+    for (size_t i = 0; i < n; i++)
+      dose[i] += buffer->fDose[i];
+  }
+}
+
+py::dict GateDoseActor::GetSparseVoxels() const {
+  // sort the offsets, so that the output does not depend on the threads
+  std::vector<size_t> offsets;
+  offsets.reserve(fSparseVoxels.size());
+  for (const auto &v : fSparseVoxels)
+    offsets.push_back(v.first);
+  std::sort(offsets.begin(), offsets.end());
+  auto n = offsets.size();
+  py::array_t<int64_t> index(n);
+  py::array_t<double> edep(n);
+  py::array_t<double> square(n);
+  py::array_t<double> dose(n);
+  auto *index_ptr = index.mutable_data();
+  auto *edep_ptr = edep.mutable_data();
+  auto *square_ptr = square.mutable_data();
+  auto *dose_ptr = dose.mutable_data();
+  for (size_t i = 0; i < n; i++) {
+    const auto &voxel = fSparseVoxels.at(offsets[i]);
+    index_ptr[i] = offsets[i];
+    edep_ptr[i] = voxel.fEdep;
+    square_ptr[i] = voxel.fSquare;
+    dose_ptr[i] = voxel.fDose;
+  }
+  return py::dict("index"_a = index, "edep"_a = edep, "square"_a = square,
+                  "dose"_a = dose);
+}
+
+void GateDoseActor::EndOfRunMasterAction(int run_id) {
+  if (not fOutputPerRunFlag)
+    return;
+  // the values of the last events of the run are still in the temp image
+  if (fUncertaintyFlag and fUncertaintyMethod == UncertaintyImage)
+    FlushTemporaryImage();
+  WriteRunImage(cpp_edep_image, cpp_total_edep_image,
+                fRunEdepFilenames[run_id]);
+  if (fGrayFlag)
+    WriteRunImage(cpp_dose_image, cpp_total_dose_image,
+                  fRunDoseFilenames[run_id]);
+}
+
+void GateDoseActor::FlushTemporaryImage() {
+  auto n = cpp_edep_image->GetLargestPossibleRegion().GetNumberOfPixels();
+  auto *edep = cpp_edep_image->GetBufferPointer();
+  auto *square = cpp_square_image->GetBufferPointer();
+  auto *temp = cpp_temp_image->GetBufferPointer();
+  for (size_t i = 0; i < n; i++) {
+    edep[i] += temp[i];
+    square[i] += temp[i] * temp[i];
+  }
+  cpp_temp_image->FillBuffer(0);
+  // (event id restart from zero at each run)
+  cpp_last_id_image->FillBuffer(-1);
+}
+
+void GateDoseActor::WriteRunImage(ImageType::Pointer image,
+                                  ImageType::Pointer total,
+                                  const std::string &filename) {
+  // accumulate in the sum of all runs
+  auto n = image->GetLargestPossibleRegion().GetNumberOfPixels();
+  auto *values = image->GetBufferPointer();
+  auto *total_values = total->GetBufferPointer();
+  for (size_t i = 0; i < n; i++)
+    total_values[i] += values[i];
+
+  // write the image of this run, in the output coordinate system
+  auto origin = image->GetOrigin();
+  auto direction = image->GetDirection();
+  ImageType::PointType output_origin;
+  ImageType::DirectionType identity;
+  identity.SetIdentity();
+  for (auto i = 0; i < 3; i++)
+    output_origin[i] = fOutputOrigin[i];
+  image->SetOrigin(output_origin);
+  image->SetDirection(identity);
+  auto writer = itk::ImageFileWriter<ImageType>::New();
+  writer->SetFileName(filename);
+  writer->SetInput(image);
+  writer->Update();
+  image->SetOrigin(origin);
+  image->SetDirection(direction);
+
+  // the same buffer is used for the next run
+  image->FillBuffer(0);
+}
+
+void GateDoseActor::EndSimulationAction() {
+  // Per run output: the final images are the sum of all runs
+  if (fOutputPerRunFlag) {
+    std::swap(cpp_edep_image, cpp_total_edep_image);
+    if (fGrayFlag)
+      std::swap(cpp_dose_image, cpp_total_dose_image);
+  }
+}
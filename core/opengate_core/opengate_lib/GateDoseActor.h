@@ -8,10 +8,14 @@
 #ifndef GateDoseActor_h
 #define GateDoseActor_h
 
+#include "G4Cache.hh"
 #include "G4VPrimitiveScorer.hh"
+#include "GateHelpersImage.h"
 #include "GateVActor.h"
 #include "itkImage.h"
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
+#include <unordered_map>
 
 namespace py = pybind11;
 
@@ -29,6 +33,18 @@ public:
   // Called every time a Run starts (all threads)
   virtual void BeginOfRunAction(const G4Run *run);
 
+  // Called every time an Event starts (all threads)
+  virtual void BeginOfEventAction(const G4Event *event);
+
+  // Called every time an Event ends (all threads)
+  virtual void EndOfEventAction(const G4Event *event);
+
+  // Called every time the simulation is about to end (all threads)
+  virtual void EndOfSimulationWorkerAction(const G4Run *lastRun);
+
+  // Called every time a Run has ended (master only, all threads terminated)
+  virtual void EndOfRunMasterAction(int run_id);
+
   virtual void EndSimulationAction();
 
   // Image type is 3D float by default
@@ -40,6 +56,20 @@ public:
   // Option: indicate if we must compute uncertainty
   bool fUncertaintyFlag;
 
+  // Option: how the edep per event is kept for the uncertainty:
+  // - in temporary images (with last event id per voxel)
+  // - in a sparse buffer of the voxels touched during the event
+  // or the events are split in batches, each one with its own edep image
+  enum UncertaintyMethodType {
+    UncertaintyImage,
+    UncertaintyEventBuffer,
+    UncertaintyBatch
+  };
+  UncertaintyMethodType fUncertaintyMethod;
+
+  // Option: number of batches (for the batch uncertainty method)
+  int fNumberOfBatches;
+
   // Option: indicate if we must compute dose in Gray also
   bool fGrayFlag;
 
@@ -48,12 +78,96 @@ public:
   ImageType::Pointer cpp_temp_image;
   ImageType::Pointer cpp_last_id_image;
   ImageType::Pointer cpp_dose_image;
+  std::vector<ImageType::Pointer> cpp_batch_images;
   double fVoxelVolume;
 
   std::string fPhysicalVolumeName;
 
   G4ThreeVector fInitialTranslation;
-  std::string fHitType;
+  GateHitType fHitType;
+
+  // Option: when the image has the same grid as the attached ImageVolume,
+  // the voxel index is given by the replica numbers of the touchable
+  bool fReplicaIndexFlag;
+
+  // Option: each thread accumulates in its own buffers (merged at the end)
+  bool fThreadLocalBuffersFlag;
+
+  // Option: number of threads sharing the same buffers (to limit memory)
+  int fThreadsPerBuffer;
+
+  // Option: sparse scoring, only the touched voxels are stored
+  bool fSparseFlag;
+
+  // Option: write the edep/dose images at the end of every run
+  bool fOutputPerRunFlag;
+
+  // Images with the sum of all runs (per run output only)
+  ImageType::Pointer cpp_total_edep_image;
+  ImageType::Pointer cpp_total_dose_image;
+
+  // Filenames of the images of every run, and origin of the output images
+  // (set on the py side)
+  std::vector<std::string> fRunEdepFilenames;
+  std::vector<std::string> fRunDoseFilenames;
+  std::vector<double> fOutputOrigin;
+
+  // Sparse values of all threads (sorted by voxel offset)
+  py::dict GetSparseVoxels() const;
+
+protected:
+  // Buffers used by a group of threads, merged into the images at the end
+  struct AccumulationBuffer {
+    std::vector<double> fEdep;
+    std::vector<double> fSquare;
+    std::vector<double> fTemp;
+    std::vector<double> fDose;
+    std::vector<int> fLastId;
+    int fNumberOfThreads = 0;
+    G4Mutex fMutex;
+  };
+  std::map<int, std::unique_ptr<AccumulationBuffer>> fAccumulationBuffers;
+
+  // Sparse scoring: values for each touched voxel (key is the voxel offset)
+  struct SparseVoxel {
+    double fEdep = 0;
+    double fSquare = 0;
+    double fDose = 0;
+  };
+  typedef std::unordered_map<size_t, SparseVoxel> SparseVoxelsMapType;
+  SparseVoxelsMapType fSparseVoxels;
+
+  // Local data for the threads (each one has a copy)
+  struct threadLocalT {
+    // point to index transform (updated at each run)
+    GateImageIndexer<ImageType> fIndexer;
+    // attached ImageVolume (replica index option)
+    G4VPhysicalVolume *fImageVolume = nullptr;
+    AccumulationBuffer *fBuffer = nullptr;
+    // batch of the current event
+    int fCurrentBatch = 0;
+    // edep of the current event, for the touched voxels only
+    std::unordered_map<size_t, double> fEventEdep;
+    // sparse scoring
+    SparseVoxelsMapType fSparseVoxels;
+  };
+  G4Cache<threadLocalT> fThreadLocalData;
+
+  void InitializeThreadLocalBuffer();
+
+  // Store the edep/dose of a voxel, according to the options
+  void AddValues(threadLocalT &l, const ImageType::IndexType &index,
+                 double edep, double dose);
+
+  void AddValuesToBuffer(AccumulationBuffer *buffer, size_t offset, double edep,
+                         double dose) const;
+
+  void MergeBuffer(AccumulationBuffer *buffer);
+
+  void FlushTemporaryImage();
+
+  void WriteRunImage(ImageType::Pointer image, ImageType::Pointer total,
+                     const std::string &filename);
 };
 
 #endif // GateDoseActor_h
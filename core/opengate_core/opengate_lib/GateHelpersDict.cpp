@@ -70,6 +70,11 @@ int DictGetInt(py::dict &user_info, const std::string &key) {
   return py::int_(user_info[key.c_str()]);
 }
 
+long long DictGetLongLong(py::dict &user_info, const std::string &key) {
+  DictCheckKey(user_info, key);
+  return py::int_(user_info[key.c_str()]);
+}
+
 std::string DictGetStr(py::dict &user_info, const std::string &key) {
   DictCheckKey(user_info, key);
   return py::str(user_info[key.c_str()]);
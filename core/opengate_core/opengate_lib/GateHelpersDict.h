@@ -31,6 +31,8 @@ G4RotationMatrix DictGetG4RotationMatrix(py::dict &user_info,
 
 int DictGetInt(py::dict &user_info, const std::string &key);
 
+long long DictGetLongLong(py::dict &user_info, const std::string &key);
+
 bool DictGetBool(py::dict &user_info, const std::string &key);
 
 double DictGetDouble(py::dict &user_info, const std::string &key);
@@ -11,6 +11,20 @@
 #include "indicators.hpp"
 #include "itkImageRegionIteratorWithIndex.h"
 
+GateHitType StrToHitType(const std::string &hit_type) {
+  if (hit_type == "pre")
+    return HitPre;
+  if (hit_type == "post")
+    return HitPost;
+  if (hit_type == "random")
+    return HitRandom;
+  if (hit_type == "middle")
+    return HitMiddle;
+  Fatal("Unknown hit type '" + hit_type +
+        "', must be 'pre', 'post', 'random' or 'middle'.");
+  return HitRandom;
+}
+
 GateVolumeVoxelizer::GateVolumeVoxelizer() { fImage = ImageType::New(); }
 
 void GateVolumeVoxelizer::Voxelize(std::string /*vol_name*/) {
@@ -10,6 +10,8 @@
 
 #include "G4LogicalVolumeStore.hh"
 #include "G4PhysicalVolumeStore.hh"
+#include "G4RandomTools.hh"
+#include "G4Step.hh"
 #include "GateHelpers.h"
 #include "itkImage.h"
 
@@ -24,6 +26,55 @@ void AttachImageToVolume(typename ImageType::Pointer image,
                          G4ThreeVector initial_translation = G4ThreeVector(),
                          G4RotationMatrix img_rotation = G4RotationMatrix());
 
+// Position of the hit along the step (pre, post, random or middle)
+enum GateHitType { HitPre, HitPost, HitRandom, HitMiddle };
+
+GateHitType StrToHitType(const std::string &hit_type);
+
+inline G4ThreeVector GetHitPosition(const G4Step *step, GateHitType hit_type) {
+  const auto &post = step->GetPostStepPoint()->GetPosition();
+  if (hit_type == HitPost)
+    return post;
+  const auto &pre = step->GetPreStepPoint()->GetPosition();
+  if (hit_type == HitPre)
+    return pre;
+  if (hit_type == HitMiddle)
+    return pre + 0.5 * (post - pre);
+  return pre + G4UniformRand() * (post - pre);
+}
+
+// Physical point to voxel index, with the inverse spacing/direction/origin
+// precomputed. Same results as itk TransformPhysicalPointToIndex, but must
+// be updated each time the image geometry changes (e.g. at each run).
+template <class ImageType> class GateImageIndexer {
+public:
+  void Update(typename ImageType::Pointer image);
+
+  inline bool TransformPointToIndex(const G4ThreeVector &point,
+                                    typename ImageType::IndexType &index) const;
+
+  // Continuous index (voxel i covers [i-0.5, i+0.5[)
+  inline void TransformPointToContinuousIndex(const G4ThreeVector &point,
+                                              double index[3]) const;
+
+  // Split the segment [p0, p1] into the voxels it crosses (Siddon like): the
+  // callback is called with the index of each voxel and the fraction of the
+  // segment length inside this voxel. Parts outside the image are ignored.
+  template <class CallbackType>
+  void TraverseSegment(const G4ThreeVector &p0, const G4ThreeVector &p1,
+                       CallbackType callback) const;
+
+protected:
+  double fOrigin[3] = {0, 0, 0};
+  double fInverseSpacing[3] = {1, 1, 1};
+  // inverse of (direction x spacing)
+  double fMatrix[3][3] = {{1, 0, 0}, {0, 1, 0}, {0, 0, 1}};
+  long fStart[3] = {0, 0, 0};
+  long fEnd[3] = {0, 0, 0};
+  // identity direction: no matrix product needed
+  bool fAxisAligned = true;
+};
+
 class GateVolumeVoxelizer {
 public:
   GateVolumeVoxelizer();
@@ -7,6 +7,8 @@
 
 #include "G4LogicalVolume.hh"
 #include "GateHelpersGeometry.h"
+#include <cfloat>
+#include <cmath>
 
 template<class ImageType>
 void ImageAddValue(typename ImageType::Pointer image,
@@ -53,3 +55,132 @@ void AttachImageToVolume(typename ImageType::Pointer image,
   image->SetOrigin(o);
   image->SetDirection(dir);
 }
+
+template<class ImageType>
+void GateImageIndexer<ImageType>::Update(typename ImageType::Pointer image) {
+  auto origin = image->GetOrigin();
+  auto spacing = image->GetSpacing();
+  auto matrix = image->GetPhysicalPointToIndexMatrix();
+  auto direction = image->GetDirection();
+  auto region = image->GetBufferedRegion();
+  fAxisAligned = true;
+  for (auto i = 0; i < 3; i++) {
+    fOrigin[i] = origin[i];
+    fInverseSpacing[i] = 1.0 / spacing[i];
+    fStart[i] = region.GetIndex(i);
+    fEnd[i] = fStart[i] + region.GetSize(i);
+    for (auto j = 0; j < 3; j++) {
+      fMatrix[i][j] = matrix[i][j];
+      if (direction[i][j] != (i == j ? 1.0 : 0.0))
+        fAxisAligned = false;
+    }
+  }
+}
+
+template<class ImageType>
+bool GateImageIndexer<ImageType>::TransformPointToIndex(
+    const G4ThreeVector &point, typename ImageType::IndexType &index) const {
+  double p[3];
+  for (auto i = 0; i < 3; i++)
+    p[i] = point[i] - fOrigin[i];
+  for (auto i = 0; i < 3; i++) {
+    double x;
+    if (fAxisAligned)
+      x = p[i] * fInverseSpacing[i];
+    else
+      x = fMatrix[i][0] * p[0] + fMatrix[i][1] * p[1] + fMatrix[i][2] * p[2];
+    // round half integer up, as itk
+    index[i] = static_cast<long>(std::floor(x + 0.5));
+    if (index[i] < fStart[i] || index[i] >= fEnd[i])
+      return false;
+  }
+  return true;
+}
+
+template<class ImageType>
+void GateImageIndexer<ImageType>::TransformPointToContinuousIndex(
+    const G4ThreeVector &point, double index[3]) const {
+  double p[3];
+  for (auto i = 0; i < 3; i++)
+    p[i] = point[i] - fOrigin[i];
+  for (auto i = 0; i < 3; i++) {
+    if (fAxisAligned)
+      index[i] = p[i] * fInverseSpacing[i];
+    else
+      index[i] =
+          fMatrix[i][0] * p[0] + fMatrix[i][1] * p[1] + fMatrix[i][2] * p[2];
+  }
+}
+
+template<class ImageType>
+template<class CallbackType>
+void GateImageIndexer<ImageType>::TraverseSegment(const G4ThreeVector &p0,
+                                                  const G4ThreeVector &p1,
+                                                  CallbackType callback) const {
+  double c0[3], c1[3], d[3];
+  TransformPointToContinuousIndex(p0, c0);
+  TransformPointToContinuousIndex(p1, c1);
+
+  // Parametric range [t_min, t_max] of the segment inside the image
+  double t_min = 0;
+  double t_max = 1;
+  for (auto i = 0; i < 3; i++) {
+    d[i] = c1[i] - c0[i];
+    double lo = fStart[i] - 0.5;
+    double hi = fEnd[i] - 0.5;
+    if (d[i] == 0) {
+      if (c0[i] < lo || c0[i] >= hi)
+        return;
+      continue;
+    }
+    auto ta = (lo - c0[i]) / d[i];
+    auto tb = (hi - c0[i]) / d[i];
+    if (ta > tb)
+      std::swap(ta, tb);
+    t_min = std::max(t_min, ta);
+    t_max = std::min(t_max, tb);
+  }
+  if (t_min >= t_max)
+    return;
+
+  // First voxel, and parameter of the next boundary along each axis
+  typename ImageType::IndexType index;
+  long step[3];
+  double t_next[3], t_delta[3];
+  for (auto i = 0; i < 3; i++) {
+    auto x = c0[i] + t_min * d[i];
+    index[i] = static_cast<long>(std::floor(x + 0.5));
+    index[i] = std::min(std::max(index[i], fStart[i]), fEnd[i] - 1);
+    if (d[i] > 0) {
+      step[i] = 1;
+      t_next[i] = (index[i] + 0.5 - c0[i]) / d[i];
+      t_delta[i] = 1.0 / d[i];
+    } else if (d[i] < 0) {
+      step[i] = -1;
+      t_next[i] = (index[i] - 0.5 - c0[i]) / d[i];
+      t_delta[i] = -1.0 / d[i];
+    } else {
+      step[i] = 0;
+      t_next[i] = DBL_MAX;
+      t_delta[i] = DBL_MAX;
+    }
+  }
+
+  // Walk through the voxels
+  auto t = t_min;
+  while (t < t_max) {
+    auto axis = 0;
+    if (t_next[1] < t_next[axis])
+      axis = 1;
+    if (t_next[2] < t_next[axis])
+      axis = 2;
+    auto tn = std::min(t_next[axis], t_max);
+    if (tn > t)
+      callback(index, tn - t);
+    t = tn;
+    index[axis] += step[axis];
+    t_next[axis] += t_delta[axis];
+    if (index[axis] < fStart[axis] || index[axis] >= fEnd[axis])
+      break;
+  }
+}
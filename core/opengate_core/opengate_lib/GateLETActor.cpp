@@ -24,11 +24,13 @@
 #include "G4Positron.hh"
 #include "G4Proton.hh"
 
-// Mutex that will be used by thread to write in the edep/dose image
-// TODO
-// G4Mutex SetPixelMutex = G4MUTEX_INITIALIZER;
+// Mutex that will be used by thread to merge in the numerator/denominator
+G4Mutex SetLETPixelMutex = G4MUTEX_INITIALIZER;
 
-GateLETActor::GateLETActor(py::dict &user_info) : GateVActor(user_info, false) {
+// Lowest energy (MeV) of the dedx cache, computed without cache below
+const double DEDXCacheMinimumEnergy = 1e-3;
+
+GateLETActor::GateLETActor(py::dict &user_info) : GateVActor(user_info, true) {
   // Create the image pointer
   // (the size and allocation will be performed on the py side)
   cpp_numerator_image = ImageType::New();
@@ -36,6 +38,7 @@ GateLETActor::GateLETActor(py::dict &user_info) : GateVActor(user_info, false) {
   // Action for this actor: during stepping
   fActions.insert("SteppingAction");
   fActions.insert("BeginOfRunAction");
+  fActions.insert("EndOfSimulationWorkerAction");
   fActions.insert("EndSimulationAction");
   // Option: compute uncertainty
   fdoseAverage = DictGetBool(user_info, "dose_average");
@@ -45,10 +48,12 @@ GateLETActor::GateLETActor(py::dict &user_info) : GateVActor(user_info, false) {
   // fQAverage = DictGetBool(user_info, "qAverage");
   fInitialTranslation = DictGetG4ThreeVector(user_info, "translation");
   // Hit type (random, pre, post etc)
-  fHitType = DictGetStr(user_info, "hit_type");
+  fHitType = StrToHitType(DictGetStr(user_info, "hit_type"));
+  // Option: cache for the dedx
+  fDEDXCacheBinsPerDecade = DictGetInt(user_info, "dedx_cache_bins_per_decade");
 }
 
-void GateLETActor::ActorInitialize() { emcalc = new G4EmCalculator; }
+void GateLETActor::ActorInitialize() {}
 
 void GateLETActor::BeginOfRunAction(const G4Run *) {
   // Important ! The volume may have moved, so we re-attach each run
@@ -59,55 +64,53 @@ void GateLETActor::BeginOfRunAction(const G4Run *) {
   // compute volume of a dose voxel
   auto sp = cpp_numerator_image->GetSpacing();
   fVoxelVolume = sp[0] * sp[1] * sp[2];
-  static G4Material *water =
-      G4NistManager::Instance()->FindOrBuildMaterial(fotherMaterial);
+  if (fLETtoOtherMaterial)
+    water = G4NistManager::Instance()->FindOrBuildMaterial(fotherMaterial);
+
+  // precompute the point to index transform of this run
+  auto &l = fThreadLocalData.Get();
+  l.fIndexer.Update(cpp_numerator_image);
+
+  // Initialize the thread local data (first run only)
+  if (l.fEmCalculator != nullptr)
+    return;
+  l.fEmCalculator = std::make_unique<G4EmCalculator>();
+  if (G4Threading::IsMultithreadedApplication()) {
+    // Each thread has its own buffers, merged at the end
+    auto n =
+        cpp_numerator_image->GetLargestPossibleRegion().GetNumberOfPixels();
+    l.fNumeratorBuffer.resize(n, 0.0);
+    l.fDenominatorBuffer.resize(n, 0.0);
+    l.fNumerator = l.fNumeratorBuffer.data();
+    l.fDenominator = l.fDenominatorBuffer.data();
+  } else {
+    // Mono-thread: directly in the images
+    l.fNumerator = cpp_numerator_image->GetBufferPointer();
+    l.fDenominator = cpp_denominator_image->GetBufferPointer();
+  }
 }
 
 void GateLETActor::SteppingAction(G4Step *step) {
-  auto preGlobal = step->GetPreStepPoint()->GetPosition();
-  auto postGlobal = step->GetPostStepPoint()->GetPosition();
+  auto &l = fThreadLocalData.Get();
   auto touchable = step->GetPreStepPoint()->GetTouchable();
 
   // FIXME If the volume has multiple copy, touchable->GetCopyNumber(0) ?
 
   // consider random position between pre and post
-  auto position = postGlobal;
-  if (fHitType == "pre") {
-    position = preGlobal;
-  }
-  if (fHitType == "random") {
-    auto x = G4UniformRand();
-    auto direction = postGlobal - preGlobal;
-    position = preGlobal + x * direction;
-  }
-  if (fHitType == "middle") {
-    auto direction = postGlobal - preGlobal;
-    position = preGlobal + 0.5 * direction;
-  }
+  auto position = GetHitPosition(step, fHitType);
   auto localPosition =
       touchable->GetHistory()->GetTransform(0).TransformPoint(position);
 
-  // convert G4ThreeVector to itk PointType
-  ImageType::PointType point;
-  point[0] = localPosition[0];
-  point[1] = localPosition[1];
-  point[2] = localPosition[2];
-
   // get pixel index
   ImageType::IndexType index;
-  bool isInside =
-      cpp_numerator_image->TransformPhysicalPointToIndex(point, index);
+  bool isInside = l.fIndexer.TransformPointToIndex(localPosition, index);
 
   // set value
   if (isInside) {
-    // With mutex (thread)
-    // TODO auto lock
-    // G4AutoLock mutex(&SetPixelMutex);
-
+    // No mutex: each thread has its own buffers
     // get edep in MeV (take weight into account)
     auto w = step->GetTrack()->GetWeight();
     auto edep = step->GetTotalEnergyDeposit() / CLHEP::MeV * w;
-    double dedx_cut = DBL_MAX;
     // dedx
     auto *current_material = step->GetPreStepPoint()->GetMaterial();
     auto density = current_material->GetDensity() / CLHEP::g * CLHEP::cm3;
@@ -132,9 +135,8 @@ void GateLETActor::SteppingAction(G4Step *step) {
 
     if (p == G4Gamma::Gamma())
       p = G4Electron::Electron();
-    auto dedx_currstep =
-        emcalc->ComputeElectronicDEDX(energy, p, current_material, dedx_cut) /
-        CLHEP::MeV * CLHEP::mm;
+    auto dedx_currstep = ComputeElectronicDEDX(l, energy, p, current_material) /
+                         CLHEP::MeV * CLHEP::mm;
 
     auto steplength = step->GetStepLength() / CLHEP::mm;
     double scor_val_num = 0.;
@@ -143,8 +145,7 @@ void GateLETActor::SteppingAction(G4Step *step) {
     if (fLETtoOtherMaterial) {
       auto density_water = water->GetDensity() / CLHEP::g * CLHEP::cm3;
       auto dedx_water =
-          emcalc->ComputeElectronicDEDX(energy, p, water, dedx_cut) /
-          CLHEP::MeV * CLHEP::mm;
+          ComputeElectronicDEDX(l, energy, p, water) / CLHEP::MeV * CLHEP::mm;
       auto SPR_otherMaterial = dedx_water / dedx_currstep;
       edep *= SPR_otherMaterial;
       dedx_currstep *= SPR_otherMaterial;
@@ -157,11 +158,66 @@ void GateLETActor::SteppingAction(G4Step *step) {
       scor_val_num = steplength * dedx_currstep * w / CLHEP::MeV;
       scor_val_den = steplength * w / CLHEP::mm;
     }
-    ImageAddValue<ImageType>(cpp_numerator_image, index, scor_val_num);
-    ImageAddValue<ImageType>(cpp_denominator_image, index, scor_val_den);
-    //}
+    auto offset = cpp_numerator_image->ComputeOffset(index);
+    l.fNumerator[offset] += scor_val_num;
+    l.fDenominator[offset] += scor_val_den;
 
   } // else : outside the image
 }
 
+double GateLETActor::ComputeElectronicDEDX(threadLocalT &l, double energy,
+                                           const G4ParticleDefinition *p,
+                                           const G4Material *material) {
+  double dedx_cut = DBL_MAX;
+  if (fDEDXCacheBinsPerDecade <= 0 or energy < DEDXCacheMinimumEnergy)
+    return l.fEmCalculator->ComputeElectronicDEDX(energy, p, material,
+                                                  dedx_cut);
+  // Linear interpolation between the two closest (log spaced) energy bins
+  auto x =
+      std::log10(energy / DEDXCacheMinimumEnergy) * fDEDXCacheBinsPerDecade;
+  auto bin = static_cast<int>(x);
+  auto w = x - bin;
+  auto d1 = GetCachedDEDX(l, bin, p, material);
+  auto d2 = GetCachedDEDX(l, bin + 1, p, material);
+  return (1.0 - w) * d1 + w * d2;
+}
+
+double GateLETActor::GetCachedDEDX(threadLocalT &l, int bin,
+                                   const G4ParticleDefinition *p,
+                                   const G4Material *material) {
+  auto &values = l.fDEDXCache[p][material];
+  if (bin >= (int)values.size())
+    values.resize(bin + 1, -1.0);
+  if (values[bin] < 0) {
+    double dedx_cut = DBL_MAX;
+    auto e = DEDXCacheMinimumEnergy *
+             std::pow(10.0, (double)bin / fDEDXCacheBinsPerDecade);
+    values[bin] =
+        l.fEmCalculator->ComputeElectronicDEDX(e, p, material, dedx_cut);
+  }
+  return values[bin];
+}
+
+void GateLETActor::EndOfSimulationWorkerAction(const G4Run * /*lastRun*/) {
+  // Merge the thread local buffers (mono-thread: already in the images)
+  auto &l = fThreadLocalData.Get();
+  // the calculator and the dedx cache of the thread are no longer needed
+  l.fEmCalculator.reset();
+  DEDXCacheType().swap(l.fDEDXCache);
+  if (l.fNumeratorBuffer.empty())
+    return;
+  G4AutoLock mutex(&SetLETPixelMutex);
+  auto *num = cpp_numerator_image->GetBufferPointer();
+  auto *den = cpp_denominator_image->GetBufferPointer();
+  for (size_t i = 0; i < l.fNumeratorBuffer.size(); i++) {
+    num[i] += l.fNumeratorBuffer[i];
+    den[i] += l.fDenominatorBuffer[i];
+  }
+  // free memory
+  std::vector<double>().swap(l.fNumeratorBuffer);
+  std::vector<double>().swap(l.fDenominatorBuffer);
+  l.fNumerator = nullptr;
+  l.fDenominator = nullptr;
+}
+
 void GateLETActor::EndSimulationAction() {}
@@ -8,17 +8,19 @@
 #ifndef GateLETActor_h
 #define GateLETActor_h
 
+#include "G4Cache.hh"
+#include "G4EmCalculator.hh"
 #include "G4VPrimitiveScorer.hh"
+#include "GateHelpersImage.h"
 #include "GateVActor.h"
 #include "itkImage.h"
+#include <memory>
 #include <pybind11/stl.h>
 
 #include "G4NistManager.hh"
 
 namespace py = pybind11;
 
-class G4EmCalculator;
-
 class GateLETActor : public GateVActor {
 
 public:
@@ -33,6 +35,9 @@ public:
   // Called every time a Run starts (all threads)
   virtual void BeginOfRunAction(const G4Run *run);
 
+  // Called every time the simulation is about to end (all threads)
+  virtual void EndOfSimulationWorkerAction(const G4Run *lastRun);
+
   virtual void EndSimulationAction();
 
   // Image type is 3D float by default
@@ -50,14 +55,42 @@ public:
   bool fLETtoOtherMaterial;
   std::string fotherMaterial;
 
+  // Option: cache the dedx in energy bins (0 bins means no cache)
+  int fDEDXCacheBinsPerDecade;
+
 private:
   double fVoxelVolume;
 
   G4ThreeVector fInitialTranslation;
-  std::string fHitType;
+  GateHitType fHitType;
 
-  G4EmCalculator *emcalc;
   G4Material *water;
+
+  // dedx per particle and material, in energy bins (negative = not computed)
+  typedef std::map<const G4ParticleDefinition *,
+                   std::map<const G4Material *, std::vector<double>>>
+      DEDXCacheType;
+
+  // Local data for the threads (each one has a copy)
+  struct threadLocalT {
+    std::unique_ptr<G4EmCalculator> fEmCalculator;
+    // point to index transform (updated at each run)
+    GateImageIndexer<ImageType> fIndexer;
+    // Point to the images in mono-thread, to the local buffers otherwise
+    double *fNumerator = nullptr;
+    double *fDenominator = nullptr;
+    std::vector<double> fNumeratorBuffer;
+    std::vector<double> fDenominatorBuffer;
+    DEDXCacheType fDEDXCache;
+  };
+  G4Cache<threadLocalT> fThreadLocalData;
+
+  double ComputeElectronicDEDX(threadLocalT &l, double energy,
+                               const G4ParticleDefinition *p,
+                               const G4Material *material);
+
+  double GetCachedDEDX(threadLocalT &l, int bin, const G4ParticleDefinition *p,
+                       const G4Material *material);
 };
 
 #endif // GateLETActor_h
@@ -24,6 +24,15 @@ GatePhaseSpaceActor::GatePhaseSpaceActor(py::dict &user_info)
   fUserDigiAttributeNames = DictGetVecStr(user_info, "attributes");
   fStoreAbsorbedEvent = DictGetBool(user_info, "store_absorbed_event");
   fDebug = DictGetBool(user_info, "debug");
+  fFlushEveryNEvents = DictGetInt(user_info, "flush_every_n_events");
+  fFlushEveryNDigis = DictGetInt(user_info, "flush_every_n_digis");
+  auto max_bytes = DictGetLongLong(user_info, "flush_max_bytes");
+  if (max_bytes < 0)
+    Fatal("The option flush_max_bytes of the actor " + fDigiCollectionName +
+          " must be positive (or 0 to disable it)");
+  fFlushMaxBytes = (size_t)max_bytes;
+  fAsyncWriteFlag = DictGetBool(user_info, "async_write");
+  fKeepInMemoryFlag = DictGetBool(user_info, "keep_in_memory");
   fHits = nullptr;
 
   // Special case to store event information even if the event do not step in
@@ -32,6 +41,10 @@ GatePhaseSpaceActor::GatePhaseSpaceActor(py::dict &user_info)
     fActions.insert("BeginOfEventAction");
     fActions.insert("EndOfEventAction");
   }
+
+  // Write and clear the digis during the run to bound the memory
+  if (fFlushEveryNEvents > 0 || fFlushEveryNDigis > 0 || fFlushMaxBytes > 0)
+    fActions.insert("EndOfEventAction");
 }
 
 GatePhaseSpaceActor::~GatePhaseSpaceActor() {
@@ -45,6 +58,9 @@ void GatePhaseSpaceActor::StartSimulationAction() {
   fHits->SetFilenameAndInitRoot(fOutputFilename);
   fHits->InitDigiAttributesFromNames(fUserDigiAttributeNames);
   fHits->RootInitializeTupleForMaster();
+  fHits->SetFlushPolicy(fFlushEveryNEvents, fFlushEveryNDigis, fFlushMaxBytes);
+  fHits->SetAsyncWriteFlag(fAsyncWriteFlag);
+  fHits->SetKeepInMemoryFlag(fKeepInMemoryFlag);
   if (fStoreAbsorbedEvent) {
     CheckRequiredAttribute(fHits, "EventID");
     CheckRequiredAttribute(fHits, "EventPosition");
@@ -121,6 +137,9 @@ void GatePhaseSpaceActor::EndOfEventAction(const G4Event *event) {
     // increase the nb of absorbed events
     fNumberOfAbsorbedEvents++;
   }
+
+  // Write and clear if one of the flush limits is reached
+  fHits->FlushIfNeeded();
 }
 
 // Called every time a Run ends
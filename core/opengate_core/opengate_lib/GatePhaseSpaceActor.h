@@ -63,6 +63,11 @@ protected:
   GateDigiCollection *fHits;
   bool fDebug;
   bool fStoreAbsorbedEvent;
+  int fFlushEveryNEvents;
+  int fFlushEveryNDigis;
+  size_t fFlushMaxBytes;
+  bool fAsyncWriteFlag;
+  bool fKeepInMemoryFlag;
 };
 
 #endif // GatePhaseSpaceActor_h
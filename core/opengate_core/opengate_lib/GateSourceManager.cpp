@@ -110,6 +110,10 @@ void GateSourceManager::StartMasterThread() {
     auto *uim = G4UImanager::GetUIpointer();
     uim->ApplyCommand(run);
     StartVisualization();
+    // The run is terminated (for all threads)
+    for (auto *actor : fActors) {
+      actor->EndOfRunMasterAction(run_id);
+    }
   }
 }
 
@@ -0,0 +1,138 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include "GateTLEDoseActor.h"
+#include "G4Gamma.hh"
+#include "GateHelpersDict.h"
+#include "GateHelpersImage.h"
+
+// Energy range (MeV) of the mu_en tables, computed without table outside
+const double MuEnTableMinimumEnergy = 1e-3;
+const double MuEnTableMaximumEnergy = 10.0;
+
+// Mean fraction of the photon energy given to the electron by a Compton
+// scattering (Klein-Nishina, free electron at rest)
+static double ComptonEnergyTransferFraction(double energy) {
+  auto k = energy / CLHEP::electron_mass_c2;
+  // low energy approximation (avoid numerical cancellation)
+  if (k < 0.01)
+    return k * (1.0 - 2.0 * k);
+  auto a = 1.0 + 2.0 * k;
+  auto l = std::log(a);
+  auto sigma = (1.0 + k) / (k * k) * (2.0 * (1.0 + k) / a - l / k) +
+               l / (2.0 * k) - (1.0 + 3.0 * k) / (a * a);
+  auto sigma_tr =
+      2.0 * (1.0 + k) * (1.0 + k) / (k * k * a) - (1.0 + 3.0 * k) / (a * a) -
+      (1.0 + k) * (2.0 * k * k - 2.0 * k - 1.0) / (k * k * a * a) -
+      4.0 * k * k / (3.0 * a * a * a) -
+      ((1.0 + k) / (k * k * k) - 1.0 / (2.0 * k) + 1.0 / (2.0 * k * k * k)) * l;
+  return sigma_tr / sigma;
+}
+
+GateTLEDoseActor::GateTLEDoseActor(py::dict &user_info)
+    : GateDoseActor(user_info) {
+  fMuEnBinsPerDecade = DictGetInt(user_info, "mu_en_bins_per_decade");
+}
+
+void GateTLEDoseActor::SteppingAction(G4Step *step) {
+  // Only the photons are scored
+  if (step->GetTrack()->GetParticleDefinition() != G4Gamma::Gamma())
+    return;
+  auto *pre = step->GetPreStepPoint();
+  auto *material = pre->GetMaterial();
+  auto energy = pre->GetKineticEnergy();
+  auto mu_en = GetMuEn(energy, material);
+  if (mu_en <= 0)
+    return;
+
+  // Energy (MeV) deposited along the step (take weight into account)
+  auto w = step->GetTrack()->GetWeight();
+  auto edep_step = energy / CLHEP::MeV * mu_en * step->GetStepLength() * w;
+  auto density = material->GetDensity();
+
+  // Step in the coordinate system of the image
+  auto &l = fThreadLocalData.Get();
+  const auto &transform = pre->GetTouchable()->GetHistory()->GetTransform(0);
+  auto p0 = transform.TransformPoint(pre->GetPosition());
+  auto p1 = transform.TransformPoint(step->GetPostStepPoint()->GetPosition());
+
+  // Split the energy in the voxels according to the track length
+  l.fIndexer.TraverseSegment(
+      p0, p1, [&](const ImageType::IndexType &index, double fraction) {
+        auto edep = edep_step * fraction;
+        double dose = 0;
+        if (fGrayFlag)
+          dose = edep / density / fVoxelVolume / CLHEP::gray;
+        AddValues(l, index, edep, dose);
+      });
+}
+
+void GateTLEDoseActor::EndOfSimulationWorkerAction(const G4Run *lastRun) {
+  GateDoseActor::EndOfSimulationWorkerAction(lastRun);
+  fThreadLocalMuEn.Get().fEmCalculator.reset();
+}
+
+double GateTLEDoseActor::GetMuEn(double energy, const G4Material *material) {
+  auto &l = fThreadLocalMuEn.Get();
+  if (fMuEnBinsPerDecade <= 0 or energy < MuEnTableMinimumEnergy or
+      energy >= MuEnTableMaximumEnergy)
+    return ComputeMuEn(l, energy, material);
+  // Linear interpolation between the two closest (log spaced) energy bins
+  const auto &table = GetMuEnTable(l, material);
+  auto x = std::log10(energy / MuEnTableMinimumEnergy) * fMuEnBinsPerDecade;
+  auto bin = static_cast<int>(x);
+  auto w = x - bin;
+  return (1.0 - w) * table[bin] + w * table[bin + 1];
+}
+
+const std::vector<double> &
+GateTLEDoseActor::GetMuEnTable(threadLocalMuEnT &l,
+                               const G4Material *material) {
+  auto i = material->GetIndex();
+  if (i >= l.fMuEnTables.size())
+    l.fMuEnTables.resize(i + 1);
+  auto &table = l.fMuEnTables[i];
+  if (table.empty()) {
+    // computed once for all the bins, the first time the material is met
+    auto n = static_cast<int>(std::ceil(
+                 std::log10(MuEnTableMaximumEnergy / MuEnTableMinimumEnergy) *
+                 fMuEnBinsPerDecade)) +
+             1;
+    table.resize(n);
+    for (auto bin = 0; bin < n; bin++) {
+      auto e = MuEnTableMinimumEnergy *
+               std::pow(10.0, (double)bin / fMuEnBinsPerDecade);
+      table[bin] = ComputeMuEn(l, e, material);
+    }
+  }
+  return table;
+}
+
+double GateTLEDoseActor::ComputeMuEn(threadLocalMuEnT &l, double energy,
+                                     const G4Material *material) {
+  // mu_en is approximated by the energy transfer coefficient (the radiative
+  // losses of the electrons are neglected, fine for low energy photons).
+  // Rayleigh scattering does not transfer energy.
+  if (l.fEmCalculator == nullptr)
+    l.fEmCalculator = std::make_unique<G4EmCalculator>();
+  auto *gamma = G4Gamma::Gamma();
+  auto *calc = l.fEmCalculator.get();
+  // photoelectric: all the energy (fluorescence is neglected)
+  auto mu_en =
+      calc->ComputeCrossSectionPerVolume(energy, gamma, "phot", material);
+  // Compton: mean energy given to the electron
+  mu_en +=
+      calc->ComputeCrossSectionPerVolume(energy, gamma, "compt", material) *
+      ComptonEnergyTransferFraction(energy);
+  // pair production: all the energy except the rest mass of the pair
+  auto threshold = 2.0 * CLHEP::electron_mass_c2;
+  if (energy > threshold)
+    mu_en +=
+        calc->ComputeCrossSectionPerVolume(energy, gamma, "conv", material) *
+        (1.0 - threshold / energy);
+  return mu_en;
+}
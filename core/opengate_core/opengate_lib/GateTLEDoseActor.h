@@ -0,0 +1,59 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateTLEDoseActor_h
+#define GateTLEDoseActor_h
+
+#include "G4EmCalculator.hh"
+#include "GateDoseActor.h"
+#include <memory>
+
+/*
+ * Track length estimator (TLE) of the dose for the photons. Along each photon
+ * step, the energy deposited in a voxel is estimated by:
+ *    energy x track length in the voxel x mu_en(energy, material)
+ * The energy given to the secondary electrons is assumed to be deposited
+ * locally (the electrons are not scored). Same images and options as the
+ * DoseActor.
+ */
+
+class GateTLEDoseActor : public GateDoseActor {
+
+public:
+  // Constructor
+  explicit GateTLEDoseActor(py::dict &user_info);
+
+  // Main function called every step in attached volume
+  void SteppingAction(G4Step *step) override;
+
+  // Release the G4EmCalculator of the thread
+  void EndOfSimulationWorkerAction(const G4Run *lastRun) override;
+
+  // Option: number of energy bins per decade of the mu_en tables
+  int fMuEnBinsPerDecade;
+
+  // Linear energy absorption coefficient (1/mm) of a photon of the given
+  // energy in the material (interpolated in the tables)
+  double GetMuEn(double energy, const G4Material *material);
+
+protected:
+  // Local data for the threads (each one has a copy)
+  struct threadLocalMuEnT {
+    std::unique_ptr<G4EmCalculator> fEmCalculator;
+    // mu_en in energy bins, for each material index (empty if not computed)
+    std::vector<std::vector<double>> fMuEnTables;
+  };
+  G4Cache<threadLocalMuEnT> fThreadLocalMuEn;
+
+  double ComputeMuEn(threadLocalMuEnT &l, double energy,
+                     const G4Material *material);
+
+  const std::vector<double> &GetMuEnTable(threadLocalMuEnT &l,
+                                          const G4Material *material);
+};
+
+#endif // GateTLEDoseActor_h
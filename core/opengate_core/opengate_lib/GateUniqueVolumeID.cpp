@@ -8,7 +8,9 @@
 #include <array>
 
 #include "G4NavigationHistory.hh"
+#include "G4ReplicaNavigation.hh"
 #include "G4RunManager.hh"
+#include "G4VPVParameterisation.hh"
 #include "G4VPhysicalVolume.hh"
 #include "GateHelpers.h"
 #include "GateUniqueVolumeID.h"
@@ -106,6 +108,26 @@ G4AffineTransform *GateUniqueVolumeID::GetWorldToLocalTransform(size_t depth) {
   return tt;
 }
 
+G4ThreeVector
+GateUniqueVolumeID::ComputeCurrentTranslation(size_t depth) const {
+  // Rebuild the navigation history from the world with the physical volumes
+  // and copy numbers of this ID, as in
+  // GateUniqueVolumeIDManager::AddVolumeIDs
+  G4NavigationHistory history;
+  history.SetFirstEntry(fVolumeDepthID[0].fVolume);
+  for (size_t i = 1; i <= depth && i < fVolumeDepthID.size(); i++) {
+    auto *pv = fVolumeDepthID[i].fVolume;
+    auto copy = fVolumeDepthID[i].fCopyNb;
+    const auto type = pv->VolumeType();
+    if (type == kParameterised)
+      pv->GetParameterisation()->ComputeTransformation(copy, pv);
+    else if (type == kReplica)
+      G4ReplicaNavigation().ComputeTransformation(copy, pv);
+    history.NewLevel(pv, type, copy);
+  }
+  return history.GetTopTransform().InverseNetTranslation();
+}
+
 G4AffineTransform *GateUniqueVolumeID::GetLocalToWorldTransform(size_t depth) {
   if (depth >= fVolumeDepthID.size()) {
     std::ostringstream oss;
@@ -139,3 +161,13 @@ std::string GateUniqueVolumeID::GetIdUpToDepth(int depth) {
   fCachedIdDepth[depth] = s;
   return s;
 }
+
+GateUniqueVolumeID::IDArrayType
+GateUniqueVolumeID::GetArrayIdUpToDepth(int depth) const {
+  auto id = fArrayID;
+  if (depth == -1)
+    return id;
+  for (auto i = depth + 1; i < MaxDepth; i++)
+    id[i] = -1;
+  return id;
+}
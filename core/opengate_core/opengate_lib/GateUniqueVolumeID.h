@@ -71,8 +71,16 @@ public:
 
   G4AffineTransform *GetWorldToLocalTransform(size_t depth);
 
+  // World translation of the volume at this depth, computed from the current
+  // geometry: the stored fTranslation is a copy taken when the ID was
+  // created, it is wrong if the volume has moved since (e.g. between runs)
+  G4ThreeVector ComputeCurrentTranslation(size_t depth) const;
+
   std::string GetIdUpToDepth(int depth);
 
+  // same as GetIdUpToDepth, as an array (padded with -1), no allocation
+  IDArrayType GetArrayIdUpToDepth(int depth) const;
+
   std::vector<VolumeDepthID> fVolumeDepthID;
   IDArrayType fArrayID{};
   std::string fID;
@@ -6,42 +6,133 @@
    -------------------------------------------------- */
 
 #include "GateUniqueVolumeIDManager.h"
+#include "G4PVParameterised.hh"
+#include "G4PhysicalVolumeStore.hh"
+#include "G4ReplicaNavigation.hh"
+#include "G4TouchableHistory.hh"
+#include "G4VPVParameterisation.hh"
 #include "GateHelpers.h"
 
-GateUniqueVolumeIDManager *GateUniqueVolumeIDManager::fInstance = nullptr;
+G4Mutex VolumeIDManagerMutex = G4MUTEX_INITIALIZER;
+
+bool IsVolumeInside(const G4LogicalVolume *lv, const std::string &name) {
+  if (lv->GetName() == name)
+    return true;
+  for (size_t i = 0; i < lv->GetNoDaughters(); i++) {
+    if (IsVolumeInside(lv->GetDaughter(i)->GetLogicalVolume(), name))
+      return true;
+  }
+  return false;
+}
+
+std::atomic<GateUniqueVolumeIDManager *> GateUniqueVolumeIDManager::fInstance{
+    nullptr};
 
 GateUniqueVolumeIDManager *GateUniqueVolumeIDManager::GetInstance() {
-  if (fInstance == nullptr)
-    fInstance = new GateUniqueVolumeIDManager();
-  return fInstance;
+  // may be first called by several worker threads: the (acquire) load sees
+  // either nullptr or a fully constructed manager (release store)
+  auto *instance = fInstance.load(std::memory_order_acquire);
+  if (instance == nullptr) {
+    G4AutoLock mutex(&VolumeIDManagerMutex);
+    instance = fInstance.load(std::memory_order_relaxed);
+    if (instance == nullptr) {
+      instance = new GateUniqueVolumeIDManager();
+      fInstance.store(instance, std::memory_order_release);
+    }
+  }
+  return instance;
 }
 
-GateUniqueVolumeIDManager::GateUniqueVolumeIDManager() = default;
+GateUniqueVolumeIDManager::GateUniqueVolumeIDManager() {
+  fMaxNumberOfInitializedVolumeIDs = 100000;
+}
 
 GateUniqueVolumeID::Pointer
 GateUniqueVolumeIDManager::GetVolumeID(const G4VTouchable *touchable) {
   // This function is potentially called a large number of time (every hit)
-  // It worth it to make it faster if possible (unsure how).
+  // by all threads: the lookup is done in a thread local map (no lock).
 
   // https://geant4-forum.web.cern.ch/t/identification-of-unique-physical-volumes-with-ids/2568/3
   // ID
   auto id = GateUniqueVolumeID::ComputeArrayID(touchable);
+  auto &l = fThreadLocalData.Get();
+  auto *uid = l.fArrayToVolumeID.Find(id);
+  if (uid != nullptr)
+    return *uid;
+  // First time this thread sees this volume: look in the global map
+  return l.fArrayToVolumeID.Insert(id, GetOrCreateVolumeID(id, touchable));
+}
+
+GateUniqueVolumeID::Pointer GateUniqueVolumeIDManager::GetOrCreateVolumeID(
+    const GateUniqueVolumeID::IDArrayType &id, const G4VTouchable *touchable) {
+  G4AutoLock mutex(&VolumeIDManagerMutex);
   // Search if this touchable has already been associated with a unique volume
   // ID
-  if (fArrayToVolumeID.count(id) == 0) {
-    // It does not exist, so we create it.
-    auto uid = GateUniqueVolumeID::New(touchable);
-    fNameToVolumeID[uid->fID] = uid;
-    fArrayToVolumeID[id] = uid;
-  }
-  return fArrayToVolumeID[id];
+  auto it = fArrayToVolumeID.find(id);
+  if (it != fArrayToVolumeID.end())
+    return it->second;
+  // It does not exist, so we create it.
+  auto uid = GateUniqueVolumeID::New(touchable);
+  fNameToVolumeID[uid->fID] = uid;
+  fArrayToVolumeID[id] = uid;
+  return uid;
 }
 
 std::vector<GateUniqueVolumeID::Pointer>
 GateUniqueVolumeIDManager::GetAllVolumeIDs() const {
+  G4AutoLock mutex(&VolumeIDManagerMutex);
   std::vector<GateUniqueVolumeID::Pointer> l;
   for (const auto &x : fNameToVolumeID) {
     l.push_back(x.second);
   }
   return l; // copy
 }
+
+void GateUniqueVolumeIDManager::InitializeVolumeIDs(
+    const std::string &volume_name) {
+  // Walk the geometry tree from the world, like the navigator does, and
+  // create the IDs of all volumes below volume_name.
+  auto *world = G4PhysicalVolumeStore::GetInstance()->GetVolume("world", false);
+  if (world == nullptr)
+    return;
+  G4NavigationHistory history;
+  history.SetFirstEntry(world);
+  AddVolumeIDs(history, volume_name, world->GetName() == volume_name);
+}
+
+void GateUniqueVolumeIDManager::AddVolumeIDs(G4NavigationHistory &history,
+                                             const std::string &volume_name,
+                                             bool inside) {
+  if (fArrayToVolumeID.size() >= fMaxNumberOfInitializedVolumeIDs)
+    return;
+  if (inside) {
+    const G4TouchableHistory touchable(history);
+    auto id = GateUniqueVolumeID::ComputeArrayID(&touchable);
+    GetOrCreateVolumeID(id, &touchable);
+  }
+  if ((int)history.GetDepth() >= GateUniqueVolumeID::MaxDepth - 1)
+    return;
+  const auto *lv = history.GetTopVolume()->GetLogicalVolume();
+  for (size_t i = 0; i < lv->GetNoDaughters(); i++) {
+    auto *pv = lv->GetDaughter(i);
+    const bool in = inside || pv->GetLogicalVolume()->GetName() == volume_name;
+    // Only the branches that lead to the volume are needed
+    if (!in && !IsVolumeInside(pv->GetLogicalVolume(), volume_name))
+      continue;
+    const auto type = pv->VolumeType();
+    if (type == kExternal)
+      continue;
+    const int n = pv->IsReplicated() ? pv->GetMultiplicity() : 1;
+    for (int copy = 0; copy < n; copy++) {
+      if (fArrayToVolumeID.size() >= fMaxNumberOfInitializedVolumeIDs)
+        return;
+      if (type == kParameterised)
+        pv->GetParameterisation()->ComputeTransformation(copy, pv);
+      else if (type == kReplica)
+        G4ReplicaNavigation().ComputeTransformation(copy, pv);
+      history.NewLevel(pv, type, type == kNormal ? pv->GetCopyNo() : copy);
+      AddVolumeIDs(history, volume_name, in);
+      history.BackLevel();
+    }
+  }
+}
@@ -8,12 +8,23 @@
 #ifndef GateUniqueVolumeIDManager_h
 #define GateUniqueVolumeIDManager_h
 
+#include "G4Cache.hh"
+#include "G4NavigationHistory.hh"
 #include "G4VTouchable.hh"
 #include "GateUniqueVolumeID.h"
+#include "digitizer/GateVolumeIDMap.h"
+#include <atomic>
 
 /*
     Global singleton class that manage a correspondence between touchable
     pointer and unique volume ID.
+
+    GetVolumeID is called for every hit by all threads: each thread first
+    looks into its own cache (no lock), the global map (protected by a mutex)
+    is only used the first time a thread sees a volume.
+    InitializeVolumeIDs pre-computes all IDs of the volumes inside a given
+    volume (repeated or parameterised detectors), to avoid creating them
+    during the run.
  */
 
 class GateUniqueVolumeIDManager {
@@ -24,10 +35,23 @@ public:
 
   std::vector<GateUniqueVolumeID::Pointer> GetAllVolumeIDs() const;
 
+  // Create the IDs of all volumes inside this (logical) volume
+  void InitializeVolumeIDs(const std::string &volume_name);
+
+  // Do not pre-compute more than this number of IDs (e.g. voxelized volumes)
+  size_t fMaxNumberOfInitializedVolumeIDs;
+
 protected:
   GateUniqueVolumeIDManager();
 
-  static GateUniqueVolumeIDManager *fInstance;
+  static std::atomic<GateUniqueVolumeIDManager *> fInstance;
+
+  GateUniqueVolumeID::Pointer
+  GetOrCreateVolumeID(const GateUniqueVolumeID::IDArrayType &id,
+                      const G4VTouchable *touchable);
+
+  void AddVolumeIDs(G4NavigationHistory &history,
+                    const std::string &volume_name, bool inside);
 
   // Index of ID array to VolumeID to speed up test
   // This map is created on the fly in GetVolumeID
@@ -36,6 +60,12 @@ protected:
 
   // Convenient helpers map from name to VolumeID
   std::map<std::string, GateUniqueVolumeID::Pointer> fNameToVolumeID;
+
+  // Per-thread copy of the (used part of the) map
+  struct threadLocalT {
+    GateVolumeIDMap<GateUniqueVolumeID::Pointer> fArrayToVolumeID;
+  };
+  G4Cache<threadLocalT> fThreadLocalData;
 };
 
 #endif // GateUniqueVolumeIDManager_h
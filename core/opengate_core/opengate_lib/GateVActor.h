@@ -72,6 +72,10 @@ public:
   // Called every time a Run is about to starts in the Master (MT only)
   virtual void PrepareRunToStartMasterAction(int /*run_id*/) {}
 
+  // Called every time a Run has ended in the Master, once all threads have
+  // terminated it (also in mono-thread)
+  virtual void EndOfRunMasterAction(int /*run_id*/) {}
+
   // Called every time a Run starts (all threads)
   virtual void BeginOfRunAction(const G4Run * /*run*/) {}
 
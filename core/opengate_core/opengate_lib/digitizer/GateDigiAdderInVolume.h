@@ -36,6 +36,9 @@ public:
   double fLatestTime = 0;
   double fDifferenceTime = 0;
 
+  // volume of the first hit (IDs are kept by GateUniqueVolumeIDManager)
+  const GateUniqueVolumeID *fVolumeID = nullptr;
+
   void Update(size_t i, double edep, const G4ThreeVector &pos, double time);
 
   void Terminate();
@@ -6,16 +6,27 @@
    -------------------------------------------------- */
 
 #include "GateDigiCollection.h"
+#include "G4AutoLock.hh"
 #include "G4Step.hh"
 #include "GateDigiAttributeManager.h"
 #include "GateDigiCollectionIterator.h"
+#include "GateDigiCollectionsAsyncWriter.h"
 #include "GateDigiCollectionsRootManager.h"
+#include <algorithm>
+#include <fstream>
+
+G4Mutex DigiCollectionColumnsMutex = G4MUTEX_INITIALIZER;
+G4Mutex DigiCollectionShardsMutex = G4MUTEX_INITIALIZER;
 
 GateDigiCollection::GateDigiCollection(const std::string &collName)
     : G4VHitsCollection("", collName), fDigiCollectionName(collName) {
   fTupleId = -1;
   fDigiCollectionTitle = "Digi collection";
   fCurrentDigiAttributeId = 0;
+  fFlushEveryNEvents = 0;
+  fFlushMaxDigis = 0;
+  fAsyncWriteFlag = false;
+  fKeepInMemoryFlag = false;
   SetFilenameAndInitRoot("");
   threadLocalData.Get().fBeginOfEventIndex = 0;
 }
@@ -42,9 +53,16 @@ void GateDigiCollection::SetWriteToRootFlag(bool f) {
 
 void GateDigiCollection::SetFilenameAndInitRoot(std::string filename) {
   fFilename = filename;
+  fOutputFormat = GateVDigiCollectionWriter::GetFormat(fFilename);
   if (fFilename.empty())
     SetWriteToRootFlag(false);
-  else
+  else if (fOutputFormat != "root") {
+    // one file per thread, no root
+    if (!GateVDigiCollectionWriter::IsAvailable(fOutputFormat))
+      Fatal("The output format '" + fOutputFormat + "' of the file '" +
+            fFilename + "' is not available in this build of opengate_core.");
+    SetWriteToRootFlag(false);
+  } else
     SetWriteToRootFlag(true);
 }
 
@@ -88,9 +106,10 @@ void GateDigiCollection::FillToRootIfNeeded(bool clear) {
    */
   if (!fWriteToRootFlag) {
     // need to set the index before (in case we don't clear)
-    if (clear)
+    if (clear) {
+      FillToShard();
       Clear();
-    else
+    } else
       SetBeginOfEventIndex();
     return;
   }
@@ -113,21 +132,207 @@ void GateDigiCollection::FillToRoot() {
   Clear();
 }
 
+void GateDigiCollection::SetAsyncWriteFlag(bool f) {
+  if (f && fWriteToRootFlag) {
+    std::ostringstream oss;
+    oss << "Error, the asynchronous write of the DigiCollection '"
+        << fDigiCollectionName << "' needs a npy or hdf5 output, not root ("
+        << fFilename << "): the root file can only be filled by the Geant4 "
+        << "thread that owns it.";
+    Fatal(oss.str());
+  }
+  fAsyncWriteFlag = f;
+}
+
+void GateDigiCollection::SetFlushPolicy(int every_n_events, size_t max_digis,
+                                        size_t max_bytes) {
+  // Attributes must be initialized before, to convert the bytes budget into
+  // a number of digis
+  fFlushEveryNEvents = every_n_events;
+  fFlushMaxDigis = max_digis;
+  if (max_bytes > 0) {
+    auto n = std::max(max_bytes / GetDigiSizeInBytes(), (size_t)1);
+    if (fFlushMaxDigis == 0 || n < fFlushMaxDigis)
+      fFlushMaxDigis = n;
+  }
+}
+
+bool GateDigiCollection::FlushIfNeeded() {
+  /*
+      Policy :
+      - called once per event
+      - flush every N events, or when the number of digis is larger than the
+        limit (computed from the max bytes)
+      - the vectors are cleared but keep their capacity: the memory remains
+        bounded by the limit
+   */
+  if (fFlushEveryNEvents <= 0 && fFlushMaxDigis == 0)
+    return false;
+  auto &l = threadLocalData.Get();
+  l.fNumberOfEventsSinceFlush++;
+  bool flush = (fFlushEveryNEvents > 0 &&
+                l.fNumberOfEventsSinceFlush >= fFlushEveryNEvents) ||
+               (fFlushMaxDigis > 0 && GetSize() >= fFlushMaxDigis);
+  if (!flush)
+    return false;
+  FillToRootIfNeeded(true);
+  l.fNumberOfEventsSinceFlush = 0;
+  return true;
+}
+
+size_t GateDigiCollection::GetDigiSizeInBytes() const {
+  size_t s = 0;
+  for (const auto *att : fDigiAttributes) {
+    switch (att->GetDigiAttributeType()) {
+    case 'D':
+      s += sizeof(double);
+      break;
+    case 'I':
+      s += sizeof(int);
+      break;
+    case '3':
+      s += sizeof(G4ThreeVector);
+      break;
+    case 'S':
+      s += sizeof(std::string);
+      break;
+    default:
+      // unique volume id (shared pointer)
+      s += 2 * sizeof(void *);
+    }
+  }
+  return std::max(s, (size_t)1);
+}
+
+void GateDigiCollection::AppendToColumns() {
+  if (!fKeepInMemoryFlag || GetSize() == 0)
+    return;
+  // The columns are shared by all threads
+  G4AutoLock mutex(&DigiCollectionColumnsMutex);
+  for (auto *att : fDigiAttributes) {
+    auto &column = fColumns[att->GetDigiAttributeName()];
+    if (column == nullptr)
+      column.reset(att->NewBuffer());
+    else if (column.use_count() > 1)
+      // the column is still used (numpy view): keep it unchanged
+      column.reset(column->Clone());
+    att->AppendValuesTo(column.get());
+  }
+}
+
+std::shared_ptr<GateVDigiAttributeBuffer>
+GateDigiCollection::GetColumn(const std::string &name) const {
+  G4AutoLock mutex(&DigiCollectionColumnsMutex);
+  auto it = fColumns.find(name);
+  if (it == fColumns.end())
+    return nullptr;
+  return it->second;
+}
+
 void GateDigiCollection::Clear() {
+  AppendToColumns();
   for (auto *att : fDigiAttributes) {
     att->Clear();
   }
   SetBeginOfEventIndex(0);
 }
 
-void GateDigiCollection::Write() const {
+void GateDigiCollection::FillToShard() {
+  if (fFilename.empty() || fOutputFormat == "root" || GetSize() == 0)
+    return;
+  auto &l = threadLocalData.Get();
+  // The file of this thread is created at the first values
+  auto thread = std::max(G4Threading::G4GetThreadId(), 0);
+  auto filename =
+      GateVDigiCollectionWriter::GetShardFilename(fFilename, thread);
+  if (fAsyncWriteFlag) {
+    // The values are moved to the I/O thread, the collection is now empty
+    AppendToColumns();
+    if (l.fAsyncWriter == nullptr)
+      l.fAsyncWriter = std::make_shared<GateDigiCollectionsAsyncWriter>(
+          this, fOutputFormat, filename);
+    l.fAsyncWriter->Push();
+    return;
+  }
+  if (l.fWriter == nullptr) {
+    l.fWriter.reset(GateVDigiCollectionWriter::New(fOutputFormat));
+    l.fWriter->Open(filename, this);
+  }
+  l.fWriter->Append(this);
+}
+
+void GateDigiCollection::CloseShard() {
+  auto &l = threadLocalData.Get();
+  ShardInfo info;
+  info.fThread = std::max(G4Threading::G4GetThreadId(), 0);
+  if (l.fAsyncWriter != nullptr) {
+    // wait for the I/O thread to write the last values and close the file
+    l.fAsyncWriter->Close();
+    info.fFilename = l.fAsyncWriter->GetFilename();
+    info.fNumberOfRows = l.fAsyncWriter->GetNumberOfRows();
+    l.fAsyncWriter = nullptr;
+  } else if (l.fWriter != nullptr) {
+    l.fWriter->Close();
+    info.fFilename = l.fWriter->GetFilename();
+    info.fNumberOfRows = l.fWriter->GetNumberOfRows();
+    l.fWriter = nullptr;
+  } else
+    return;
+  G4AutoLock mutex(&DigiCollectionShardsMutex);
+  fShards.push_back(info);
+}
+
+void GateDigiCollection::WriteShardIndex() const {
+  // Small json file: list of the shards (filename relative to the index)
+  // with their number of rows, and list of the attributes
+  auto basename = [](const std::string &f) {
+    auto slash = f.find_last_of("/\\");
+    return slash == std::string::npos ? f : f.substr(slash + 1);
+  };
+  auto shards = fShards;
+  std::sort(shards.begin(), shards.end(),
+            [](const ShardInfo &a, const ShardInfo &b) {
+              return a.fThread < b.fThread;
+            });
+  auto filename = GateVDigiCollectionWriter::GetIndexFilename(fFilename);
+  std::ofstream os(filename);
+  if (!os.is_open())
+    Fatal("Cannot open the file '" + filename + "' for writing");
+  os << "{" << std::endl;
+  os << "  \"collection\": \"" << fDigiCollectionName << "\"," << std::endl;
+  os << "  \"format\": \"" << fOutputFormat << "\"," << std::endl;
+  os << "  \"string_size\": " << GateVDigiCollectionWriter::fStringSize << ","
+     << std::endl;
+  os << "  \"attributes\": [";
+  for (size_t i = 0; i < fDigiAttributes.size(); i++) {
+    auto *att = fDigiAttributes[i];
+    os << (i == 0 ? "" : ", ") << "{\"name\": \"" << att->GetDigiAttributeName()
+       << "\", \"type\": \"" << att->GetDigiAttributeType() << "\"}";
+  }
+  os << "]," << std::endl;
+  os << "  \"shards\": [";
+  for (size_t i = 0; i < shards.size(); i++) {
+    os << (i == 0 ? "" : ",") << std::endl
+       << "    {\"filename\": \"" << basename(shards[i].fFilename)
+       << "\", \"thread\": " << shards[i].fThread
+       << ", \"rows\": " << shards[i].fNumberOfRows << "}";
+  }
+  os << std::endl << "  ]" << std::endl << "}" << std::endl;
+}
+
+void GateDigiCollection::Write() {
+  CloseShard();
   if (!fWriteToRootFlag)
     return;
   auto *am = GateDigiCollectionsRootManager::GetInstance();
   am->Write(fTupleId);
 }
 
-void GateDigiCollection::Close() const {
+void GateDigiCollection::Close() {
+  if (!fFilename.empty() && fOutputFormat != "root") {
+    CloseShard();
+    WriteShardIndex();
+  }
   if (!fWriteToRootFlag)
     return;
   auto *am = GateDigiCollectionsRootManager::GetInstance();
@@ -10,12 +10,15 @@
 
 #include "G4TouchableHistory.hh"
 #include "GateVDigiAttribute.h"
+#include "GateVDigiCollectionWriter.h"
 #include <pybind11/stl.h>
 
 class GateDigiCollectionManager;
 
 class GateDigiCollectionIterator;
 
+class GateDigiCollectionsAsyncWriter;
+
 /*
  * Management of a Digi Collection.
  * See usage example in GateDigitizerHitsCollectionActor
@@ -37,6 +40,13 @@ class GateDigiCollectionIterator;
  *       If MT, need Write for all threads (EndOfRunAction) and for Master
  * (EndSimulationAction) * 6) Close may not be needed (unsure)
  *
+ *  - if the filename extension is .npy or .h5 (see
+ *    GateVDigiCollectionWriter), there is no root output: every thread
+ *    writes its own file during FillToRootIfNeeded (when cleared), Write
+ *    closes the file of the thread, Close (master) writes the index file.
+ *    With the async write flag, the file of each thread is written by a
+ *    background I/O thread (see GateDigiCollectionsAsyncWriter).
+ *
  */
 
 class GateDigiCollection : public G4VHitsCollection {
@@ -65,16 +75,34 @@ public:
 
   void FillToRootIfNeeded(bool clear);
 
-  void Write() const;
+  void Write();
 
-  void Close() const;
+  void Close();
 
   void SetWriteToRootFlag(bool f);
 
+  // If true, the shard of each thread (npy or hdf5 output) is written by a
+  // background I/O thread (not available for the root output)
+  void SetAsyncWriteFlag(bool f);
+
+  // If true, the values of all threads are also kept in memory (merged every
+  // time they are cleared) and can be retrieved with GetColumn
+  void SetKeepInMemoryFlag(bool f) { fKeepInMemoryFlag = f; }
+
+  // Values kept in memory for this attribute (nullptr if none). The column
+  // is shared: while a copy of the pointer is kept (e.g. by a numpy view),
+  // the values are not modified, the next appended values go to a new column
+  // (copy on write).
+  std::shared_ptr<GateVDigiAttributeBuffer>
+  GetColumn(const std::string &name) const;
+
   void SetFilenameAndInitRoot(std::string filename);
 
   std::string GetFilename() const { return fFilename; }
 
+  // "root", "npy" or "hdf5", according to the filename extension
+  std::string GetOutputFormat() const { return fOutputFormat; }
+
   std::string GetTitle() const { return fDigiCollectionTitle; }
 
   void SetTupleId(int id) { fTupleId = id; }
@@ -109,6 +137,16 @@ public:
 
   void SetBeginOfEventIndex();
 
+  // Flush policy (per thread, 0 means no limit): the digis are written (if
+  // root output) and cleared when one of the limits is reached
+  void SetFlushPolicy(int every_n_events, size_t max_digis, size_t max_bytes);
+
+  // Must be called once per event (all threads), return true if flushed
+  bool FlushIfNeeded();
+
+  // Approximate memory size of a single digi (all attributes)
+  size_t GetDigiSizeInBytes() const;
+
 protected:
   // Can only be created by GateDigiCollectionManager
   explicit GateDigiCollection(const std::string &collName);
@@ -121,15 +159,41 @@ protected:
   int fTupleId;
   int fCurrentDigiAttributeId;
   bool fWriteToRootFlag;
+  std::string fOutputFormat;
+  bool fAsyncWriteFlag;
+  bool fKeepInMemoryFlag;
+  std::map<std::string, std::shared_ptr<GateVDigiAttributeBuffer>> fColumns;
+  int fFlushEveryNEvents;
+  size_t fFlushMaxDigis;
 
   // thread local: the index of the beginning
   // of event is specific for each thread
   struct threadLocal_t {
     size_t fBeginOfEventIndex = 0;
+    int fNumberOfEventsSinceFlush = 0;
+    std::shared_ptr<GateVDigiCollectionWriter> fWriter;
+    std::shared_ptr<GateDigiCollectionsAsyncWriter> fAsyncWriter;
   };
   G4Cache<threadLocal_t> threadLocalData;
 
   void FillToRoot();
+
+  void AppendToColumns();
+
+  // Non root output: write the values of the current thread in its shard
+  void FillToShard();
+
+  // Non root output: close the shard of the current thread
+  void CloseShard();
+
+  void WriteShardIndex() const;
+
+  struct ShardInfo {
+    std::string fFilename;
+    int fThread;
+    size_t fNumberOfRows;
+  };
+  std::vector<ShardInfo> fShards;
 };
 
 #endif // GateDigiCollection_h
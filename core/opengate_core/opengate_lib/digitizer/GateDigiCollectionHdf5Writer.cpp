@@ -0,0 +1,140 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include "GateDigiCollectionHdf5Writer.h"
+#include "../GateHelpers.h"
+#include "G4AutoLock.hh"
+#include "GateDigiCollection.h"
+#include "GateTDigiAttribute.h"
+#include <cstring>
+
+#if USE_HDF5
+
+G4Mutex Hdf5WriterMutex = G4MUTEX_INITIALIZER;
+
+namespace {
+// Number of rows per hdf5 chunk
+const hsize_t Hdf5ChunkRows = 16384;
+} // namespace
+
+GateDigiCollectionHdf5Writer::GateDigiCollectionHdf5Writer() {
+  fFile = -1;
+  fStringType = -1;
+}
+
+void GateDigiCollectionHdf5Writer::Open(const std::string &filename,
+                                        GateDigiCollection *hc) {
+  G4AutoLock mutex(&Hdf5WriterMutex);
+  fFilename = filename;
+  fNumberOfRows = 0;
+  fTypes.clear();
+  fFile = H5Fcreate(fFilename.c_str(), H5F_ACC_TRUNC, H5P_DEFAULT, H5P_DEFAULT);
+  if (fFile < 0)
+    Fatal("Cannot open the file '" + fFilename + "' for writing");
+  fStringType = H5Tcopy(H5T_C_S1);
+  H5Tset_size(fStringType, fStringSize);
+  for (auto *att : hc->GetDigiAttributes()) {
+    auto type = att->GetDigiAttributeType();
+    fTypes.push_back(type);
+    int rank = type == '3' ? 2 : 1;
+    hsize_t dims[2] = {0, 3};
+    hsize_t max_dims[2] = {H5S_UNLIMITED, 3};
+    hsize_t chunk[2] = {Hdf5ChunkRows, 3};
+    hid_t dtype = fStringType;
+    if (type == 'D' || type == '3')
+      dtype = H5T_NATIVE_DOUBLE;
+    if (type == 'I')
+      dtype = H5T_NATIVE_INT;
+    auto space = H5Screate_simple(rank, dims, max_dims);
+    auto plist = H5Pcreate(H5P_DATASET_CREATE);
+    H5Pset_chunk(plist, rank, chunk);
+    auto dataset = H5Dcreate2(fFile, att->GetDigiAttributeName().c_str(), dtype,
+                              space, H5P_DEFAULT, plist, H5P_DEFAULT);
+    H5Pclose(plist);
+    H5Sclose(space);
+    fDatasets.push_back(dataset);
+  }
+}
+
+void GateDigiCollectionHdf5Writer::AppendBuffers(const BuffersType &buffers) {
+  hsize_t n = buffers.empty() ? 0 : buffers[0]->GetSize();
+  if (n == 0)
+    return;
+  G4AutoLock mutex(&Hdf5WriterMutex);
+  for (size_t a = 0; a < buffers.size(); a++) {
+    const auto *b = buffers[a].get();
+    auto type = fTypes[a];
+    int rank = type == '3' ? 2 : 1;
+    hsize_t size[2] = {fNumberOfRows + n, 3};
+    hsize_t start[2] = {fNumberOfRows, 0};
+    hsize_t count[2] = {n, 3};
+    H5Dset_extent(fDatasets[a], size);
+    auto file_space = H5Dget_space(fDatasets[a]);
+    H5Sselect_hyperslab(file_space, H5S_SELECT_SET, start, nullptr, count,
+                        nullptr);
+    auto mem_space = H5Screate_simple(rank, count, nullptr);
+    const void *data = nullptr;
+    hid_t dtype = fStringType;
+    if (type == 'D') {
+      data = GetValues<double>(b).data();
+      dtype = H5T_NATIVE_DOUBLE;
+    }
+    if (type == 'I') {
+      data = GetValues<int>(b).data();
+      dtype = H5T_NATIVE_INT;
+    }
+    if (type == '3') {
+      // G4ThreeVector stores its three components as contiguous doubles
+      data = GetValues<G4ThreeVector>(b).data();
+      dtype = H5T_NATIVE_DOUBLE;
+    }
+    if (type == 'S' || type == 'U') {
+      fStrings.assign(n * fStringSize, 0);
+      for (size_t i = 0; i < n; i++) {
+        const auto &s = type == 'S'
+                            ? GetValues<std::string>(b)[i]
+                            : GetValues<GateUniqueVolumeID::Pointer>(b)[i]->fID;
+        std::memcpy(fStrings.data() + i * fStringSize, s.data(),
+                    std::min(s.size(), fStringSize));
+      }
+      data = fStrings.data();
+    }
+    H5Dwrite(fDatasets[a], dtype, mem_space, file_space, H5P_DEFAULT, data);
+    H5Sclose(mem_space);
+    H5Sclose(file_space);
+  }
+  fNumberOfRows += n;
+}
+
+void GateDigiCollectionHdf5Writer::Close() {
+  if (fFile < 0)
+    return;
+  G4AutoLock mutex(&Hdf5WriterMutex);
+  for (auto d : fDatasets)
+    H5Dclose(d);
+  fDatasets.clear();
+  H5Tclose(fStringType);
+  H5Fclose(fFile);
+  fFile = -1;
+}
+
+#else
+
+GateDigiCollectionHdf5Writer::GateDigiCollectionHdf5Writer() {
+  Fatal("Cannot write hdf5 DigiCollection: opengate_core has been compiled "
+        "without hdf5. Use another output format (root, npy).");
+}
+
+void GateDigiCollectionHdf5Writer::Open(const std::string & /*filename*/,
+                                        GateDigiCollection * /*hc*/) {}
+
+void GateDigiCollectionHdf5Writer::AppendBuffers(
+    const BuffersType & /*buffers*/) {}
+
+void GateDigiCollectionHdf5Writer::Close() {}
+
+#endif
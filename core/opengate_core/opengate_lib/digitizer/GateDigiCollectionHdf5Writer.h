@@ -0,0 +1,44 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateDigiCollectionHdf5Writer_h
+#define GateDigiCollectionHdf5Writer_h
+
+#include "GateVDigiCollectionWriter.h"
+
+#if USE_HDF5
+#include <hdf5.h>
+#endif
+
+/*
+ * Write the DigiCollection of the current thread as a hdf5 file, with one
+ * dataset per attribute (Nx3 for 3D vectors), extended (chunked) at every
+ * Append. Only available if opengate_core is compiled with hdf5 (USE_HDF5).
+ * The hdf5 library is usually not thread safe: all calls are protected by a
+ * mutex, the shards are written one thread at a time.
+ */
+
+class GateDigiCollectionHdf5Writer : public GateVDigiCollectionWriter {
+public:
+  GateDigiCollectionHdf5Writer();
+
+  void Open(const std::string &filename, GateDigiCollection *hc) override;
+
+  void AppendBuffers(const BuffersType &buffers) override;
+
+  void Close() override;
+
+protected:
+#if USE_HDF5
+  hid_t fFile;
+  hid_t fStringType;
+  std::vector<hid_t> fDatasets;
+  std::vector<char> fStrings;
+#endif
+};
+
+#endif // GateDigiCollectionHdf5Writer_h
@@ -0,0 +1,146 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include "GateDigiCollectionNpyWriter.h"
+#include "../GateHelpers.h"
+#include "GateDigiCollection.h"
+#include "GateTDigiAttribute.h"
+#include <cstring>
+#include <iomanip>
+
+namespace {
+// The header size is fixed (the number of rows is written with a fixed
+// width), so it can be written again at the end without moving the data
+const int NpyShapeWidth = 20;
+const size_t NpyHeaderAlignment = 64;
+} // namespace
+
+void GateDigiCollectionNpyWriter::Open(const std::string &filename,
+                                       GateDigiCollection *hc) {
+  fFilename = filename;
+  fNumberOfRows = 0;
+  fRowSize = 0;
+  fFieldSizes.clear();
+  fTypes.clear();
+  std::ostringstream descr;
+  descr << "[";
+  for (auto *att : hc->GetDigiAttributes()) {
+    auto name = att->GetDigiAttributeName();
+    size_t size = 0;
+    switch (att->GetDigiAttributeType()) {
+    case 'D':
+      descr << "('" << name << "', '<f8'), ";
+      size = sizeof(double);
+      break;
+    case 'I':
+      descr << "('" << name << "', '<i4'), ";
+      size = sizeof(int);
+      break;
+    case '3':
+      descr << "('" << name << "', '<f8', (3,)), ";
+      size = 3 * sizeof(double);
+      break;
+    default:
+      // strings and unique volume id
+      descr << "('" << name << "', 'S" << fStringSize << "'), ";
+      size = fStringSize;
+    }
+    fFieldSizes.push_back(size);
+    fTypes.push_back(att->GetDigiAttributeType());
+    fRowSize += size;
+  }
+  descr << "]";
+  fDescr = descr.str();
+  fFile.open(fFilename, std::ios::binary | std::ios::trunc);
+  if (!fFile.is_open())
+    Fatal("Cannot open the file '" + fFilename + "' for writing");
+  WriteHeader();
+}
+
+void GateDigiCollectionNpyWriter::WriteHeader() {
+  std::ostringstream dict;
+  dict << "{'descr': " << fDescr << ", 'fortran_order': False, 'shape': ("
+       << std::setw(NpyShapeWidth) << fNumberOfRows << ",), }";
+  auto header = dict.str();
+  // magic (6) + version (2) + header length (2) + header + '\n'
+  size_t total = 10 + header.size() + 1;
+  size_t padded = (total + NpyHeaderAlignment - 1) / NpyHeaderAlignment *
+                  NpyHeaderAlignment;
+  header.append(padded - total, ' ');
+  header += '\n';
+  if (header.size() > 65535)
+    Fatal("Too many attributes for the npy header of '" + fFilename + "'");
+  auto len = static_cast<uint16_t>(header.size());
+  char len_bytes[2] = {static_cast<char>(len & 0xFF),
+                       static_cast<char>((len >> 8) & 0xFF)};
+  fFile.seekp(0);
+  fFile.write("\x93NUMPY\x01\x00", 8);
+  fFile.write(len_bytes, 2);
+  fFile.write(header.data(), header.size());
+}
+
+void GateDigiCollectionNpyWriter::AppendBuffers(const BuffersType &buffers) {
+  auto n = buffers.empty() ? 0 : buffers[0]->GetSize();
+  if (n == 0)
+    return;
+  // Pack the columns into rows (the chunk memory is reused)
+  fChunk.assign(n * fRowSize, 0);
+  size_t offset = 0;
+  for (size_t a = 0; a < buffers.size(); a++) {
+    const auto *b = buffers[a].get();
+    auto *p = fChunk.data() + offset;
+    switch (fTypes[a]) {
+    case 'D': {
+      const auto &values = GetValues<double>(b);
+      for (size_t i = 0; i < n; i++)
+        std::memcpy(p + i * fRowSize, &values[i], sizeof(double));
+      break;
+    }
+    case 'I': {
+      const auto &values = GetValues<int>(b);
+      for (size_t i = 0; i < n; i++)
+        std::memcpy(p + i * fRowSize, &values[i], sizeof(int));
+      break;
+    }
+    case '3': {
+      const auto &values = GetValues<G4ThreeVector>(b);
+      for (size_t i = 0; i < n; i++) {
+        double v[3] = {values[i].x(), values[i].y(), values[i].z()};
+        std::memcpy(p + i * fRowSize, v, sizeof(v));
+      }
+      break;
+    }
+    case 'S': {
+      const auto &values = GetValues<std::string>(b);
+      for (size_t i = 0; i < n; i++)
+        std::memcpy(p + i * fRowSize, values[i].data(),
+                    std::min(values[i].size(), fStringSize));
+      break;
+    }
+    default: {
+      const auto &values = GetValues<GateUniqueVolumeID::Pointer>(b);
+      for (size_t i = 0; i < n; i++)
+        std::memcpy(p + i * fRowSize, values[i]->fID.data(),
+                    std::min(values[i]->fID.size(), fStringSize));
+    }
+    }
+    offset += fFieldSizes[a];
+  }
+  fFile.seekp(0, std::ios::end);
+  fFile.write(fChunk.data(), fChunk.size());
+  fNumberOfRows += n;
+}
+
+void GateDigiCollectionNpyWriter::Close() {
+  if (!fFile.is_open())
+    return;
+  // final number of rows
+  WriteHeader();
+  fFile.close();
+  fChunk.clear();
+  fChunk.shrink_to_fit();
+}
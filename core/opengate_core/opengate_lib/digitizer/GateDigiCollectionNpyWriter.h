@@ -0,0 +1,40 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateDigiCollectionNpyWriter_h
+#define GateDigiCollectionNpyWriter_h
+
+#include "GateVDigiCollectionWriter.h"
+#include <fstream>
+
+/*
+ * Write the DigiCollection of the current thread as a numpy structured
+ * array (.npy, one field per attribute, 3D vectors as 3 doubles).
+ * The rows are appended in chunks (every Append), the header is written
+ * again at Close with the final number of rows. The file can be read with
+ * np.load(filename, mmap_mode="r").
+ */
+
+class GateDigiCollectionNpyWriter : public GateVDigiCollectionWriter {
+public:
+  void Open(const std::string &filename, GateDigiCollection *hc) override;
+
+  void AppendBuffers(const BuffersType &buffers) override;
+
+  void Close() override;
+
+protected:
+  void WriteHeader();
+
+  std::ofstream fFile;
+  std::string fDescr;
+  std::vector<size_t> fFieldSizes;
+  size_t fRowSize = 0;
+  std::vector<char> fChunk;
+};
+
+#endif // GateDigiCollectionNpyWriter_h
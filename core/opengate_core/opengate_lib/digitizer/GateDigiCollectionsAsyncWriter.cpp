@@ -0,0 +1,80 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include "GateDigiCollectionsAsyncWriter.h"
+#include "G4AutoLock.hh"
+#include "GateDigiCollection.h"
+
+GateDigiCollectionsAsyncWriter::GateDigiCollectionsAsyncWriter(
+    GateDigiCollection *hc, const std::string &format,
+    const std::string &filename)
+    : fCollection(hc), fFilename(filename), fStop(false) {
+  fWriter.reset(GateVDigiCollectionWriter::New(format));
+  fThread = std::thread(&GateDigiCollectionsAsyncWriter::Loop, this);
+}
+
+GateDigiCollectionsAsyncWriter::~GateDigiCollectionsAsyncWriter() { Close(); }
+
+void GateDigiCollectionsAsyncWriter::Push() {
+  if (fCollection->GetSize() == 0)
+    return;
+  BuffersType buffers;
+  {
+    // reuse buffers already written by the I/O thread, if any
+    G4AutoLock lock(&fMutex);
+    if (!fFreeBuffers.empty()) {
+      buffers = std::move(fFreeBuffers.back());
+      fFreeBuffers.pop_back();
+    }
+  }
+  auto &atts = fCollection->GetDigiAttributes();
+  if (buffers.empty())
+    for (auto *att : atts)
+      buffers.emplace_back(att->NewBuffer());
+  // O(1): the attributes get the empty buffers, the job gets the values
+  for (size_t i = 0; i < atts.size(); i++)
+    atts[i]->SwapValues(buffers[i].get());
+  {
+    G4AutoLock lock(&fMutex);
+    fJobs.push_back(std::move(buffers));
+  }
+  fJobCondition.notify_one();
+}
+
+void GateDigiCollectionsAsyncWriter::Close() {
+  if (!fThread.joinable())
+    return;
+  // the remaining jobs are written before the I/O thread ends
+  {
+    G4AutoLock lock(&fMutex);
+    fStop = true;
+  }
+  fJobCondition.notify_one();
+  fThread.join();
+}
+
+void GateDigiCollectionsAsyncWriter::Loop() {
+  // The file is only used by this thread, from its creation to its closing
+  fWriter->Open(fFilename, fCollection);
+  G4AutoLock lock(&fMutex);
+  while (true) {
+    fJobCondition.wait(lock, [this] { return fStop || !fJobs.empty(); });
+    if (fJobs.empty())
+      break;
+    auto buffers = std::move(fJobs.front());
+    fJobs.pop_front();
+    // the owner thread can push while the values are written
+    lock.unlock();
+    fWriter->AppendBuffers(buffers);
+    for (auto &b : buffers)
+      b->Clear();
+    lock.lock();
+    fFreeBuffers.push_back(std::move(buffers));
+  }
+  lock.unlock();
+  fWriter->Close();
+}
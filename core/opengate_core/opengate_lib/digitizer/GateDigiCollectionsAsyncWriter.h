@@ -0,0 +1,69 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateDigiCollectionsAsyncWriter_h
+#define GateDigiCollectionsAsyncWriter_h
+
+#include "G4Threading.hh"
+#include "GateVDigiCollectionWriter.h"
+#include <deque>
+#include <memory>
+#include <thread>
+
+class GateDigiCollection;
+
+class GateDigiCollectionsAsyncWriter {
+  /*
+   Background writer of the shard (npy or hdf5 file, one per thread, see
+   GateVDigiCollectionWriter) of a DigiCollection. One per collection and
+   per thread, see GateDigiCollection::FillToShard.
+
+   - The thread that fills the DigiCollection swaps the values with empty
+     buffers (Push). Push does no I/O: it only takes the lock of the job
+     queue, the file writing overlaps the transport of the next events.
+   - A dedicated I/O thread owns the shard writer: it creates the file,
+     appends the buffers and closes it, then gives the (cleared) buffers
+     back to be reused by the next Push.
+   - Close waits for the I/O thread to write the pending buffers: this is
+     the only time the simulation thread waits for the I/O.
+   - The root output cannot be written this way: the G4RootAnalysisManager
+     is thread local and must only be used by the thread that owns it.
+   */
+public:
+  GateDigiCollectionsAsyncWriter(GateDigiCollection *hc,
+                                 const std::string &format,
+                                 const std::string &filename);
+
+  ~GateDigiCollectionsAsyncWriter();
+
+  // Move the values of the current thread to the I/O thread
+  void Push();
+
+  // Wait until all pushed values have been written and the file is closed
+  void Close();
+
+  std::string GetFilename() const { return fWriter->GetFilename(); }
+
+  size_t GetNumberOfRows() const { return fWriter->GetNumberOfRows(); }
+
+protected:
+  typedef GateVDigiCollectionWriter::BuffersType BuffersType;
+
+  void Loop();
+
+  GateDigiCollection *fCollection;
+  std::string fFilename;
+  std::unique_ptr<GateVDigiCollectionWriter> fWriter;
+  std::thread fThread;
+  G4Mutex fMutex;
+  G4Condition fJobCondition;
+  std::deque<BuffersType> fJobs;
+  std::vector<BuffersType> fFreeBuffers;
+  bool fStop;
+};
+
+#endif // GateDigiCollectionsAsyncWriter_h
@@ -138,7 +138,7 @@ void GateDigitizerAdderActor::EndOfEventAction(const G4Event * /*unused*/) {
   }
 
   // reset the structure of hits
-  l.fMapOfDigiInVolume.clear();
+  l.fMapOfDigiInVolume.Clear();
 }
 
 void GateDigitizerAdderActor::AddDigiPerVolume() {
@@ -149,12 +149,13 @@ void GateDigitizerAdderActor::AddDigiPerVolume() {
     return;
   // uid and fGroupVolumeDepth are only used for repeated volume (such as in
   // PET)
-  auto uid = l.volID->get()->GetIdUpToDepth(fGroupVolumeDepth);
-  if (l.fMapOfDigiInVolume.count(uid) == 0) {
-    // l.fMapOfDigiInVolume[uid] =
-    // std::make_shared<GateDigiAdderInVolume>(fPolicy, fTimeDifferenceFlag);
-    l.fMapOfDigiInVolume[uid] =
-        GateDigiAdderInVolume(fPolicy, fTimeDifferenceFlag, fNumberOfHitsFlag);
+  auto uid = l.volID->get()->GetArrayIdUpToDepth(fGroupVolumeDepth);
+  auto *digi = l.fMapOfDigiInVolume.Find(uid);
+  if (digi == nullptr) {
+    digi = &l.fMapOfDigiInVolume.Insert(
+        uid,
+        GateDigiAdderInVolume(fPolicy, fTimeDifferenceFlag, fNumberOfHitsFlag));
+    digi->fVolumeID = l.volID->get();
   }
-  l.fMapOfDigiInVolume[uid].Update(i, *l.edep, *l.pos, *l.time);
+  digi->Update(i, *l.edep, *l.pos, *l.time);
 }
@@ -15,6 +15,7 @@
 #include "GateHelpersDigitizer.h"
 #include "GateTDigiAttribute.h"
 #include "GateVDigitizerWithOutputActor.h"
+#include "GateVolumeIDMap.h"
 #include <pybind11/stl.h>
 
 namespace py = pybind11;
@@ -80,9 +81,8 @@ protected:
 
   // During computation (thread local)
   struct threadLocalT {
-    // std::map<std::string, std::shared_ptr<GateDigiAdderInVolume>>
-    // fMapOfDigiInVolume;
-    std::map<std::string, GateDigiAdderInVolume> fMapOfDigiInVolume;
+    // digi grouped by volume ID, memory reused across events
+    GateVolumeIDMap<GateDigiAdderInVolume> fMapOfDigiInVolume;
     double *edep;
     G4ThreeVector *pos;
     GateUniqueVolumeID::Pointer *volID;
@@ -74,17 +74,9 @@ double GateDigitizerBlurringActor::GaussianBlur(double value) {
 }
 
 double GateDigitizerBlurringActor::InverseSquare(double value) {
-  // https://github.com/OpenGATE/Gate/blob/develop/source/digits_hits/src/GateBlurring.cc
-  // https://github.com/OpenGATE/Gate/blob/develop/source/digits_hits/src/GateInverseSquareBlurringLaw.cc
-  auto v = fBlurResolution * (sqrt(fBlurReferenceValue) / sqrt(value));
-  auto x = G4RandGauss::shoot(value, (v * value) * fwhm_to_sigma);
-  return x;
+  return BlurInverseSquare(value, fBlurResolution, fBlurReferenceValue);
 }
 
 double GateDigitizerBlurringActor::Linear(double value) {
-  // https://github.com/OpenGATE/Gate/blob/develop/source/digits_hits/src/GateBlurring.cc
-  // https://github.com/OpenGATE/Gate/blob/develop/source/digits_hits/src/GateLinearBlurringLaw.cc
-  auto v = fBlurSlope * (value - fBlurReferenceValue) + fBlurResolution;
-  auto x = G4RandGauss::shoot(value, (v * value) * fwhm_to_sigma);
-  return x;
+  return BlurLinear(value, fBlurSlope, fBlurResolution, fBlurReferenceValue);
 }
@@ -0,0 +1,316 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include "GateDigitizerChainActor.h"
+#include "../GateHelpersDict.h"
+#include "../GateHelpersGeometry.h"
+#include "G4PhysicalVolumeStore.hh"
+#include "GateDigiCollectionManager.h"
+#include <Randomize.hh>
+#include <algorithm>
+#include <iostream>
+
+G4Mutex SetChainIgnoredHitsMutex = G4MUTEX_INITIALIZER;
+
+GateDigitizerChainActor::GateDigitizerChainActor(py::dict &user_info)
+    : GateVDigitizerWithOutputActor(user_info, true) {
+  // actions (in addition of the ones in GateVDigitizerWithOutputActor)
+  fActions.insert("EndOfEventAction");
+  // init
+  fVolumeIDFlag = false;
+  fIgnoredHitsCount = 0;
+}
+
+GateDigitizerChainActor::~GateDigitizerChainActor() = default;
+
+void GateDigitizerChainActor::SetStages(std::vector<py::dict> &stages) {
+  fStages.clear();
+  fVolumeIDFlag = false;
+  for (auto &d : stages) {
+    Stage s{};
+    auto type = DictGetStr(d, "type");
+    if (type == "adder" || type == "readout") {
+      s.fType = type == "adder" ? Adder : Readout;
+      auto policy = DictGetStr(d, "policy");
+      s.fPolicy = GateDigitizerAdderActor::AdderPolicy::Error;
+      if (policy == "EnergyWinnerPosition")
+        s.fPolicy = GateDigitizerAdderActor::AdderPolicy::EnergyWinnerPosition;
+      if (policy == "EnergyWeightedCentroidPosition")
+        s.fPolicy = GateDigitizerAdderActor::AdderPolicy::
+            EnergyWeightedCentroidPosition;
+      s.fGroupVolumeDepth = DictGetInt(d, "group_depth");
+      s.fDiscretizeVolumeDepth = -1;
+      if (s.fType == Readout)
+        s.fDiscretizeVolumeDepth = DictGetInt(d, "discretize_depth");
+      fVolumeIDFlag = true;
+    } else if (type == "blurring") {
+      s.fType = Blurring;
+      s.fBlurAttributeName = DictGetStr(d, "blur_attribute");
+      s.fBlurMethod = DictGetStr(d, "blur_method");
+      s.fBlurSigma = DictGetDouble(d, "blur_sigma");
+      s.fBlurReferenceValue = DictGetDouble(d, "blur_reference_value");
+      s.fBlurResolution = DictGetDouble(d, "blur_resolution");
+      s.fBlurSlope = DictGetDouble(d, "blur_slope");
+      if (s.fBlurAttributeName != "TotalEnergyDeposit" &&
+          s.fBlurAttributeName != "GlobalTime") {
+        Fatal("Error in GateDigitizerChainActor, only TotalEnergyDeposit or "
+              "GlobalTime can be blurred, while the attribute is " +
+              s.fBlurAttributeName);
+      }
+    } else if (type == "spatial_blurring") {
+      s.fType = SpatialBlurring;
+      s.fBlurSigma3 = DictGetG4ThreeVector(d, "blur_sigma");
+      s.fKeepInSolidLimits = DictGetBool(d, "keep_in_solid_limits");
+      if (s.fKeepInSolidLimits)
+        fVolumeIDFlag = true;
+    } else if (type == "energy_window") {
+      s.fType = EnergyWindow;
+      s.fMin = DictGetDouble(d, "min");
+      s.fMax = DictGetDouble(d, "max");
+    } else {
+      std::ostringstream oss;
+      oss << "Error in GateDigitizerChainActor: unknown stage type '" << type
+          << "'. Must be adder, readout, blurring, spatial_blurring or "
+             "energy_window";
+      Fatal(oss.str());
+    }
+    fStages.push_back(s);
+  }
+}
+
+void GateDigitizerChainActor::StartSimulationAction() {
+  GateVDigitizerWithOutputActor::StartSimulationAction();
+  fIgnoredHitsCount = 0;
+  // check required attributes
+  CheckRequiredAttribute(fInputDigiCollection, "TotalEnergyDeposit");
+  CheckRequiredAttribute(fInputDigiCollection, "PostPosition");
+  CheckRequiredAttribute(fInputDigiCollection, "GlobalTime");
+  if (fVolumeIDFlag)
+    CheckRequiredAttribute(fInputDigiCollection, "PreStepUniqueVolumeID");
+  for (const auto &s : fStages) {
+    if (s.fType == Readout &&
+        (s.fDiscretizeVolumeDepth <= 0 ||
+         s.fDiscretizeVolumeDepth >= GateUniqueVolumeID::MaxDepth)) {
+      Fatal("Error in GateDigitizerChainActor, the depth of the discretize "
+            "volume must be positive (and lower than the max depth)");
+    }
+  }
+}
+
+void GateDigitizerChainActor::DigitInitialize(
+    const std::vector<std::string> &attributes_not_in_filler) {
+  // the attributes of the working buffer are filled explicitly
+  std::vector<std::string> att = attributes_not_in_filler;
+  att.emplace_back("TotalEnergyDeposit");
+  att.emplace_back("PostPosition");
+  att.emplace_back("GlobalTime");
+  GateVDigitizerWithOutputActor::DigitInitialize(att);
+
+  // set output pointers to the attributes needed for computation
+  fOutputEdepAttribute =
+      fOutputDigiCollection->GetDigiAttribute("TotalEnergyDeposit");
+  fOutputPosAttribute = fOutputDigiCollection->GetDigiAttribute("PostPosition");
+  fOutputGlobalTimeAttribute =
+      fOutputDigiCollection->GetDigiAttribute("GlobalTime");
+
+  // set input pointers to the attributes needed for computation
+  auto &l = fThreadLocalData.Get();
+  auto &lr = fThreadLocalVDigitizerData.Get();
+  lr.fInputIter.TrackAttribute("TotalEnergyDeposit", &l.edep);
+  lr.fInputIter.TrackAttribute("PostPosition", &l.pos);
+  lr.fInputIter.TrackAttribute("GlobalTime", &l.time);
+  if (fVolumeIDFlag)
+    lr.fInputIter.TrackAttribute("PreStepUniqueVolumeID", &l.volID);
+}
+
+void GateDigitizerChainActor::BeginOfRunAction(const G4Run *run) {
+  GateVDigitizerWithOutputActor::BeginOfRunAction(run);
+  auto &l = fThreadLocalData.Get();
+  // volumes may move between runs
+  l.fVolumeCenters.Clear();
+  G4ThreeVector translation;
+  G4RotationMatrix rotation;
+  ComputeTransformationFromWorldToVolume(fMotherVolumeName, translation,
+                                         rotation, true);
+  l.fWorldToVolume = G4AffineTransform(rotation.inverse(), translation);
+  ComputeTransformationFromVolumeToWorld(fMotherVolumeName, translation,
+                                         rotation, true);
+  l.fVolumeToWorld = G4AffineTransform(rotation.inverse(), translation);
+  if (run->GetRunID() == 0) {
+    // Init a navigator that will be used by the readout stages
+    auto pvs = G4PhysicalVolumeStore::GetInstance();
+    auto world = pvs->GetVolume("world");
+    l.fNavigator = new G4Navigator();
+    l.fNavigator->SetWorldVolume(world);
+    l.fIgnoredHitsCount = 0;
+  }
+}
+
+void GateDigitizerChainActor::EndOfEventAction(const G4Event * /*unused*/) {
+  auto &l = fThreadLocalData.Get();
+  auto &lr = fThreadLocalVDigitizerData.Get();
+
+  // copy the digi of this event in the working buffer
+  l.fDigis.clear();
+  auto &iter = lr.fInputIter;
+  iter.GoToBegin();
+  while (!iter.IsAtEnd()) {
+    const GateUniqueVolumeID *vid = nullptr;
+    if (fVolumeIDFlag)
+      vid = l.volID->get();
+    l.fDigis.push_back({iter.fIndex, *l.edep, *l.pos, *l.time, vid});
+    iter++;
+  }
+
+  // apply all stages
+  for (const auto &stage : fStages) {
+    if (l.fDigis.empty())
+      break;
+    if (stage.fType == Adder || stage.fType == Readout)
+      ApplyAdder(stage);
+    if (stage.fType == Blurring)
+      ApplyBlurring(stage);
+    if (stage.fType == SpatialBlurring)
+      ApplySpatialBlurring(stage);
+    if (stage.fType == EnergyWindow)
+      ApplyEnergyWindow(stage);
+  }
+
+  // store the final digi (all "Fill" calls are thread local)
+  for (const auto &digi : l.fDigis) {
+    fOutputEdepAttribute->FillDValue(digi.fEdep);
+    fOutputPosAttribute->Fill3Value(digi.fPosition);
+    fOutputGlobalTimeAttribute->FillDValue(digi.fTime);
+    lr.fDigiAttributeFiller->Fill(digi.fIndex);
+  }
+}
+
+void GateDigitizerChainActor::ApplyAdder(const Stage &stage) {
+  // same as GateDigitizerAdderActor (and GateDigitizerReadoutActor)
+  auto &l = fThreadLocalData.Get();
+  auto &map = l.fMapOfDigiInVolume;
+  for (const auto &d : l.fDigis) {
+    if (d.fEdep == 0)
+      continue;
+    auto uid = d.fVolumeID->GetArrayIdUpToDepth(stage.fGroupVolumeDepth);
+    auto *digi = map.Find(uid);
+    if (digi == nullptr) {
+      digi =
+          &map.Insert(uid, GateDigiAdderInVolume(stage.fPolicy, false, false));
+      digi->fVolumeID = d.fVolumeID;
+    }
+    digi->Update(d.fIndex, d.fEdep, d.fPosition, d.fTime);
+  }
+
+  l.fNextDigis.clear();
+  for (auto &h : map) {
+    auto &digi = h.second;
+    digi.Terminate();
+    // Don't store anything if edep is zero
+    if (digi.fFinalEdep <= 0)
+      continue;
+    ChainDigi d{digi.fFinalIndex, digi.fFinalEdep, digi.fFinalPosition,
+                digi.fFinalTime, digi.fVolumeID};
+    if (stage.fType == Readout && !Discretize(stage, d, h.first))
+      continue;
+    l.fNextDigis.push_back(d);
+  }
+  map.Clear();
+  std::swap(l.fDigis, l.fNextDigis);
+}
+
+bool GateDigitizerChainActor::Discretize(
+    const Stage &stage, ChainDigi &digi,
+    const GateUniqueVolumeID::IDArrayType &group_id) {
+  // same as GateDigitizerReadoutActor: no navigation if the group ID is
+  // known at the discretize depth
+  auto &l = fThreadLocalData.Get();
+  const auto depth = stage.fDiscretizeVolumeDepth;
+  auto id = group_id;
+  const auto *vid = digi.fVolumeID;
+  G4TouchableHistory touchable;
+  if (id[depth] == -1) {
+    l.fNavigator->LocateGlobalPointAndUpdateTouchable(digi.fPosition,
+                                                      &touchable);
+    id = GateUniqueVolumeID::ComputeArrayID(&touchable);
+    vid = nullptr;
+  }
+  // the final position may be outside the discretize volume: ignored
+  if (id[depth] == -1) {
+    l.fIgnoredHitsCount++;
+    return false;
+  }
+  for (auto i = depth + 1; i < GateUniqueVolumeID::MaxDepth; i++)
+    id[i] = -1;
+  auto *center = l.fVolumeCenters.Find(id);
+  if (center == nullptr) {
+    // 0,0,0 is the center of the shape: its world position is the
+    // translation of the volume (in the current geometry)
+    G4ThreeVector c;
+    if (vid != nullptr)
+      c = vid->ComputeCurrentTranslation(depth);
+    else
+      c = touchable.GetTranslation(touchable.GetHistoryDepth() - depth);
+    center = &l.fVolumeCenters.Insert(id, c);
+  }
+  digi.fPosition = *center;
+  return true;
+}
+
+void GateDigitizerChainActor::ApplyBlurring(const Stage &stage) {
+  auto &l = fThreadLocalData.Get();
+  for (auto &d : l.fDigis) {
+    // only the attributes of the working buffer can be blurred
+    double &v = stage.fBlurAttributeName == "GlobalTime" ? d.fTime : d.fEdep;
+    if (stage.fBlurMethod == "Gaussian")
+      v = G4RandGauss::shoot(v, stage.fBlurSigma);
+    if (stage.fBlurMethod == "InverseSquare")
+      v = BlurInverseSquare(v, stage.fBlurResolution,
+                            stage.fBlurReferenceValue);
+    if (stage.fBlurMethod == "Linear")
+      v = BlurLinear(v, stage.fBlurSlope, stage.fBlurResolution,
+                     stage.fBlurReferenceValue);
+  }
+}
+
+void GateDigitizerChainActor::ApplySpatialBlurring(const Stage &stage) {
+  // same as GateDigitizerSpatialBlurringActor, the volume is the one of the
+  // (first) hit instead of being located
+  auto &l = fThreadLocalData.Get();
+  for (auto &d : l.fDigis) {
+    auto v = l.fWorldToVolume.TransformPoint(d.fPosition);
+    G4ThreeVector p(G4RandGauss::shoot(v.getX(), stage.fBlurSigma3.getX()),
+                    G4RandGauss::shoot(v.getY(), stage.fBlurSigma3.getY()),
+                    G4RandGauss::shoot(v.getZ(), stage.fBlurSigma3.getZ()));
+    if (stage.fKeepInSolidLimits) {
+      auto *phys_vol = d.fVolumeID->GetVolumeDepthID().back().fVolume;
+      KeepInSolidLimits(p, phys_vol->GetLogicalVolume()->GetSolid());
+    }
+    d.fPosition = l.fVolumeToWorld.TransformPoint(p);
+  }
+}
+
+void GateDigitizerChainActor::ApplyEnergyWindow(const Stage &stage) {
+  auto &l = fThreadLocalData.Get();
+  auto &digis = l.fDigis;
+  digis.erase(std::remove_if(digis.begin(), digis.end(),
+                             [&](const ChainDigi &d) {
+                               return d.fEdep < stage.fMin ||
+                                      d.fEdep >= stage.fMax;
+                             }),
+              digis.end());
+}
+
+void GateDigitizerChainActor::EndOfSimulationWorkerAction(
+    const G4Run *lastRun) {
+  auto &l = fThreadLocalData.Get();
+  {
+    G4AutoLock mutex(&SetChainIgnoredHitsMutex);
+    fIgnoredHitsCount += l.fIgnoredHitsCount;
+  }
+  GateVDigitizerWithOutputActor::EndOfSimulationWorkerAction(lastRun);
+}
@@ -0,0 +1,135 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateDigitizerChainActor_h
+#define GateDigitizerChainActor_h
+
+#include "../GateVActor.h"
+#include "G4Cache.hh"
+#include "G4Navigator.hh"
+#include "GateDigiAdderInVolume.h"
+#include "GateDigiCollection.h"
+#include "GateDigitizerAdderActor.h"
+#include "GateHelpersDigitizer.h"
+#include "GateVDigitizerWithOutputActor.h"
+#include "GateVolumeIDMap.h"
+#include <pybind11/stl.h>
+
+namespace py = pybind11;
+
+/*
+ * Fused digitizer: a sequence of stages (adder, readout, blurring, spatial
+ * blurring, energy window) applied to the hits of each event in a single
+ * working buffer. Only the energy, position, time and volume ID are kept in
+ * the buffer, with the index of the input digi they come from. All other
+ * attributes are copied once, from the input collection, when the final
+ * digi are stored. No intermediate digi collection is created.
+ */
+
+class GateDigitizerChainActor : public GateVDigitizerWithOutputActor {
+
+public:
+  explicit GateDigitizerChainActor(py::dict &user_info);
+
+  ~GateDigitizerChainActor() override;
+
+  // Set the stages (python dict, with volumes converted to depth)
+  void SetStages(std::vector<py::dict> &stages);
+
+  // Called when the simulation start (master thread only)
+  void StartSimulationAction() override;
+
+  // Called every time a Run starts (all threads)
+  void BeginOfRunAction(const G4Run *run) override;
+
+  // Called every time an Event ends (all threads)
+  void EndOfEventAction(const G4Event *event) override;
+
+  // Called by every worker when the simulation is about to end
+  void EndOfSimulationWorkerAction(const G4Run *lastRun) override;
+
+  unsigned long GetIgnoredHitsCount() const { return fIgnoredHitsCount; }
+
+  enum StageType { Adder, Readout, Blurring, SpatialBlurring, EnergyWindow };
+
+  struct Stage {
+    StageType fType;
+    // adder and readout
+    GateDigitizerAdderActor::AdderPolicy fPolicy;
+    int fGroupVolumeDepth;
+    int fDiscretizeVolumeDepth;
+    // blurring
+    std::string fBlurAttributeName;
+    std::string fBlurMethod;
+    double fBlurSigma;
+    double fBlurReferenceValue;
+    double fBlurResolution;
+    double fBlurSlope;
+    // spatial blurring
+    G4ThreeVector fBlurSigma3;
+    bool fKeepInSolidLimits;
+    // energy window
+    double fMin;
+    double fMax;
+  };
+
+  // A digi in the working buffer
+  struct ChainDigi {
+    size_t fIndex; // index in the input digi collection
+    double fEdep;
+    G4ThreeVector fPosition;
+    double fTime;
+    const GateUniqueVolumeID *fVolumeID;
+  };
+
+protected:
+  void DigitInitialize(
+      const std::vector<std::string> &attributes_not_in_filler) override;
+
+  void ApplyAdder(const Stage &stage);
+
+  void ApplyBlurring(const Stage &stage);
+
+  void ApplySpatialBlurring(const Stage &stage);
+
+  void ApplyEnergyWindow(const Stage &stage);
+
+  // Final position of the readout (center of the volume), false if the
+  // position is outside the discretize volume
+  bool Discretize(const Stage &stage, ChainDigi &digi,
+                  const GateUniqueVolumeID::IDArrayType &group_id);
+
+  std::vector<Stage> fStages;
+  bool fVolumeIDFlag;
+  unsigned long fIgnoredHitsCount; // global instance
+
+  GateVDigiAttribute *fOutputEdepAttribute{};
+  GateVDigiAttribute *fOutputPosAttribute{};
+  GateVDigiAttribute *fOutputGlobalTimeAttribute{};
+
+  // During computation (thread local)
+  struct threadLocalT {
+    double *edep;
+    G4ThreeVector *pos;
+    GateUniqueVolumeID::Pointer *volID;
+    double *time;
+    // working buffers (reused across events)
+    std::vector<ChainDigi> fDigis;
+    std::vector<ChainDigi> fNextDigis;
+    GateVolumeIDMap<GateDigiAdderInVolume> fMapOfDigiInVolume;
+    // readout
+    G4Navigator *fNavigator = nullptr;
+    GateVolumeIDMap<G4ThreeVector> fVolumeCenters;
+    unsigned long fIgnoredHitsCount = 0; // thread local instance
+    // transforms of the attached volume (spatial blurring)
+    G4AffineTransform fWorldToVolume;
+    G4AffineTransform fVolumeToWorld;
+  };
+  G4Cache<threadLocalT> fThreadLocalData;
+};
+
+#endif // GateDigitizerChainActor_h
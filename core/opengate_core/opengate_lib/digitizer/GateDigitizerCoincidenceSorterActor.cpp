@@ -0,0 +1,463 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include "GateDigitizerCoincidenceSorterActor.h"
+#include "../GateHelpersDict.h"
+#include "G4Event.hh"
+#include "G4PrimaryVertex.hh"
+#include "G4RunManager.hh"
+#include "GateDigiCollectionManager.h"
+#include "GateTDigiAttribute.h"
+#include <algorithm>
+#include <cfloat>
+#include <iostream>
+#include <iterator>
+#include <sstream>
+
+G4Mutex CoincidenceSorterMutex = G4MUTEX_INITIALIZER;
+
+GateDigitizerCoincidenceSorterActor::GateDigitizerCoincidenceSorterActor(
+    py::dict &user_info)
+    : GateVActor(user_info, true) {
+  // actions
+  fActions.insert("StartSimulationAction");
+  fActions.insert("BeginOfRunAction");
+  fActions.insert("BeginOfEventAction");
+  fActions.insert("EndOfEventAction");
+  fActions.insert("EndOfRunAction");
+  fActions.insert("EndOfSimulationWorkerAction");
+  fActions.insert("EndSimulationAction");
+
+  // options
+  fOutputFilename = DictGetStr(user_info, "output");
+  fInputDigiCollectionName = DictGetStr(user_info, "input_digi_collection");
+  fUserDigiAttributeNames = DictGetVecStr(user_info, "attributes");
+  fClearEveryNEvents = DictGetInt(user_info, "clear_every");
+  fWindow = DictGetDouble(user_info, "window");
+  fDelayedWindowOffset = DictGetDouble(user_info, "delayed_window_offset");
+  fMinTransaxialDistance = DictGetDouble(user_info, "min_transaxial_distance");
+  fMaxBufferSize = DictGetInt(user_info, "max_buffer_size");
+  fThreadBufferSize = DictGetInt(user_info, "thread_buffer_size");
+  fPromptDigiCollectionName = DictGetStr(user_info, "_name");
+  fDelayedDigiCollectionName = fPromptDigiCollectionName + "_delayed";
+
+  // policy
+  auto policy = DictGetStr(user_info, "multiples_policy");
+  if (policy == "takeAllGoods")
+    fPolicy = TakeAllGoods;
+  else if (policy == "takeWinnerOfGoods")
+    fPolicy = TakeWinnerOfGoods;
+  else if (policy == "takeWinnerIfIsGood")
+    fPolicy = TakeWinnerIfIsGood;
+  else if (policy == "takeWinnerIfAllAreGoods")
+    fPolicy = TakeWinnerIfAllAreGoods;
+  else if (policy == "takeIfOnlyOneGood")
+    fPolicy = TakeIfOnlyOneGood;
+  else if (policy == "removeMultiples")
+    fPolicy = RemoveMultiples;
+  else {
+    std::ostringstream oss;
+    oss << "Error in GateDigitizerCoincidenceSorterActor: unknown "
+           "multiples_policy '"
+        << policy << "'";
+    Fatal(oss.str());
+  }
+
+  // init
+  fInputDigiCollection = nullptr;
+  fPromptDigiCollection = nullptr;
+  fDelayedDigiCollection = nullptr;
+  fNumberOfThreads = 1;
+}
+
+GateDigitizerCoincidenceSorterActor::~GateDigitizerCoincidenceSorterActor() =
+    default;
+
+static GateVDigiAttribute *NewDigiAttribute(const std::string &name,
+                                            char type) {
+  if (type == 'D')
+    return new GateTDigiAttribute<double>(name);
+  if (type == 'I')
+    return new GateTDigiAttribute<int>(name);
+  if (type == 'S')
+    return new GateTDigiAttribute<std::string>(name);
+  if (type == '3')
+    return new GateTDigiAttribute<G4ThreeVector>(name);
+  return new GateTDigiAttribute<GateUniqueVolumeID::Pointer>(name);
+}
+
+// Called when the simulation start
+void GateDigitizerCoincidenceSorterActor::StartSimulationAction() {
+  // Get input digi collection
+  auto *hcm = GateDigiCollectionManager::GetInstance();
+  fInputDigiCollection = hcm->GetDigiCollection(fInputDigiCollectionName);
+  CheckRequiredAttribute(fInputDigiCollection, "TotalEnergyDeposit");
+  CheckRequiredAttribute(fInputDigiCollection, "GlobalTime");
+  CheckRequiredAttribute(fInputDigiCollection, "PostPosition");
+
+  // List of stored attributes (all if no attributes are given)
+  auto names = fUserDigiAttributeNames;
+  if (names.empty()) {
+    for (auto *att : fInputDigiCollection->GetDigiAttributes())
+      names.push_back(att->GetDigiAttributeName());
+  }
+  size_t offset_values = 0;
+  size_t offset_strings = 0;
+  size_t offset_ids = 0;
+  for (const auto &name : names) {
+    CheckRequiredAttribute(fInputDigiCollection, name);
+    AttributeType a{};
+    a.fInput = fInputDigiCollection->GetDigiAttribute(name);
+    auto type = a.fInput->GetDigiAttributeType();
+    if (type == 'D' || type == 'I') {
+      a.fOffset = offset_values;
+      offset_values += 1;
+    }
+    if (type == '3') {
+      a.fOffset = offset_values;
+      offset_values += 3;
+    }
+    if (type == 'S') {
+      a.fOffset = offset_strings;
+      offset_strings += 1;
+    }
+    if (type == 'U') {
+      a.fOffset = offset_ids;
+      offset_ids += 1;
+    }
+    fAttributes.push_back(a);
+  }
+
+  // Create the output digi collections (prompts and delayed)
+  fPromptDigiCollection = hcm->NewDigiCollection(fPromptDigiCollectionName);
+  InitOutput(fPromptDigiCollection);
+  if (fDelayedWindowOffset > 0) {
+    fDelayedDigiCollection = hcm->NewDigiCollection(fDelayedDigiCollectionName);
+    InitOutput(fDelayedDigiCollection);
+  }
+
+  // one watermark per thread, no thread has started yet
+  fNumberOfThreads =
+      std::max(1, G4RunManager::GetRunManager()->GetNumberOfThreads());
+  fLastEventTimes.assign(fNumberOfThreads, -DBL_MAX);
+  fThreadSingles.assign(fNumberOfThreads, std::deque<Single>());
+  fSingles.clear();
+}
+
+void GateDigitizerCoincidenceSorterActor::InitOutput(GateDigiCollection *hc) {
+  hc->SetFilenameAndInitRoot(fOutputFilename);
+  for (const std::string suffix : {"1", "2"}) {
+    for (auto &a : fAttributes) {
+      auto *att = NewDigiAttribute(a.fInput->GetDigiAttributeName() + suffix,
+                                   a.fInput->GetDigiAttributeType());
+      hc->InitDigiAttribute(att);
+      a.fOutputs.push_back(att);
+    }
+  }
+  hc->RootInitializeTupleForMaster();
+}
+
+void GateDigitizerCoincidenceSorterActor::BeginOfRunAction(const G4Run *run) {
+  if (G4Threading::IsMultithreadedApplication() &&
+      G4Threading::IsMasterThread())
+    return;
+  auto &l = fThreadLocalData.Get();
+  if (run->GetRunID() == 0) {
+    fPromptDigiCollection->RootInitializeTupleForWorker();
+    if (fDelayedDigiCollection != nullptr)
+      fDelayedDigiCollection->RootInitializeTupleForWorker();
+    l.fInputEdep = &fInputDigiCollection->GetDigiAttribute("TotalEnergyDeposit")
+                        ->GetDValues();
+    l.fInputTime =
+        &fInputDigiCollection->GetDigiAttribute("GlobalTime")->GetDValues();
+    l.fInputPos =
+        &fInputDigiCollection->GetDigiAttribute("PostPosition")->Get3Values();
+  }
+  l.fSingles.clear();
+  l.fLastEventTime = -DBL_MAX;
+  G4AutoLock mutex(&CoincidenceSorterMutex);
+  fLastEventTimes[std::max(G4Threading::G4GetThreadId(), 0)] = -DBL_MAX;
+}
+
+void GateDigitizerCoincidenceSorterActor::BeginOfEventAction(
+    const G4Event *event) {
+  bool must_clear = event->GetEventID() % fClearEveryNEvents == 0;
+  fPromptDigiCollection->FillToRootIfNeeded(must_clear);
+  if (fDelayedDigiCollection != nullptr)
+    fDelayedDigiCollection->FillToRootIfNeeded(must_clear);
+}
+
+void GateDigitizerCoincidenceSorterActor::EndOfEventAction(
+    const G4Event *event) {
+  auto index = fInputDigiCollection->GetBeginOfEventIndex();
+  auto n = fInputDigiCollection->GetSize();
+  // Events are time ordered within a thread: no later single of this thread
+  // can be earlier than the time of this event
+  double t0 = -DBL_MAX;
+  if (event->GetNumberOfPrimaryVertex() > 0)
+    t0 = event->GetPrimaryVertex(0)->GetT0();
+  // The singles are buffered in this thread (no lock), they are only given
+  // to the other threads when the buffer is large enough
+  auto &l = fThreadLocalData.Get();
+  for (auto i = index; i < n; i++) {
+    auto s = NewSingle(i);
+    InsertSingle(l.fSingles, s);
+  }
+  l.fLastEventTime = t0;
+  if (l.fSingles.size() >= fThreadBufferSize)
+    FlushSingles();
+}
+
+GateDigitizerCoincidenceSorterActor::Single
+GateDigitizerCoincidenceSorterActor::NewSingle(size_t index) const {
+  auto &l = fThreadLocalData.Get();
+  Single s;
+  s.fTime = (*l.fInputTime)[index];
+  s.fEdep = (*l.fInputEdep)[index];
+  s.fPosition = (*l.fInputPos)[index];
+  for (const auto &a : fAttributes) {
+    auto type = a.fInput->GetDigiAttributeType();
+    if (type == 'D')
+      s.fValues.push_back(a.fInput->GetDValues()[index]);
+    if (type == 'I')
+      s.fValues.push_back(a.fInput->GetIValues()[index]);
+    if (type == '3') {
+      const auto &v = a.fInput->Get3Values()[index];
+      s.fValues.insert(s.fValues.end(), {v.x(), v.y(), v.z()});
+    }
+    if (type == 'S')
+      s.fStrings.push_back(a.fInput->GetSValues()[index]);
+    if (type == 'U')
+      s.fVolumeIDs.push_back(a.fInput->GetUValues()[index]);
+  }
+  return s;
+}
+
+void GateDigitizerCoincidenceSorterActor::InsertSingle(
+    std::deque<Single> &singles, Single &single) {
+  // keep the buffer sorted by time (mostly appended at the end)
+  auto it =
+      std::upper_bound(singles.begin(), singles.end(), single.fTime,
+                       [](double t, const Single &s) { return t < s.fTime; });
+  singles.insert(it, std::move(single));
+}
+
+void GateDigitizerCoincidenceSorterActor::FlushSingles() {
+  auto &l = fThreadLocalData.Get();
+  {
+    G4AutoLock mutex(&CoincidenceSorterMutex);
+    auto id = std::max(G4Threading::G4GetThreadId(), 0);
+    // the remaining singles of this thread and the new ones are both time
+    // ordered
+    auto &singles = fThreadSingles[id];
+    auto middle = singles.size();
+    std::move(l.fSingles.begin(), l.fSingles.end(),
+              std::back_inserter(singles));
+    std::inplace_merge(
+        singles.begin(), singles.begin() + middle, singles.end(),
+        [](const Single &a, const Single &b) { return a.fTime < b.fTime; });
+    fLastEventTimes[id] = l.fLastEventTime;
+    MergeSingles();
+    ProcessWindows();
+  }
+  l.fSingles.clear();
+  // store the selected coincidences in the output of this thread
+  for (const auto &c : l.fCoincidences)
+    FillCoincidence(c);
+  l.fCoincidences.clear();
+}
+
+void GateDigitizerCoincidenceSorterActor::MergeSingles() {
+  // (mutex must be locked)
+  // No thread can produce a single earlier than the watermark. When all
+  // threads have ended the run, the watermark is DBL_MAX: all is merged
+  auto watermark =
+      *std::min_element(fLastEventTimes.begin(), fLastEventTimes.end());
+  size_t n = 0;
+  std::vector<size_t> heap;
+  for (size_t i = 0; i < fThreadSingles.size(); i++) {
+    n += fThreadSingles[i].size();
+    if (!fThreadSingles[i].empty())
+      heap.push_back(i);
+  }
+  // k-way merge: min heap of the threads, according to their first single
+  auto later = [&](size_t a, size_t b) {
+    return fThreadSingles[a].front().fTime > fThreadSingles[b].front().fTime;
+  };
+  std::make_heap(heap.begin(), heap.end(), later);
+  while (!heap.empty()) {
+    auto &singles = fThreadSingles[heap.front()];
+    // the singles later than the watermark are kept (unless the buffers are
+    // full)
+    if (singles.front().fTime >= watermark &&
+        n + fSingles.size() <= fMaxBufferSize)
+      break;
+    std::pop_heap(heap.begin(), heap.end(), later);
+    InsertSingle(fSingles, singles.front());
+    singles.pop_front();
+    n--;
+    if (singles.empty())
+      heap.pop_back();
+    else
+      std::push_heap(heap.begin(), heap.end(), later);
+  }
+}
+
+void GateDigitizerCoincidenceSorterActor::ProcessWindows() {
+  // (mutex must be locked)
+  auto &pairs = fThreadLocalData.Get().fPairs;
+  auto watermark =
+      *std::min_element(fLastEventTimes.begin(), fLastEventTimes.end());
+  auto length = std::max(fWindow, fDelayedWindowOffset + fWindow);
+  while (!fSingles.empty()) {
+    // the window opened by the first single is complete if no thread can
+    // produce a single before its end (or if the buffer is full)
+    const auto t0 = fSingles.front().fTime;
+    if (t0 + length > watermark && fSingles.size() <= fMaxBufferSize)
+      break;
+    // singles in the prompt window
+    size_t n = 1;
+    while (n < fSingles.size() && fSingles[n].fTime < t0 + fWindow)
+      n++;
+    pairs.clear();
+    for (size_t i = 0; i < n; i++)
+      for (size_t j = i + 1; j < n; j++)
+        pairs.emplace_back(i, j);
+    ApplyPolicy(pairs, false);
+    // singles in the delayed window, paired with the opening single
+    if (fDelayedDigiCollection != nullptr) {
+      pairs.clear();
+      for (size_t k = n; k < fSingles.size(); k++) {
+        if (fSingles[k].fTime >= t0 + fDelayedWindowOffset + fWindow)
+          break;
+        if (fSingles[k].fTime >= t0 + fDelayedWindowOffset)
+          pairs.emplace_back(0, k);
+      }
+      ApplyPolicy(pairs, true);
+    }
+    // the singles of the window do not open other windows
+    fSingles.erase(fSingles.begin(), fSingles.begin() + n);
+  }
+}
+
+void GateDigitizerCoincidenceSorterActor::ApplyPolicy(
+    const std::vector<std::pair<size_t, size_t>> &pairs, bool delayed) {
+  if (pairs.empty())
+    return;
+  size_t nb_goods = 0;
+  size_t winner = 0;
+  size_t winner_of_goods = pairs.size();
+  double max_energy = -DBL_MAX;
+  double max_energy_of_goods = -DBL_MAX;
+  std::vector<bool> goods(pairs.size());
+  for (size_t p = 0; p < pairs.size(); p++) {
+    const auto &s1 = fSingles[pairs[p].first];
+    const auto &s2 = fSingles[pairs[p].second];
+    auto e = s1.fEdep + s2.fEdep;
+    goods[p] = IsGood(s1, s2);
+    if (e > max_energy) {
+      max_energy = e;
+      winner = p;
+    }
+    if (goods[p]) {
+      nb_goods++;
+      if (e > max_energy_of_goods) {
+        max_energy_of_goods = e;
+        winner_of_goods = p;
+      }
+    }
+  }
+  // the coincidences are copied, they are stored when the lock is released
+  auto &coincidences = fThreadLocalData.Get().fCoincidences;
+  auto fill = [&](size_t p) {
+    coincidences.push_back(
+        {fSingles[pairs[p].first], fSingles[pairs[p].second], delayed});
+  };
+  if (fPolicy == TakeAllGoods) {
+    for (size_t p = 0; p < pairs.size(); p++)
+      if (goods[p])
+        fill(p);
+  }
+  if (fPolicy == TakeWinnerOfGoods && nb_goods > 0)
+    fill(winner_of_goods);
+  if (fPolicy == TakeWinnerIfIsGood && goods[winner])
+    fill(winner);
+  if (fPolicy == TakeWinnerIfAllAreGoods && nb_goods == pairs.size())
+    fill(winner);
+  if (fPolicy == TakeIfOnlyOneGood && nb_goods == 1)
+    fill(winner_of_goods);
+  if (fPolicy == RemoveMultiples && pairs.size() == 1 && goods[0])
+    fill(0);
+}
+
+bool GateDigitizerCoincidenceSorterActor::IsGood(const Single &s1,
+                                                 const Single &s2) const {
+  // transaxial distance between the two singles (XY plane)
+  auto dx = s1.fPosition.x() - s2.fPosition.x();
+  auto dy = s1.fPosition.y() - s2.fPosition.y();
+  return dx * dx + dy * dy >= fMinTransaxialDistance * fMinTransaxialDistance;
+}
+
+void GateDigitizerCoincidenceSorterActor::FillCoincidence(
+    const Coincidence &c) {
+  // the output attributes are thread local: the coincidence is stored by
+  // the thread that processed the window
+  // (outputs of an attribute are: prompt 1 and 2, then delayed 1 and 2)
+  size_t k = c.fDelayed ? 2 : 0;
+  for (size_t i = 0; i < 2; i++) {
+    const auto &s = i == 0 ? c.fSingle1 : c.fSingle2;
+    for (const auto &a : fAttributes) {
+      auto *att = a.fOutputs[k + i];
+      auto type = a.fInput->GetDigiAttributeType();
+      if (type == 'D')
+        att->FillDValue(s.fValues[a.fOffset]);
+      if (type == 'I')
+        att->FillIValue((int)s.fValues[a.fOffset]);
+      if (type == '3')
+        att->Fill3Value(G4ThreeVector(s.fValues[a.fOffset],
+                                      s.fValues[a.fOffset + 1],
+                                      s.fValues[a.fOffset + 2]));
+      if (type == 'S')
+        att->FillSValue(s.fStrings[a.fOffset]);
+      if (type == 'U')
+        att->FillUValue(s.fVolumeIDs[a.fOffset]);
+    }
+  }
+}
+
+// Called every time a Run ends
+void GateDigitizerCoincidenceSorterActor::EndOfRunAction(
+    const G4Run * /*run*/) {
+  if (G4Threading::IsMultithreadedApplication() &&
+      G4Threading::IsMasterThread())
+    return;
+  // This thread will not produce any other single: the last thread to
+  // end the run processes all remaining windows
+  fThreadLocalData.Get().fLastEventTime = DBL_MAX;
+  FlushSingles();
+  fPromptDigiCollection->FillToRootIfNeeded(true);
+  if (fDelayedDigiCollection != nullptr)
+    fDelayedDigiCollection->FillToRootIfNeeded(true);
+}
+
+// Called every time a Run ends
+void GateDigitizerCoincidenceSorterActor::EndOfSimulationWorkerAction(
+    const G4Run * /*run*/) {
+  fPromptDigiCollection->Write();
+  if (fDelayedDigiCollection != nullptr)
+    fDelayedDigiCollection->Write();
+}
+
+// Called when the simulation end
+void GateDigitizerCoincidenceSorterActor::EndSimulationAction() {
+  fPromptDigiCollection->Write();
+  fPromptDigiCollection->Close();
+  if (fDelayedDigiCollection != nullptr) {
+    fDelayedDigiCollection->Write();
+    fDelayedDigiCollection->Close();
+  }
+}
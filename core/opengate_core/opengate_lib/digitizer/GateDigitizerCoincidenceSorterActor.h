@@ -0,0 +1,167 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateDigitizerCoincidenceSorterActor_h
+#define GateDigitizerCoincidenceSorterActor_h
+
+#include "../GateVActor.h"
+#include "G4Cache.hh"
+#include "GateDigiCollection.h"
+#include "GateHelpersDigitizer.h"
+#include <deque>
+#include <pybind11/stl.h>
+
+namespace py = pybind11;
+
+/*
+ * Online coincidence sorter. The singles of the input collection are
+ * merged, in time order, in a buffer shared by all threads. Each single that
+ * is not in a previous window opens a coincidence window: the singles in the
+ * window give the prompt coincidences (according to the multiples policy),
+ * and the singles in the delayed window (same width, shifted by the offset)
+ * give the delayed coincidences (randoms estimate).
+ *
+ * Events are time ordered within a thread: each thread first buffers its
+ * own singles, without lock. When this buffer is larger than
+ * thread_buffer_size (or at the end of the run), the thread takes the lock,
+ * provides the time of its last event, and the singles of all threads that
+ * are earlier than the minimum of these times (the watermark) are merged
+ * (k-way merge) in the shared buffer. The windows ending before the
+ * watermark are complete and processed. The shared buffer is bounded: when
+ * it is full, the earliest windows are processed anyway.
+ *
+ * The selected coincidences are stored, after the lock is released, by the
+ * thread that processed the windows (the output of all threads is merged).
+ *
+ * Output: one digi collection for prompts (and one for delayed), with the
+ * attributes of both singles (suffix 1 and 2).
+ */
+
+class GateDigitizerCoincidenceSorterActor : public GateVActor {
+
+public:
+  explicit GateDigitizerCoincidenceSorterActor(py::dict &user_info);
+
+  ~GateDigitizerCoincidenceSorterActor() override;
+
+  // Called when the simulation start (master thread only)
+  void StartSimulationAction() override;
+
+  // Called every time a Run starts (all threads)
+  void BeginOfRunAction(const G4Run *run) override;
+
+  // Called every time an Event starts
+  void BeginOfEventAction(const G4Event *event) override;
+
+  // Called every time a Event ends (all threads)
+  void EndOfEventAction(const G4Event *event) override;
+
+  // Called every time a Run ends (all threads)
+  void EndOfRunAction(const G4Run *run) override;
+
+  // Called when the simulation end (all threads)
+  void EndOfSimulationWorkerAction(const G4Run * /*run*/) override;
+
+  // Called when the simulation end (master thread only)
+  void EndSimulationAction() override;
+
+  enum MultiplesPolicy {
+    TakeAllGoods,
+    TakeWinnerOfGoods,
+    TakeWinnerIfIsGood,
+    TakeWinnerIfAllAreGoods,
+    TakeIfOnlyOneGood,
+    RemoveMultiples
+  };
+
+  struct Single {
+    double fTime;
+    double fEdep;
+    G4ThreeVector fPosition;
+    // values of the stored attributes
+    std::vector<double> fValues;
+    std::vector<std::string> fStrings;
+    std::vector<GateUniqueVolumeID::Pointer> fVolumeIDs;
+  };
+
+protected:
+  std::string fOutputFilename;
+  std::string fInputDigiCollectionName;
+  std::string fPromptDigiCollectionName;
+  std::string fDelayedDigiCollectionName;
+  std::vector<std::string> fUserDigiAttributeNames;
+  GateDigiCollection *fInputDigiCollection;
+  GateDigiCollection *fPromptDigiCollection;
+  GateDigiCollection *fDelayedDigiCollection;
+  int fClearEveryNEvents;
+  double fWindow;
+  double fDelayedWindowOffset;
+  double fMinTransaxialDistance;
+  MultiplesPolicy fPolicy;
+  size_t fMaxBufferSize;
+  size_t fThreadBufferSize;
+  int fNumberOfThreads;
+
+  // Stored attributes: index in the values of a single and output attributes
+  struct AttributeType {
+    GateVDigiAttribute *fInput;
+    size_t fOffset;
+    std::vector<GateVDigiAttribute *> fOutputs;
+  };
+  std::vector<AttributeType> fAttributes;
+
+  // Shared (all threads) time ordered buffer of singles
+  std::deque<Single> fSingles;
+  // Singles given by each thread, not yet merged (later than the watermark)
+  std::vector<std::deque<Single>> fThreadSingles;
+  std::vector<double> fLastEventTimes;
+
+  struct Coincidence {
+    Single fSingle1;
+    Single fSingle2;
+    bool fDelayed;
+  };
+
+  void InitOutput(GateDigiCollection *hc);
+
+  Single NewSingle(size_t index) const;
+
+  static void InsertSingle(std::deque<Single> &singles, Single &single);
+
+  // Give the singles of this thread and process the complete windows
+  void FlushSingles();
+
+  // Merge the singles of all threads up to the watermark (mutex must be
+  // locked)
+  void MergeSingles();
+
+  // Process all complete windows (mutex must be locked)
+  void ProcessWindows();
+
+  void ApplyPolicy(const std::vector<std::pair<size_t, size_t>> &pairs,
+                   bool delayed);
+
+  bool IsGood(const Single &s1, const Single &s2) const;
+
+  void FillCoincidence(const Coincidence &c);
+
+  // During computation
+  struct threadLocalT {
+    std::vector<double> *fInputEdep;
+    std::vector<double> *fInputTime;
+    std::vector<G4ThreeVector> *fInputPos;
+    std::vector<std::pair<size_t, size_t>> fPairs;
+    // time ordered singles of this thread, not yet given to the others
+    std::deque<Single> fSingles;
+    double fLastEventTime;
+    // coincidences selected by this thread, stored when the lock is released
+    std::vector<Coincidence> fCoincidences;
+  };
+  G4Cache<threadLocalT> fThreadLocalData;
+};
+
+#endif // GateDigitizerCoincidenceSorterActor_h
@@ -0,0 +1,62 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include "GateDigitizerDeadTimeActor.h"
+#include "../GateHelpersDict.h"
+#include <cfloat>
+
+G4Mutex SetRejectedDigisMutex = G4MUTEX_INITIALIZER;
+
+GateDigitizerDeadTimeActor::GateDigitizerDeadTimeActor(py::dict &user_info)
+    : GateVDigitizerTimeOrderedActor(user_info) {
+
+  // options
+  fDeadTime = DictGetDouble(user_info, "dead_time");
+  fParalyzable = DictGetStr(user_info, "mode") == "paralyzable";
+
+  // init
+  fRejectedDigisCount = 0;
+}
+
+GateDigitizerDeadTimeActor::~GateDigitizerDeadTimeActor() = default;
+
+void GateDigitizerDeadTimeActor::StartSimulationAction() {
+  GateVDigitizerTimeOrderedActor::StartSimulationAction();
+  fRejectedDigisCount = 0;
+}
+
+void GateDigitizerDeadTimeActor::ProcessDigi(size_t slot) {
+  auto &l = fThreadLocalData.Get();
+  auto &lt = fThreadLocalTimeOrderedData.Get();
+
+  // new volumes are not dead
+  auto v = lt.fVolume[slot];
+  if (v >= l.fDeadTimeEnd.size())
+    l.fDeadTimeEnd.resize(GetNumberOfVolumes(), -DBL_MAX);
+
+  auto &end = l.fDeadTimeEnd[v];
+  auto t = lt.fTime[slot];
+  if (t < end) {
+    l.fRejectedDigisCount++;
+    if (fParalyzable)
+      end = std::max(end, t + fDeadTime);
+  } else {
+    end = t + fDeadTime;
+    FillSlot(slot, lt.fEdep[slot], t);
+  }
+  FreeSlot(slot);
+}
+
+void GateDigitizerDeadTimeActor::EndOfSimulationWorkerAction(
+    const G4Run *lastRun) {
+  auto &l = fThreadLocalData.Get();
+  {
+    G4AutoLock mutex(&SetRejectedDigisMutex);
+    fRejectedDigisCount += l.fRejectedDigisCount;
+  }
+  GateVDigitizerTimeOrderedActor::EndOfSimulationWorkerAction(lastRun);
+}
@@ -0,0 +1,55 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateDigitizerDeadTimeActor_h
+#define GateDigitizerDeadTimeActor_h
+
+#include "GateVDigitizerTimeOrderedActor.h"
+#include <pybind11/stl.h>
+
+namespace py = pybind11;
+
+/*
+ * Digitizer module for dead time, per volume (grouped at a given depth, as
+ * in the adder). The digi are considered in time order; a digi is rejected
+ * if it occurs before the end of the dead time of its volume.
+ * - non paralyzable: only accepted digi start a dead time
+ * - paralyzable: all digi (also the rejected ones) start a dead time
+ */
+
+class GateDigitizerDeadTimeActor : public GateVDigitizerTimeOrderedActor {
+
+public:
+  explicit GateDigitizerDeadTimeActor(py::dict &user_info);
+
+  ~GateDigitizerDeadTimeActor() override;
+
+  // Called when the simulation start (master thread only)
+  void StartSimulationAction() override;
+
+  // Called by every worker when the simulation is about to end
+  void EndOfSimulationWorkerAction(const G4Run *lastRun) override;
+
+  unsigned long GetRejectedDigisCount() const { return fRejectedDigisCount; }
+
+protected:
+  void ProcessDigi(size_t slot) override;
+
+  double fDeadTime;
+  bool fParalyzable;
+  unsigned long fRejectedDigisCount; // global instance
+
+  // During computation (thread local)
+  struct threadLocalT {
+    // end of the dead time of each volume
+    std::vector<double> fDeadTimeEnd;
+    unsigned long fRejectedDigisCount = 0; // thread local instance
+  };
+  G4Cache<threadLocalT> fThreadLocalData;
+};
+
+#endif // GateDigitizerDeadTimeActor_h
@@ -8,6 +8,7 @@
 #include "GateDigitizerEnergyWindowsActor.h"
 #include "../GateHelpersDict.h"
 #include "GateDigiCollectionManager.h"
+#include <algorithm>
 #include <iostream>
 
 GateDigitizerEnergyWindowsActor::GateDigitizerEnergyWindowsActor(
@@ -35,6 +36,7 @@ GateDigitizerEnergyWindowsActor::GateDigitizerEnergyWindowsActor(
     fChannelMin.push_back(DictGetDouble(d, "min"));
     fChannelMax.push_back(DictGetDouble(d, "max"));
   }
+  BuildIntervalIndex();
 
   // init
   fInputDigiCollection = nullptr;
@@ -99,26 +101,49 @@ void GateDigitizerEnergyWindowsActor::EndOfEventAction(
   // If no new hits, do nothing
   if (n <= 0)
     return;
-  // init last energy windows to 'outside' (-1)
-  for (size_t i = 0; i < fChannelDigiCollections.size(); i++) {
-    ApplyThreshold(i, fChannelMin[i], fChannelMax[i]);
-  }
-}
-
-void GateDigitizerEnergyWindowsActor::ApplyThreshold(size_t i, double min,
-                                                     double max) {
   auto &l = fThreadLocalData.Get();
   // get the vector of values
   auto &edep = *l.fInputEdep;
-  // get the index of the first hit for this event
-  auto index = fInputDigiCollection->GetBeginOfEventIndex();
-  // fill all the hits
-  for (size_t n = index; n < fInputDigiCollection->GetSize(); n++) {
-    auto e = edep[n];
-    if (e >= min and e < max) { // FIXME put in doc. strictly or not ?
-      l.fFillers[i]->Fill(index);
-      l.fLastEnergyWindowId = i;
+  // fill all the hits (single pass, whatever the number of channels)
+  for (size_t i = index; i < fInputDigiCollection->GetSize(); i++) {
+    // find the elementary interval that contains the energy
+    // (channels are [min, max[ )
+    auto e = edep[i];
+    auto it = std::upper_bound(fBoundaries.begin(), fBoundaries.end(), e);
+    if (it == fBoundaries.begin() || it == fBoundaries.end())
+      continue;
+    auto k = it - fBoundaries.begin() - 1;
+    for (auto c = fIntervalOffsets[k]; c < fIntervalOffsets[k + 1]; c++) {
+      auto channel = fIntervalChannels[c];
+      l.fFillers[channel]->Fill(i);
+      // the last energy window is the largest channel id
+      l.fLastEnergyWindowId = std::max(l.fLastEnergyWindowId, (int)channel);
+    }
+  }
+}
+
+void GateDigitizerEnergyWindowsActor::BuildIntervalIndex() {
+  /*
+   The sorted boundaries of all channels define elementary intervals
+   [b_k, b_k+1[ ; each one is covered by a fixed list of channels
+   (windows may overlap). The list of interval k is
+   fIntervalChannels[fIntervalOffsets[k] .. fIntervalOffsets[k+1][
+   */
+  fBoundaries.clear();
+  fBoundaries.insert(fBoundaries.end(), fChannelMin.begin(), fChannelMin.end());
+  fBoundaries.insert(fBoundaries.end(), fChannelMax.begin(), fChannelMax.end());
+  std::sort(fBoundaries.begin(), fBoundaries.end());
+  fBoundaries.erase(std::unique(fBoundaries.begin(), fBoundaries.end()),
+                    fBoundaries.end());
+  fIntervalOffsets.assign(1, 0);
+  fIntervalChannels.clear();
+  for (size_t k = 0; k + 1 < fBoundaries.size(); k++) {
+    for (size_t c = 0; c < fChannelMin.size(); c++) {
+      if (fChannelMin[c] <= fBoundaries[k] &&
+          fBoundaries[k + 1] <= fChannelMax[c])
+        fIntervalChannels.push_back(c);
     }
+    fIntervalOffsets.push_back(fIntervalChannels.size());
   }
 }
 
@@ -63,7 +63,13 @@ protected:
   std::vector<double> fChannelMax;
   int fClearEveryNEvents;
 
-  void ApplyThreshold(size_t i, double min, double max);
+  // Precomputed index: channels that contain each interval between the
+  // sorted boundaries of all channels
+  std::vector<double> fBoundaries;
+  std::vector<size_t> fIntervalOffsets;
+  std::vector<size_t> fIntervalChannels;
+
+  void BuildIntervalIndex();
 
   // During computation
   struct threadLocalT {
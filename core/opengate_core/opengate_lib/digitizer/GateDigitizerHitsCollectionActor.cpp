@@ -7,6 +7,7 @@
 
 #include "GateDigitizerHitsCollectionActor.h"
 #include "../GateHelpersDict.h"
+#include "../GateUniqueVolumeIDManager.h"
 #include "G4RunManager.hh"
 #include "GateDigiCollectionManager.h"
 
@@ -28,6 +29,14 @@ GateDigitizerHitsCollectionActor::GateDigitizerHitsCollectionActor(
   fDebug = DictGetBool(user_info, "debug");
   fClearEveryNEvents = DictGetInt(user_info, "clear_every");
   fKeepZeroEdep = DictGetBool(user_info, "keep_zero_edep");
+  fFlushEveryNDigis = DictGetInt(user_info, "flush_every_n_digis");
+  auto max_bytes = DictGetLongLong(user_info, "flush_max_bytes");
+  if (max_bytes < 0)
+    Fatal("The option flush_max_bytes of the actor " + fHitsCollectionName +
+          " must be positive (or 0 to disable it)");
+  fFlushMaxBytes = (size_t)max_bytes;
+  fAsyncWriteFlag = DictGetBool(user_info, "async_write");
+  fKeepInMemoryFlag = DictGetBool(user_info, "keep_in_memory");
   // init
   fHits = nullptr;
 }
@@ -43,6 +52,17 @@ void GateDigitizerHitsCollectionActor::StartSimulationAction() {
   fHits->SetFilenameAndInitRoot(fOutputFilename);
   fHits->InitDigiAttributesFromNames(fUserDigiAttributeNames);
   fHits->RootInitializeTupleForMaster();
+  // Volume IDs of the (repeated) volumes are created before the run
+  for (auto *att : fHits->GetDigiAttributes()) {
+    if (att->GetDigiAttributeType() == 'U') {
+      auto *m = GateUniqueVolumeIDManager::GetInstance();
+      m->InitializeVolumeIDs(fMotherVolumeName);
+      break;
+    }
+  }
+  fHits->SetFlushPolicy(0, fFlushEveryNDigis, fFlushMaxBytes);
+  fHits->SetAsyncWriteFlag(fAsyncWriteFlag);
+  fHits->SetKeepInMemoryFlag(fKeepInMemoryFlag);
 }
 
 // Called every time a Run starts
@@ -62,9 +82,12 @@ void GateDigitizerHitsCollectionActor::BeginOfEventAction(
      memory (lower is better). Default fClearEveryNEvents value is 1. Some other
      actors may need hits from several events, so we leave the option to keep
      more events. It only fills to root if needed.
+     Independently, the hits are also flushed when the number of digis (or the
+     memory) of this thread reaches the flush limits.
    */
   bool must_clear = event->GetEventID() % fClearEveryNEvents == 0;
-  fHits->FillToRootIfNeeded(must_clear);
+  if (must_clear || !fHits->FlushIfNeeded())
+    fHits->FillToRootIfNeeded(must_clear);
 }
 
 // Called every time a batch of step must be processed
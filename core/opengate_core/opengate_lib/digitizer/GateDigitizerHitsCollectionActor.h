@@ -50,6 +50,10 @@ protected:
   bool fDebug;
   bool fKeepZeroEdep;
   int fClearEveryNEvents;
+  int fFlushEveryNDigis;
+  size_t fFlushMaxBytes;
+  bool fAsyncWriteFlag;
+  bool fKeepInMemoryFlag;
 };
 
 #endif // GateHitsCollectionActor_h
@@ -0,0 +1,84 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include "GateDigitizerPileupActor.h"
+#include "../GateHelpersDict.h"
+
+GateDigitizerPileupActor::GateDigitizerPileupActor(py::dict &user_info)
+    : GateVDigitizerTimeOrderedActor(user_info) {
+
+  // options
+  fPileupTime = DictGetDouble(user_info, "pileup_time");
+}
+
+GateDigitizerPileupActor::~GateDigitizerPileupActor() = default;
+
+void GateDigitizerPileupActor::StartSimulationAction() {
+  GateVDigitizerTimeOrderedActor::StartSimulationAction();
+  CheckRequiredAttribute(fInputDigiCollection, "TotalEnergyDeposit");
+}
+
+void GateDigitizerPileupActor::ProcessDigi(size_t slot) {
+  auto &l = fThreadLocalData.Get();
+  auto &lt = fThreadLocalTimeOrderedData.Get();
+
+  auto v = lt.fVolume[slot];
+  if (v >= l.fPendingSlot.size()) {
+    auto n = GetNumberOfVolumes();
+    l.fPendingSlot.resize(n, NoSlot);
+    l.fFirstTime.resize(n, 0);
+    l.fEdepSum.resize(n, 0);
+  }
+  auto t = lt.fTime[slot];
+  auto e = lt.fEdep[slot];
+
+  // end of the pile-up window: store the pending digi
+  auto &pending = l.fPendingSlot[v];
+  bool active = pending != NoSlot;
+  if (active && t - l.fFirstTime[v] >= fPileupTime)
+    FillPendingDigi(v);
+
+  // start a new pending digi
+  if (pending == NoSlot) {
+    pending = slot;
+    l.fFirstTime[v] = t;
+    l.fEdepSum[v] = e;
+    if (!active)
+      l.fActiveVolumes.push_back(v);
+    return;
+  }
+
+  // pile-up: merge with the pending digi, keep the highest energy one
+  l.fEdepSum[v] += e;
+  if (e > lt.fEdep[pending]) {
+    FreeSlot(pending);
+    pending = slot;
+  } else
+    FreeSlot(slot);
+}
+
+void GateDigitizerPileupActor::EndOfProcessDigi(double time) {
+  // no later digi can be merged with the pending digi whose window ends
+  // before this time
+  auto &l = fThreadLocalData.Get();
+  size_t n = 0;
+  for (auto v : l.fActiveVolumes) {
+    if (l.fFirstTime[v] + fPileupTime <= time)
+      FillPendingDigi(v);
+    else
+      l.fActiveVolumes[n++] = v;
+  }
+  l.fActiveVolumes.resize(n);
+}
+
+void GateDigitizerPileupActor::FillPendingDigi(size_t volume) {
+  auto &l = fThreadLocalData.Get();
+  auto &slot = l.fPendingSlot[volume];
+  FillSlot(slot, l.fEdepSum[volume], l.fFirstTime[volume]);
+  FreeSlot(slot);
+  slot = NoSlot;
+}
@@ -0,0 +1,63 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateDigitizerPileupActor_h
+#define GateDigitizerPileupActor_h
+
+#include "GateVDigitizerTimeOrderedActor.h"
+#include <pybind11/stl.h>
+
+namespace py = pybind11;
+
+/*
+ * Digitizer module for pile-up, per volume (grouped at a given depth, as in
+ * the adder). The digi are considered in time order; all digi of a volume
+ * that occur less than the pile-up time after the first one are merged in a
+ * single digi: the energies are summed, the time is the one of the first
+ * digi, all other attributes (position etc) are the ones of the digi with
+ * the highest energy.
+ *
+ * A merged digi may gather digi of several events: it is stored once no
+ * later digi can occur in its pile-up window.
+ */
+
+class GateDigitizerPileupActor : public GateVDigitizerTimeOrderedActor {
+
+public:
+  explicit GateDigitizerPileupActor(py::dict &user_info);
+
+  ~GateDigitizerPileupActor() override;
+
+  // Called when the simulation start (master thread only)
+  void StartSimulationAction() override;
+
+protected:
+  void ProcessDigi(size_t slot) override;
+
+  void EndOfProcessDigi(double time) override;
+
+  // Store the pending digi of the volume in the output
+  void FillPendingDigi(size_t volume);
+
+  double fPileupTime;
+
+  static constexpr size_t NoSlot = static_cast<size_t>(-1);
+
+  // During computation (thread local)
+  struct threadLocalT {
+    // pending digi of each volume: slot of the highest energy digi, time of
+    // the first digi and sum of the energies
+    std::vector<size_t> fPendingSlot;
+    std::vector<double> fFirstTime;
+    std::vector<double> fEdepSum;
+    // volumes with a pending digi
+    std::vector<size_t> fActiveVolumes;
+  };
+  G4Cache<threadLocalT> fThreadLocalData;
+};
+
+#endif // GateDigitizerPileupActor_h
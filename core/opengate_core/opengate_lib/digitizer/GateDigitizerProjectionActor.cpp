@@ -10,18 +10,24 @@
 #include "../GateHelpersImage.h"
 #include "G4RunManager.hh"
 #include "GateDigiCollectionManager.h"
+#include "itkImageFileWriter.h"
 #include <iostream>
 
+G4Mutex AddProjectionMutex = G4MUTEX_INITIALIZER;
+
 GateDigitizerProjectionActor::GateDigitizerProjectionActor(py::dict &user_info)
     : GateVActor(user_info, true) {
   fActions.insert("StartSimulationAction");
   fActions.insert("EndOfEventAction");
   fActions.insert("BeginOfRunAction");
+  fActions.insert("EndOfRunAction");
   fOutputFilename = DictGetStr(user_info, "output");
   auto r = DictGetMatrix(user_info, "detector_orientation_matrix");
   fDetectorOrientationMatrix = ConvertToG4RotationMatrix(r);
   fInputDigiCollectionNames =
       DictGetVecStr(user_info, "input_digi_collections");
+  fOutputPerRunFlag = DictGetBool(user_info, "output_per_run");
+  fOriginAsImageCenterFlag = DictGetBool(user_info, "origin_as_image_center");
   fImage = ImageType::New();
 }
 
@@ -53,17 +59,22 @@ void GateDigitizerProjectionActor::BeginOfRunAction(const G4Run *run) {
   // Important ! The volume may have moved, so we re-attach each run
   AttachImageToVolume<ImageType>(fImage, fPhysicalVolumeName, G4ThreeVector(),
                                  fDetectorOrientationMatrix);
+  // precompute the point to index transform of this run
+  l.fIndexer.Update(fImage);
+
+  // thread local counts: one plane per channel
+  auto size = fImage->GetLargestPossibleRegion().GetSize();
+  l.fPlaneSizeX = size[0];
+  l.fPlaneSize = size[0] * size[1];
+  l.fCounts.assign(l.fPlaneSize * fInputDigiCollections.size(), 0);
 }
 
 void GateDigitizerProjectionActor::EndOfEventAction(const G4Event * /*event*/) {
-  auto run = G4RunManager::GetRunManager()->GetCurrentRun()->GetRunID();
-  for (size_t channel = 0; channel < fInputDigiCollections.size(); channel++) {
-    auto slice = channel + run * fInputDigiCollections.size();
-    ProcessSlice(slice, channel);
-  }
+  for (size_t channel = 0; channel < fInputDigiCollections.size(); channel++)
+    ProcessSlice(channel);
 }
 
-void GateDigitizerProjectionActor::ProcessSlice(long slice, size_t channel) {
+void GateDigitizerProjectionActor::ProcessSlice(size_t channel) {
   auto &l = fThreadLocalData.Get();
   auto *hc = fInputDigiCollections[channel];
   auto index = hc->GetBeginOfEventIndex();
@@ -74,30 +85,61 @@ void GateDigitizerProjectionActor::ProcessSlice(long slice, size_t channel) {
 
   // FIXME store other attributes somewhere ?
   const auto &pos = *l.fInputPos[channel];
-  ImageType::PointType point;
   ImageType::IndexType pindex;
+  auto *plane = l.fCounts.data() + channel * l.fPlaneSize;
 
   // loop on channels
   for (size_t i = index; i < hc->GetSize(); i++) {
     // get position from input collection
-    for (auto j = 0; j < 3; j++)
-      point[j] = pos[i][j];
+    bool isInside = l.fIndexer.TransformPointToIndex(pos[i], pindex);
+    // (the slice is set according to the channel and the run)
+    if (isInside)
+      plane[pindex[0] + pindex[1] * l.fPlaneSizeX]++;
+  }
+}
 
-    bool isInside = fImage->TransformPhysicalPointToIndex(point, pindex);
-    if (isInside) {
-      // force the slice according to the channel
-      pindex[2] = slice;
-      ImageAddValue<ImageType>(fImage, pindex, 1);
-    } else {
-      // Should never be here (?)
-      /*DDDV(pos);
-      DDE(point);
-      DDE(isInside);
-      DDE(pindex);
-      DDE(slice);
-      DDE(fImage->GetLargestPossibleRegion().GetSize());
-      nout++;
-      DDE(nout);*/
-    }
+void GateDigitizerProjectionActor::EndOfRunAction(const G4Run *run) {
+  auto &l = fThreadLocalData.Get();
+  if (l.fCounts.empty())
+    return;
+  // Add the counts of this thread to the slices of the run
+  auto nb_channels = fInputDigiCollections.size();
+  size_t first_slice = fOutputPerRunFlag ? 0 : run->GetRunID() * nb_channels;
+  auto *values = fImage->GetBufferPointer() + first_slice * l.fPlaneSize;
+  G4AutoLock mutex(&AddProjectionMutex);
+  for (size_t i = 0; i < l.fCounts.size(); i++)
+    values[i] += l.fCounts[i];
+  std::fill(l.fCounts.begin(), l.fCounts.end(), 0);
+}
+
+void GateDigitizerProjectionActor::EndOfRunMasterAction(int run_id) {
+  if (!fOutputPerRunFlag)
+    return;
+  WriteRunImage(fRunFilenames[run_id]);
+  // the same image is used for the next run (the last one is kept)
+  if (run_id + 1 < (int)fRunFilenames.size())
+    fImage->FillBuffer(0);
+}
+
+void GateDigitizerProjectionActor::WriteRunImage(const std::string &filename) {
+  // same origin and spacing as the final output (see the python side)
+  auto origin = fImage->GetOrigin();
+  auto spacing = fImage->GetSpacing();
+  auto size = fImage->GetLargestPossibleRegion().GetSize();
+  auto output_origin = origin;
+  auto output_spacing = spacing;
+  if (fOriginAsImageCenterFlag) {
+    for (auto i = 0; i < 3; i++)
+      output_origin[i] = -(size[i] * spacing[i]) / 2.0 + spacing[i] / 2.0;
   }
+  output_spacing[2] = 1;
+  output_origin[2] = 0;
+  fImage->SetOrigin(output_origin);
+  fImage->SetSpacing(output_spacing);
+  auto writer = itk::ImageFileWriter<ImageType>::New();
+  writer->SetFileName(filename);
+  writer->SetInput(fImage);
+  writer->Update();
+  fImage->SetOrigin(origin);
+  fImage->SetSpacing(spacing);
 }
@@ -8,6 +8,7 @@
 #ifndef OPENGATE_CORE_OPENGATEDIGITIZERPROJECTIONACTOR_H
 #define OPENGATE_CORE_OPENGATEDIGITIZERPROJECTIONACTOR_H
 
+#include "../GateHelpersImage.h"
 #include "../GateVActor.h"
 #include "G4Cache.hh"
 #include "GateDigiCollection.h"
@@ -20,6 +21,11 @@ namespace py = pybind11;
 /*
  * Actor that create some projections (2D images) from several Digi Collections
  * in the same volume.
+ *
+ * Each thread counts the digi in its own buffer (one 2D plane per channel),
+ * the buffers are added to the image at the end of the run. With the per run
+ * output option, the image only contains the planes of one run, written at
+ * the end of every run.
  */
 
 class GateDigitizerProjectionActor : public GateVActor {
@@ -38,18 +44,31 @@ public:
   // Called every time an Event ends (all threads)
   void EndOfEventAction(const G4Event *event) override;
 
+  // Called every time a Run ends (all threads)
+  void EndOfRunAction(const G4Run *run) override;
+
+  // Called every time a Run has ended in the Master
+  void EndOfRunMasterAction(int run_id) override;
+
   // Image type is 3D float by default
   typedef itk::Image<float, 3> ImageType;
   ImageType::Pointer fImage;
   std::string fPhysicalVolumeName;
 
+  // per run output
+  std::vector<std::string> fRunFilenames;
+
 protected:
   std::string fOutputFilename;
   std::vector<std::string> fInputDigiCollectionNames;
   std::vector<GateDigiCollection *> fInputDigiCollections;
   G4RotationMatrix fDetectorOrientationMatrix;
+  bool fOutputPerRunFlag;
+  bool fOriginAsImageCenterFlag;
+
+  void ProcessSlice(size_t channel);
 
-  void ProcessSlice(long slice, size_t channel);
+  void WriteRunImage(const std::string &filename);
 
   G4ThreeVector fPreviousTranslation;
   G4RotationMatrix fPreviousRotation;
@@ -57,6 +76,12 @@ protected:
   // During computation
   struct threadLocalT {
     std::vector<std::vector<G4ThreeVector> *> fInputPos;
+    // point to index transform (updated at each run)
+    GateImageIndexer<ImageType> fIndexer;
+    // counts of this thread, one plane per channel
+    std::vector<double> fCounts;
+    size_t fPlaneSizeX = 0;
+    size_t fPlaneSize = 0;
   };
   G4Cache<threadLocalT> fThreadLocalData;
 };
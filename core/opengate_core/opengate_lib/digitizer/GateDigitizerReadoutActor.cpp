@@ -29,14 +29,17 @@ void GateDigitizerReadoutActor::StartSimulationAction() {
   GateDigitizerAdderActor::StartSimulationAction();
   fIgnoredHitsCount = 0;
   // check param
-  if (fDiscretizeVolumeDepth <= 0) {
+  if (fDiscretizeVolumeDepth <= 0 ||
+      fDiscretizeVolumeDepth >= GateUniqueVolumeID::MaxDepth) {
     Fatal("Error in GateDigitizerReadoutActor, depth (fDiscretizeVolumeDepth) "
-          "must be positive");
+          "must be positive (and lower than the max depth)");
   }
 }
 
 void GateDigitizerReadoutActor::BeginOfRunAction(const G4Run *run) {
   GateDigitizerAdderActor::BeginOfRunAction(run);
+  // volumes may move between runs: the centers are computed again
+  fThreadLocalReadoutData.Get().fVolumeCenters.Clear();
   if (run->GetRunID() == 0) {
     // Init a navigator that will be used to find the transform
     auto pvs = G4PhysicalVolumeStore::GetInstance();
@@ -69,22 +72,30 @@ void GateDigitizerReadoutActor::EndOfEventAction(const G4Event * /*unused*/) {
 
     // Don't store if edep is zero
     if (digi.fFinalEdep > 0) {
-      // Discretize: find the volume that contains the position
-      G4TouchableHistory fTouchableHistory;
-      lro.fNavigator->LocateGlobalPointAndUpdateTouchable(digi.fFinalPosition,
-                                                          &fTouchableHistory);
-      auto vid = GateUniqueVolumeID::New(&fTouchableHistory);
-
+      // Discretize: the volume ID of the group is known (no navigation) if
+      // the group depth is deeper than the discretize depth
+      auto id = h.first;
+      const auto *vid = digi.fVolumeID;
+      G4TouchableHistory touchable;
+      if (id[fDiscretizeVolumeDepth] == -1) {
+        // find the volume that contains the position
+        lro.fNavigator->LocateGlobalPointAndUpdateTouchable(digi.fFinalPosition,
+                                                            &touchable);
+        id = GateUniqueVolumeID::ComputeArrayID(&touchable);
+        vid = nullptr;
+      }
       /* When computing the centroid, the final position maybe outside the
        * DiscretizeVolume. In that case, we ignore the hits */
-      if (fDiscretizeVolumeDepth >= vid->GetDepth()) {
+      if (id[fDiscretizeVolumeDepth] == -1) {
         lro.fIgnoredHitsCount++;
         continue;
       }
-      auto tr = vid->GetLocalToWorldTransform(fDiscretizeVolumeDepth);
-      G4ThreeVector c; // 0,0,0 is the center of the shape
-      tr->ApplyPointTransform(c);
-      digi.fFinalPosition.set(c.getX(), c.getY(), c.getZ());
+      for (auto i = fDiscretizeVolumeDepth + 1; i < id.size(); i++)
+        id[i] = -1;
+      auto *center = lro.fVolumeCenters.Find(id);
+      if (center == nullptr)
+        center = &AddVolumeCenter(id, vid, &touchable);
+      digi.fFinalPosition = *center;
 
       // (all "Fill" calls are thread local)
       fOutputEdepAttribute->FillDValue(digi.fFinalEdep);
@@ -95,7 +106,23 @@ void GateDigitizerReadoutActor::EndOfEventAction(const G4Event * /*unused*/) {
   }
 
   // reset the structure of digi
-  l.fMapOfDigiInVolume.clear();
+  l.fMapOfDigiInVolume.Clear();
+}
+
+const G4ThreeVector &GateDigitizerReadoutActor::AddVolumeCenter(
+    const GateUniqueVolumeID::IDArrayType &id, const GateUniqueVolumeID *vid,
+    const G4VTouchable *touchable) {
+  // 0,0,0 is the center of the shape: its world position is the translation
+  // of the volume (from the current geometry, the volume may have moved since
+  // the volume ID was created, or from the located touchable)
+  G4ThreeVector center;
+  if (vid != nullptr)
+    center = vid->ComputeCurrentTranslation(fDiscretizeVolumeDepth);
+  else {
+    auto depth = touchable->GetHistoryDepth() - (int)fDiscretizeVolumeDepth;
+    center = touchable->GetTranslation(depth);
+  }
+  return fThreadLocalReadoutData.Get().fVolumeCenters.Insert(id, center);
 }
 
 void GateDigitizerReadoutActor::EndOfSimulationWorkerAction(
@@ -15,6 +15,7 @@
 #include "GateDigitizerAdderActor.h"
 #include "GateHelpersDigitizer.h"
 #include "GateTDigiAttribute.h"
+#include "GateVolumeIDMap.h"
 #include <pybind11/stl.h>
 
 namespace py = pybind11;
@@ -24,6 +25,9 @@ namespace py = pybind11;
  * discretization of the final position.
  *
  * The final position is computed according to the center of the given volume
+ * When the volume ID of the group of hits is known up to the discretize depth
+ * (group volume inside the discretize volume), the center is directly used,
+ * otherwise the volume is found by navigation. Centers are cached per thread.
  *
  */
 
@@ -57,9 +61,16 @@ protected:
   size_t fDiscretizeVolumeDepth;
   unsigned long fIgnoredHitsCount; // global instance
 
+  // Store the center of the volume at the discretize depth (world coordinates)
+  const G4ThreeVector &
+  AddVolumeCenter(const GateUniqueVolumeID::IDArrayType &id,
+                  const GateUniqueVolumeID *vid, const G4VTouchable *touchable);
+
   struct threadLocalReadoutT {
     G4Navigator *fNavigator = nullptr;
     unsigned long fIgnoredHitsCount; // thread local instance
+    // volume ID (up to the discretize depth) to volume center
+    GateVolumeIDMap<G4ThreeVector> fVolumeCenters;
   };
   G4Cache<threadLocalReadoutT> fThreadLocalReadoutData;
 };
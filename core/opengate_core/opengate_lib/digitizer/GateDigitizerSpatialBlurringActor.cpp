@@ -10,7 +10,6 @@
 #include "../GateHelpersGeometry.h"
 #include "GateDigiAdderInVolume.h"
 #include "GateDigiCollectionManager.h"
-#include <G4VoxelLimits.hh>
 #include <Randomize.hh>
 #include <iostream>
 
@@ -109,31 +108,7 @@ void GateDigitizerSpatialBlurringActor::BlurCurrentThreeVectorValue() {
                   G4RandGauss::shoot(v.getZ(), fBlurSigma3.getZ()));
 
   if (fKeepInSolidLimits) {
-    // check limits according to the volume
-    G4VoxelLimits limits;
-    G4double Xmin, Xmax, Ymin, Ymax, Zmin, Zmax;
-    G4AffineTransform at;
-
-    auto solid = phys_vol->GetLogicalVolume()->GetSolid();
-    solid->CalculateExtent(kXAxis, limits, at, Xmin, Xmax);
-    solid->CalculateExtent(kYAxis, limits, at, Ymin, Ymax);
-    solid->CalculateExtent(kZAxis, limits, at, Zmin, Zmax);
-
-    static const double tiny = 1 * CLHEP::nm;
-
-    if (p.getX() < Xmin)
-      p.setX(Xmin + tiny);
-    if (p.getY() < Ymin)
-      p.setY(Ymin + tiny);
-    if (p.getZ() < Zmin)
-      p.setZ(Zmin + tiny);
-
-    if (p.getX() > Xmax)
-      p.setX(Xmax - tiny);
-    if (p.getY() > Ymax)
-      p.setY(Ymax - tiny);
-    if (p.getZ() > Zmax)
-      p.setZ(Zmax - tiny);
+    KeepInSolidLimits(p, phys_vol->GetLogicalVolume()->GetSolid());
   }
 
   // convert back to global position
@@ -6,6 +6,9 @@
    -------------------------------------------------- */
 
 #include "GateHelpersDigitizer.h"
+#include <G4VSolid.hh>
+#include <G4VoxelLimits.hh>
+#include <Randomize.hh>
 
 // Check attribute
 void CheckRequiredAttribute(const GateDigiCollection *hc,
@@ -18,6 +21,51 @@ void CheckRequiredAttribute(const GateDigiCollection *hc,
   }
 }
 
+double BlurInverseSquare(double value, double resolution,
+                         double reference_value) {
+  // https://github.com/OpenGATE/Gate/blob/develop/source/digits_hits/src/GateBlurring.cc
+  // https://github.com/OpenGATE/Gate/blob/develop/source/digits_hits/src/GateInverseSquareBlurringLaw.cc
+  auto v = resolution * (sqrt(reference_value) / sqrt(value));
+  auto x = G4RandGauss::shoot(value, (v * value) * fwhm_to_sigma);
+  return x;
+}
+
+double BlurLinear(double value, double slope, double resolution,
+                  double reference_value) {
+  // https://github.com/OpenGATE/Gate/blob/develop/source/digits_hits/src/GateBlurring.cc
+  // https://github.com/OpenGATE/Gate/blob/develop/source/digits_hits/src/GateLinearBlurringLaw.cc
+  auto v = slope * (value - reference_value) + resolution;
+  auto x = G4RandGauss::shoot(value, (v * value) * fwhm_to_sigma);
+  return x;
+}
+
+void KeepInSolidLimits(G4ThreeVector &p, const G4VSolid *solid) {
+  // check limits according to the volume
+  G4VoxelLimits limits;
+  G4double Xmin, Xmax, Ymin, Ymax, Zmin, Zmax;
+  G4AffineTransform at;
+
+  solid->CalculateExtent(kXAxis, limits, at, Xmin, Xmax);
+  solid->CalculateExtent(kYAxis, limits, at, Ymin, Ymax);
+  solid->CalculateExtent(kZAxis, limits, at, Zmin, Zmax);
+
+  static const double tiny = 1 * CLHEP::nm;
+
+  if (p.getX() < Xmin)
+    p.setX(Xmin + tiny);
+  if (p.getY() < Ymin)
+    p.setY(Ymin + tiny);
+  if (p.getZ() < Zmin)
+    p.setZ(Zmin + tiny);
+
+  if (p.getX() > Xmax)
+    p.setX(Xmax - tiny);
+  if (p.getY() > Ymax)
+    p.setY(Ymax - tiny);
+  if (p.getZ() > Zmax)
+    p.setZ(Zmax - tiny);
+}
+
 GateDigiAttributesFiller::GateDigiAttributesFiller(
     GateDigiCollection *input, GateDigiCollection *output,
     const std::set<std::string> &names) {
@@ -16,6 +16,17 @@
 void CheckRequiredAttribute(const GateDigiCollection *hc,
                             const std::string &name);
 
+// Blurring laws, value blurred with a resolution (FWHM, relative) computed
+// according to a reference value
+double BlurInverseSquare(double value, double resolution,
+                         double reference_value);
+
+double BlurLinear(double value, double slope, double resolution,
+                  double reference_value);
+
+// Move the (local) position inside the extent of the solid, if outside
+void KeepInSolidLimits(G4ThreeVector &p, const G4VSolid *solid);
+
 class GateDigiAttributesFiller {
 public:
   GateDigiAttributesFiller(GateDigiCollection *input,
@@ -86,6 +86,43 @@ void GateTDigiAttribute<GateUniqueVolumeID::Pointer>::FillUValue(
   threadLocalData.Get().fValues.push_back(value);
 }
 
+template <>
+py::object GateTDigiAttributeBuffer<double>::ToNumpy(py::handle base) const {
+  return py::array_t<double>(fValues.size(), fValues.data(), base);
+}
+
+template <>
+py::object GateTDigiAttributeBuffer<int>::ToNumpy(py::handle base) const {
+  return py::array_t<int>(fValues.size(), fValues.data(), base);
+}
+
+template <>
+py::object
+GateTDigiAttributeBuffer<G4ThreeVector>::ToNumpy(py::handle base) const {
+  // G4ThreeVector stores its three components as contiguous doubles
+  std::vector<py::ssize_t> shape = {(py::ssize_t)fValues.size(), 3};
+  std::vector<py::ssize_t> strides = {sizeof(G4ThreeVector), sizeof(double)};
+  const auto *data =
+      fValues.empty() ? nullptr : reinterpret_cast<const double *>(&fValues[0]);
+  return py::array_t<double>(shape, strides, data, base);
+}
+
+template <>
+py::object
+GateTDigiAttributeBuffer<std::string>::ToNumpy(py::handle /*base*/) const {
+  return py::cast(fValues);
+}
+
+template <>
+py::object GateTDigiAttributeBuffer<GateUniqueVolumeID::Pointer>::ToNumpy(
+    py::handle /*base*/) const {
+  std::vector<std::string> ids;
+  ids.reserve(fValues.size());
+  for (const auto &v : fValues)
+    ids.push_back(v->fID);
+  return py::cast(ids);
+}
+
 template <> void GateTDigiAttribute<double>::FillToRoot(size_t index) const {
   auto *ram = G4RootAnalysisManager::Instance();
   auto v = threadLocalData.Get().fValues[index];
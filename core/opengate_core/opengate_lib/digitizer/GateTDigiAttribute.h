@@ -51,6 +51,12 @@ public:
 
   virtual void Clear() override;
 
+  virtual GateVDigiAttributeBuffer *NewBuffer() const override;
+
+  virtual void SwapValues(GateVDigiAttributeBuffer *buffer) override;
+
+  virtual void AppendValuesTo(GateVDigiAttributeBuffer *buffer) const override;
+
   virtual std::string Dump(int i) const override;
 
 protected:
@@ -62,6 +68,22 @@ protected:
   void InitDefaultProcessHitsFunction();
 };
 
+template <class T>
+class GateTDigiAttributeBuffer : public GateVDigiAttributeBuffer {
+public:
+  size_t GetSize() const override { return fValues.size(); }
+
+  void Clear() override { fValues.clear(); }
+
+  GateVDigiAttributeBuffer *Clone() const override {
+    return new GateTDigiAttributeBuffer<T>(*this);
+  }
+
+  py::object ToNumpy(py::handle base) const override;
+
+  std::vector<T> fValues;
+};
+
 #include "GateTDigiAttribute.icc"
 
 #endif // GateTDigiAttribute_h
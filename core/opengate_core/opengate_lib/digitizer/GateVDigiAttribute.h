@@ -11,8 +11,32 @@
 #include "../GateHelpers.h"
 #include "../GateUniqueVolumeID.h"
 #include "G4TouchableHistory.hh"
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
 
+namespace py = pybind11;
+
+/*
+ * Values of an attribute that have been detached from the thread that filled
+ * them (see GateVDigiAttribute::SwapValues). They can be written in a shard
+ * file by another thread (see GateDigiCollectionsAsyncWriter).
+ */
+class GateVDigiAttributeBuffer {
+public:
+  virtual ~GateVDigiAttributeBuffer() = default;
+
+  virtual size_t GetSize() const = 0;
+
+  virtual void Clear() = 0;
+
+  // New buffer with a copy of the values
+  virtual GateVDigiAttributeBuffer *Clone() const = 0;
+
+  // Numpy array of the values, without copy (except for strings, as a list).
+  // The base object must keep the buffer alive.
+  virtual py::object ToNumpy(py::handle base) const = 0;
+};
+
 class GateVDigiAttribute {
 public:
   GateVDigiAttribute(std::string vname, char vtype);
@@ -51,6 +75,15 @@ public:
 
   virtual void Clear() = 0;
 
+  // Create an empty buffer for the values of this attribute
+  virtual GateVDigiAttributeBuffer *NewBuffer() const = 0;
+
+  // Swap the values of the current thread with the ones of the buffer
+  virtual void SwapValues(GateVDigiAttributeBuffer *buffer) = 0;
+
+  // Append the values of the current thread at the end of the buffer
+  virtual void AppendValuesTo(GateVDigiAttributeBuffer *buffer) const = 0;
+
   void SetDigiAttributeId(int id) { fDigiAttributeId = id; }
 
   void SetTupleId(int id) { fTupleId = id; }
@@ -0,0 +1,81 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include "GateVDigiCollectionWriter.h"
+#include "../GateHelpers.h"
+#include "GateDigiCollection.h"
+#include "GateDigiCollectionHdf5Writer.h"
+#include "GateDigiCollectionNpyWriter.h"
+
+namespace {
+// filename without extension, and extension (with the dot)
+std::pair<std::string, std::string> SplitExtension(const std::string &f) {
+  auto dot = f.find_last_of('.');
+  auto slash = f.find_last_of("/\\");
+  if (dot == std::string::npos || (slash != std::string::npos && dot < slash))
+    return {f, ""};
+  return {f.substr(0, dot), f.substr(dot)};
+}
+} // namespace
+
+std::string GateVDigiCollectionWriter::GetFormat(const std::string &filename) {
+  auto ext = SplitExtension(filename).second;
+  if (ext == ".npy")
+    return "npy";
+  if (ext == ".h5" || ext == ".hdf5")
+    return "hdf5";
+  return "root";
+}
+
+bool GateVDigiCollectionWriter::IsAvailable(const std::string &format) {
+  if (format == "hdf5") {
+#if USE_HDF5
+    return true;
+#else
+    return false;
+#endif
+  }
+  return format == "root" || format == "npy";
+}
+
+GateVDigiCollectionWriter *
+GateVDigiCollectionWriter::New(const std::string &format) {
+  if (format == "npy")
+    return new GateDigiCollectionNpyWriter();
+  if (format == "hdf5")
+    return new GateDigiCollectionHdf5Writer();
+  Fatal("Unknown output format '" + format +
+        "' for DigiCollection (known: npy, hdf5)");
+  return nullptr;
+}
+
+std::string
+GateVDigiCollectionWriter::GetShardFilename(const std::string &filename,
+                                            int thread) {
+  auto s = SplitExtension(filename);
+  return s.first + ".thread" + std::to_string(thread) + s.second;
+}
+
+std::string
+GateVDigiCollectionWriter::GetIndexFilename(const std::string &filename) {
+  return SplitExtension(filename).first + ".index.json";
+}
+
+void GateVDigiCollectionWriter::Append(GateDigiCollection *hc) {
+  if (hc->GetSize() == 0)
+    return;
+  auto &atts = hc->GetDigiAttributes();
+  if (fBuffers.empty())
+    for (auto *att : atts)
+      fBuffers.emplace_back(att->NewBuffer());
+  for (size_t i = 0; i < atts.size(); i++)
+    atts[i]->SwapValues(fBuffers[i].get());
+  AppendBuffers(fBuffers);
+  // the values are given back to the thread
+  for (size_t i = 0; i < atts.size(); i++)
+    atts[i]->SwapValues(fBuffers[i].get());
+}
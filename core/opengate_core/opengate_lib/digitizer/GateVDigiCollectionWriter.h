@@ -0,0 +1,90 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateVDigiCollectionWriter_h
+#define GateVDigiCollectionWriter_h
+
+#include "GateVDigiAttribute.h"
+#include <memory>
+#include <string>
+#include <vector>
+
+class GateDigiCollection;
+
+template <class T> class GateTDigiAttributeBuffer;
+
+/*
+ * Output of a DigiCollection in a non root format (npy, hdf5).
+ * Unlike root, there is no merge: each thread writes its own file (a
+ * "shard"), and a small index file (json) lists all the shards, so that
+ * readers can concatenate them lazily (see gate.read_digi_collection_shards)
+ *
+ * - output "hits.npy" -> shards "hits.thread0.npy", "hits.thread1.npy", ...
+ *                     -> index  "hits.index.json"
+ * - one writer per thread (see GateDigiCollection::FillToRootIfNeeded)
+ * - the writer only does plain file I/O on detached values (AppendBuffers),
+ *   so it can be owned by a background I/O thread (async output, see
+ *   GateDigiCollectionsAsyncWriter)
+ * - strings are stored with a fixed size (fStringSize), longer ones are cut
+ */
+
+class GateVDigiCollectionWriter {
+public:
+  typedef std::vector<std::unique_ptr<GateVDigiAttributeBuffer>> BuffersType;
+
+  virtual ~GateVDigiCollectionWriter() = default;
+
+  // Output format from the filename extension ("root", "npy" or "hdf5")
+  static std::string GetFormat(const std::string &filename);
+
+  // True if the format can be written by this build (hdf5 is optional)
+  static bool IsAvailable(const std::string &format);
+
+  // New writer for the given format (not root)
+  static GateVDigiCollectionWriter *New(const std::string &format);
+
+  // Filename of the shard for a given thread
+  static std::string GetShardFilename(const std::string &filename, int thread);
+
+  // Filename of the index file
+  static std::string GetIndexFilename(const std::string &filename);
+
+  // Create the shard file, for the attributes of the collection
+  virtual void Open(const std::string &filename, GateDigiCollection *hc) = 0;
+
+  // Append all the values of the current thread (they are swapped with
+  // the buffers of the writer, then swapped back: no copy)
+  void Append(GateDigiCollection *hc);
+
+  // Append the values of the buffers (one per attribute, same order as in
+  // the collection given to Open)
+  virtual void AppendBuffers(const BuffersType &buffers) = 0;
+
+  // Finalize the shard file
+  virtual void Close() = 0;
+
+  std::string GetFilename() const { return fFilename; }
+
+  size_t GetNumberOfRows() const { return fNumberOfRows; }
+
+  static const size_t fStringSize = 64;
+
+protected:
+  // (GateTDigiAttribute.h must be included where it is used)
+  template <class T>
+  static const std::vector<T> &GetValues(const GateVDigiAttributeBuffer *b) {
+    return static_cast<const GateTDigiAttributeBuffer<T> *>(b)->fValues;
+  }
+
+  std::string fFilename;
+  size_t fNumberOfRows = 0;
+  // type of the attributes (D I S 3 U), set by Open
+  std::vector<char> fTypes;
+  BuffersType fBuffers;
+};
+
+#endif // GateVDigiCollectionWriter_h
@@ -0,0 +1,225 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include "GateVDigitizerTimeOrderedActor.h"
+#include "G4Event.hh"
+#include "G4PrimaryVertex.hh"
+#include <algorithm>
+#include <cfloat>
+
+GateVDigitizerTimeOrderedActor::GateVDigitizerTimeOrderedActor(
+    py::dict &user_info)
+    : GateVDigitizerWithOutputActor(user_info, true) {
+
+  // actions
+  fActions.insert("EndOfEventAction");
+
+  // init
+  fGroupVolumeDepth = -1;
+  fNumberOfValues = 0;
+  fNumberOfStrings = 0;
+  fNumberOfVolumeIDs = 0;
+}
+
+GateVDigitizerTimeOrderedActor::~GateVDigitizerTimeOrderedActor() = default;
+
+void GateVDigitizerTimeOrderedActor::SetGroupVolumeDepth(int depth) {
+  fGroupVolumeDepth = depth;
+}
+
+void GateVDigitizerTimeOrderedActor::StartSimulationAction() {
+  GateVDigitizerWithOutputActor::StartSimulationAction();
+  CheckRequiredAttribute(fInputDigiCollection, "GlobalTime");
+  CheckRequiredAttribute(fInputDigiCollection, "PreStepUniqueVolumeID");
+
+  // Offsets of the values of the output attributes in a slot
+  fAttributes.clear();
+  fNumberOfValues = 0;
+  fNumberOfStrings = 0;
+  fNumberOfVolumeIDs = 0;
+  for (auto *att : fOutputDigiCollection->GetDigiAttributes()) {
+    AttributeType a{};
+    a.fOutput = att;
+    a.fInput =
+        fInputDigiCollection->GetDigiAttribute(att->GetDigiAttributeName());
+    a.fType = att->GetDigiAttributeType();
+    if (a.fType == 'D' || a.fType == 'I') {
+      a.fOffset = fNumberOfValues;
+      fNumberOfValues += 1;
+    }
+    if (a.fType == '3') {
+      a.fOffset = fNumberOfValues;
+      fNumberOfValues += 3;
+    }
+    if (a.fType == 'S') {
+      a.fOffset = fNumberOfStrings;
+      fNumberOfStrings += 1;
+    }
+    if (a.fType == 'U') {
+      a.fOffset = fNumberOfVolumeIDs;
+      fNumberOfVolumeIDs += 1;
+    }
+    fAttributes.push_back(a);
+  }
+
+  // energy and time are stored explicitly (they may be modified)
+  fOutputEdepAttribute = nullptr;
+  fOutputGlobalTimeAttribute = nullptr;
+  if (fOutputDigiCollection->IsDigiAttributeExists("TotalEnergyDeposit"))
+    fOutputEdepAttribute =
+        fOutputDigiCollection->GetDigiAttribute("TotalEnergyDeposit");
+  if (fOutputDigiCollection->IsDigiAttributeExists("GlobalTime"))
+    fOutputGlobalTimeAttribute =
+        fOutputDigiCollection->GetDigiAttribute("GlobalTime");
+}
+
+void GateVDigitizerTimeOrderedActor::DigitInitialize(
+    const std::vector<std::string> &attributes_not_in_filler) {
+  // no filler: all attributes are copied from the slots
+  auto a = attributes_not_in_filler;
+  for (const auto &name : fOutputDigiCollection->GetDigiAttributeNames())
+    a.push_back(name);
+  GateVDigitizerWithOutputActor::DigitInitialize(a);
+
+  // set input pointers to the attributes needed for computation
+  auto &l = fThreadLocalTimeOrderedData.Get();
+  l.fInputTime =
+      &fInputDigiCollection->GetDigiAttribute("GlobalTime")->GetDValues();
+  l.fInputEdep = nullptr;
+  if (fInputDigiCollection->IsDigiAttributeExists("TotalEnergyDeposit"))
+    l.fInputEdep = &fInputDigiCollection->GetDigiAttribute("TotalEnergyDeposit")
+                        ->GetDValues();
+  l.fInputVolumeID =
+      &fInputDigiCollection->GetDigiAttribute("PreStepUniqueVolumeID")
+           ->GetUValues();
+}
+
+void GateVDigitizerTimeOrderedActor::EndOfEventAction(const G4Event *event) {
+  auto &l = fThreadLocalTimeOrderedData.Get();
+  auto &buffer = l.fBuffer;
+  auto &time = l.fTime;
+
+  // insert the digi of this event in the time ordered buffer
+  auto begin = fInputDigiCollection->GetBeginOfEventIndex();
+  auto end = fInputDigiCollection->GetSize();
+  for (auto i = begin; i < end; i++) {
+    auto slot = NewSlot(i);
+    auto it =
+        std::upper_bound(buffer.begin(), buffer.end(), time[slot],
+                         [&time](double t, size_t s) { return t < time[s]; });
+    buffer.insert(it, slot);
+  }
+
+  // The digi of the next events will occur after the start of this event
+  if (event->GetNumberOfPrimaryVertex() == 0)
+    return;
+  ProcessDigiUntil(event->GetPrimaryVertex(0)->GetT0());
+}
+
+void GateVDigitizerTimeOrderedActor::ProcessDigiUntil(double time) {
+  auto &l = fThreadLocalTimeOrderedData.Get();
+  auto &buffer = l.fBuffer;
+  while (!buffer.empty() && l.fTime[buffer.front()] < time) {
+    auto slot = buffer.front();
+    buffer.pop_front();
+    ProcessDigi(slot);
+  }
+  EndOfProcessDigi(time);
+}
+
+void GateVDigitizerTimeOrderedActor::EndOfRunAction(const G4Run *run) {
+  // no more digi in this run
+  ProcessDigiUntil(DBL_MAX);
+  GateVDigitizerWithOutputActor::EndOfRunAction(run);
+}
+
+size_t GateVDigitizerTimeOrderedActor::GetNumberOfVolumes() const {
+  return fThreadLocalTimeOrderedData.Get().fVolumeIndex.Size();
+}
+
+size_t GateVDigitizerTimeOrderedActor::NewSlot(size_t index) {
+  auto &l = fThreadLocalTimeOrderedData.Get();
+  // reuse a free slot, or allocate a new one
+  size_t slot;
+  if (!l.fFreeSlots.empty()) {
+    slot = l.fFreeSlots.back();
+    l.fFreeSlots.pop_back();
+  } else {
+    slot = l.fTime.size();
+    l.fTime.push_back(0);
+    l.fEdep.push_back(0);
+    l.fVolume.push_back(0);
+    l.fValues.resize(l.fValues.size() + fNumberOfValues);
+    l.fStrings.resize(l.fStrings.size() + fNumberOfStrings);
+    l.fVolumeIDs.resize(l.fVolumeIDs.size() + fNumberOfVolumeIDs);
+  }
+
+  // time, energy and compact index of the volume
+  l.fTime[slot] = (*l.fInputTime)[index];
+  l.fEdep[slot] = l.fInputEdep != nullptr ? (*l.fInputEdep)[index] : 0;
+  auto uid = (*l.fInputVolumeID)[index]->GetArrayIdUpToDepth(fGroupVolumeDepth);
+  auto *v = l.fVolumeIndex.Find(uid);
+  if (v == nullptr)
+    v = &l.fVolumeIndex.Insert(uid, l.fVolumeIndex.Size());
+  l.fVolume[slot] = *v;
+
+  // values of the output attributes
+  auto *values = l.fValues.data() + slot * fNumberOfValues;
+  auto *strings = l.fStrings.data() + slot * fNumberOfStrings;
+  auto *ids = l.fVolumeIDs.data() + slot * fNumberOfVolumeIDs;
+  for (const auto &a : fAttributes) {
+    if (a.fType == 'D')
+      values[a.fOffset] = a.fInput->GetDValues()[index];
+    if (a.fType == 'I')
+      values[a.fOffset] = a.fInput->GetIValues()[index];
+    if (a.fType == '3') {
+      const auto &p = a.fInput->Get3Values()[index];
+      values[a.fOffset] = p.x();
+      values[a.fOffset + 1] = p.y();
+      values[a.fOffset + 2] = p.z();
+    }
+    if (a.fType == 'S')
+      strings[a.fOffset] = a.fInput->GetSValues()[index];
+    if (a.fType == 'U')
+      ids[a.fOffset] = a.fInput->GetUValues()[index];
+  }
+  return slot;
+}
+
+void GateVDigitizerTimeOrderedActor::FreeSlot(size_t slot) {
+  auto &l = fThreadLocalTimeOrderedData.Get();
+  // release the volume IDs (shared pointers)
+  auto *ids = l.fVolumeIDs.data() + slot * fNumberOfVolumeIDs;
+  for (size_t i = 0; i < fNumberOfVolumeIDs; i++)
+    ids[i] = nullptr;
+  l.fFreeSlots.push_back(slot);
+}
+
+void GateVDigitizerTimeOrderedActor::FillSlot(size_t slot, double edep,
+                                              double time) {
+  auto &l = fThreadLocalTimeOrderedData.Get();
+  const auto *values = l.fValues.data() + slot * fNumberOfValues;
+  const auto *strings = l.fStrings.data() + slot * fNumberOfStrings;
+  const auto *ids = l.fVolumeIDs.data() + slot * fNumberOfVolumeIDs;
+  for (const auto &a : fAttributes) {
+    if (a.fOutput == fOutputEdepAttribute)
+      a.fOutput->FillDValue(edep);
+    else if (a.fOutput == fOutputGlobalTimeAttribute)
+      a.fOutput->FillDValue(time);
+    else if (a.fType == 'D')
+      a.fOutput->FillDValue(values[a.fOffset]);
+    else if (a.fType == 'I')
+      a.fOutput->FillIValue((int)values[a.fOffset]);
+    else if (a.fType == '3')
+      a.fOutput->Fill3Value(G4ThreeVector(
+          values[a.fOffset], values[a.fOffset + 1], values[a.fOffset + 2]));
+    else if (a.fType == 'S')
+      a.fOutput->FillSValue(strings[a.fOffset]);
+    else if (a.fType == 'U')
+      a.fOutput->FillUValue(ids[a.fOffset]);
+  }
+}
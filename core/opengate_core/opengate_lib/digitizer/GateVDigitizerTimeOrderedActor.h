@@ -0,0 +1,116 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateVDigitizerTimeOrderedActor_h
+#define GateVDigitizerTimeOrderedActor_h
+
+#include "G4Cache.hh"
+#include "GateVDigitizerWithOutputActor.h"
+#include "GateVolumeIDMap.h"
+#include <deque>
+#include <pybind11/stl.h>
+
+namespace py = pybind11;
+
+/*
+ * Base class for digitizer modules that consider the digi of a thread in
+ * time order, across events (dead time, pile-up).
+ *
+ * The digi of an event are copied in slots (compact arrays of values, one
+ * slot per digi) and inserted in a time ordered buffer. Events are time
+ * ordered within a thread and digi occur after the start of their event:
+ * at the end of an event, all buffered digi earlier than the start of this
+ * event are complete and are given, in time order, to ProcessDigi. All
+ * remaining digi are processed at the end of the run.
+ *
+ * Each digi has the compact index of its volume (volume ID up to the group
+ * depth), so that the state of the volumes can be stored in plain vectors.
+ * The state is thread local: in MT, each thread considers its own digi.
+ */
+
+class GateVDigitizerTimeOrderedActor : public GateVDigitizerWithOutputActor {
+
+public:
+  explicit GateVDigitizerTimeOrderedActor(py::dict &user_info);
+
+  ~GateVDigitizerTimeOrderedActor() override;
+
+  void SetGroupVolumeDepth(int depth);
+
+  // Called when the simulation start (master thread only)
+  void StartSimulationAction() override;
+
+  // Called every time an Event ends (all threads)
+  void EndOfEventAction(const G4Event *event) override;
+
+  // Called every time a Run ends (all threads)
+  void EndOfRunAction(const G4Run *run) override;
+
+protected:
+  void DigitInitialize(
+      const std::vector<std::string> &attributes_not_in_filler) override;
+
+  // Called for each digi, in time order. The slot must be released (with
+  // FreeSlot) when it is not needed anymore.
+  virtual void ProcessDigi(size_t slot) = 0;
+
+  // Called after the digi earlier than 'time' have been processed: no later
+  // digi will occur before 'time' (DBL_MAX at the end of the run)
+  virtual void EndOfProcessDigi(double /*time*/) {}
+
+  // Number of volumes (compact indices), per thread
+  size_t GetNumberOfVolumes() const;
+
+  // Copy the input digi (index) in a new slot
+  size_t NewSlot(size_t index);
+
+  // Store the digi of the slot in the output, with the given energy and time
+  void FillSlot(size_t slot, double edep, double time);
+
+  void FreeSlot(size_t slot);
+
+  // Process all buffered digi earlier than time
+  void ProcessDigiUntil(double time);
+
+  int fGroupVolumeDepth;
+
+  // Output attributes: type and offset of the values in a slot
+  struct AttributeType {
+    GateVDigiAttribute *fInput;
+    GateVDigiAttribute *fOutput;
+    char fType;
+    size_t fOffset;
+  };
+  std::vector<AttributeType> fAttributes;
+  size_t fNumberOfValues;
+  size_t fNumberOfStrings;
+  size_t fNumberOfVolumeIDs;
+  GateVDigiAttribute *fOutputEdepAttribute{};
+  GateVDigiAttribute *fOutputGlobalTimeAttribute{};
+
+  // During computation (thread local)
+  struct threadLocalTimeOrderedT {
+    std::vector<double> *fInputTime;
+    std::vector<double> *fInputEdep;
+    std::vector<GateUniqueVolumeID::Pointer> *fInputVolumeID;
+    // compact index of each volume
+    GateVolumeIDMap<size_t> fVolumeIndex;
+    // slots: time, energy, volume and values of the attributes
+    std::vector<double> fTime;
+    std::vector<double> fEdep;
+    std::vector<size_t> fVolume;
+    std::vector<double> fValues;
+    std::vector<std::string> fStrings;
+    std::vector<GateUniqueVolumeID::Pointer> fVolumeIDs;
+    std::vector<size_t> fFreeSlots;
+    // time ordered buffer of slots
+    std::deque<size_t> fBuffer;
+  };
+  G4Cache<threadLocalTimeOrderedT> fThreadLocalTimeOrderedData;
+};
+
+#endif // GateVDigitizerTimeOrderedActor_h
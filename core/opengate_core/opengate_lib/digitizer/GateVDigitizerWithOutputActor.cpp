@@ -30,6 +30,8 @@ GateVDigitizerWithOutputActor::GateVDigitizerWithOutputActor(
   fOutputDigiCollectionName = DictGetStr(user_info, "_name");
   fUserSkipDigiAttributeNames = DictGetVecStr(user_info, "skip_attributes");
   fClearEveryNEvents = DictGetInt(user_info, "clear_every");
+  fAsyncWriteFlag = DictGetBool(user_info, "async_write");
+  fKeepInMemoryFlag = DictGetBool(user_info, "keep_in_memory");
 
   // init
   fOutputDigiCollection = nullptr;
@@ -49,6 +51,8 @@ void GateVDigitizerWithOutputActor::StartSimulationAction() {
   fOutputDigiCollection->SetFilenameAndInitRoot(fOutputFilename);
   fOutputDigiCollection->InitDigiAttributesFromCopy(
       fInputDigiCollection, fUserSkipDigiAttributeNames);
+  fOutputDigiCollection->SetAsyncWriteFlag(fAsyncWriteFlag);
+  fOutputDigiCollection->SetKeepInMemoryFlag(fKeepInMemoryFlag);
 
   if (fInitializeRootTupleForMasterFlag)
     fOutputDigiCollection->RootInitializeTupleForMaster();
@@ -55,6 +55,8 @@ protected:
   GateDigiCollection *fInputDigiCollection;
   std::vector<std::string> fUserSkipDigiAttributeNames;
   int fClearEveryNEvents;
+  bool fAsyncWriteFlag;
+  bool fKeepInMemoryFlag;
 
   bool fInitializeRootTupleForMasterFlag;
 
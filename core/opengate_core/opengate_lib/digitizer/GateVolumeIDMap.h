@@ -0,0 +1,112 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#ifndef GateVolumeIDMap_h
+#define GateVolumeIDMap_h
+
+#include "../GateUniqueVolumeID.h"
+#include <cstddef>
+#include <cstdint>
+#include <vector>
+
+/*
+ * Map from a volume ID (fixed size array of copy numbers, see
+ * GateUniqueVolumeID::GetArrayIdUpToDepth) to a value.
+ *
+ * Open addressing (linear probing) hash table of indices in a vector of
+ * entries. Used to group digi per volume in every event:
+ * - no string and no allocation per key
+ * - Clear is O(1) (generation counter), the memory is reused across events
+ * - iteration is in insertion order (deterministic output)
+ */
+
+template <class T> class GateVolumeIDMap {
+public:
+  typedef GateUniqueVolumeID::IDArrayType KeyType;
+  typedef std::pair<KeyType, T> EntryType;
+
+  GateVolumeIDMap() { Rehash(64); }
+
+  // Pointer to the value, nullptr if the key is not in the map
+  T *Find(const KeyType &key) {
+    auto i = FindSlot(key, Hash(key));
+    if (fSlots[i].fGeneration != fGeneration)
+      return nullptr;
+    return &fEntries[fSlots[i].fIndex].second;
+  }
+
+  // The key must not be in the map. The reference is valid until the next
+  // Insert.
+  T &Insert(const KeyType &key, const T &value) {
+    if (2 * (fEntries.size() + 1) > fSlots.size())
+      Rehash(2 * fSlots.size());
+    auto i = FindSlot(key, Hash(key));
+    fSlots[i].fIndex = fEntries.size();
+    fSlots[i].fGeneration = fGeneration;
+    fEntries.emplace_back(key, value);
+    return fEntries.back().second;
+  }
+
+  void Clear() {
+    fEntries.clear();
+    fGeneration++;
+    if (fGeneration == 0)
+      Rehash(fSlots.size());
+  }
+
+  size_t Size() const { return fEntries.size(); }
+
+  typename std::vector<EntryType>::iterator begin() { return fEntries.begin(); }
+
+  typename std::vector<EntryType>::iterator end() { return fEntries.end(); }
+
+  static uint64_t Hash(const KeyType &key) {
+    // FNV-1a on the copy numbers (until the first -1)
+    uint64_t h = 14695981039346656037ULL;
+    for (auto v : key) {
+      if (v == -1)
+        break;
+      h ^= static_cast<uint32_t>(v);
+      h *= 1099511628211ULL;
+    }
+    return h;
+  }
+
+protected:
+  struct SlotType {
+    uint32_t fIndex = 0;
+    uint32_t fGeneration = 0;
+  };
+
+  size_t FindSlot(const KeyType &key, uint64_t h) const {
+    // the number of slots is a power of 2, there is always an empty slot
+    auto mask = fSlots.size() - 1;
+    auto i = h & mask;
+    while (fSlots[i].fGeneration == fGeneration &&
+           fEntries[fSlots[i].fIndex].first != key)
+      i = (i + 1) & mask;
+    return i;
+  }
+
+  void Rehash(size_t n) {
+    // generation 0 is never used by the entries: all slots are empty
+    fSlots.assign(n, SlotType());
+    if (fGeneration == 0)
+      fGeneration = 1;
+    for (size_t e = 0; e < fEntries.size(); e++) {
+      auto i = FindSlot(fEntries[e].first, Hash(fEntries[e].first));
+      fSlots[i].fIndex = e;
+      fSlots[i].fGeneration = fGeneration;
+    }
+  }
+
+  std::vector<EntryType> fEntries;
+  std::vector<SlotType> fSlots;
+  uint32_t fGeneration = 0;
+};
+
+#endif // GateVolumeIDMap_h
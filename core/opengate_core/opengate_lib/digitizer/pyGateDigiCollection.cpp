@@ -0,0 +1,52 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include <pybind11/numpy.h>
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+
+namespace py = pybind11;
+
+#include "GateDigiCollection.h"
+#include "GateDigiCollectionManager.h"
+
+void init_GateDigiCollection(py::module &m) {
+
+  py::class_<GateDigiCollection,
+             std::unique_ptr<GateDigiCollection, py::nodelete>>(
+      m, "GateDigiCollection")
+      .def("GetName",
+           [](GateDigiCollection &hc) { return std::string(hc.GetName()); })
+      .def("GetDigiAttributeNames", &GateDigiCollection::GetDigiAttributeNames)
+      .def("SetKeepInMemoryFlag", &GateDigiCollection::SetKeepInMemoryFlag)
+      .def("GetColumn",
+           [](GateDigiCollection &hc, const std::string &name) -> py::object {
+             auto column = hc.GetColumn(name);
+             if (column == nullptr)
+               return py::none();
+             // The array is a view on the column: the capsule shares the
+             // ownership of the column, that is never modified while it is
+             // alive (the collection appends the next values to a copy)
+             auto *owner =
+                 new std::shared_ptr<GateVDigiAttributeBuffer>(column);
+             py::capsule base(owner, [](void *p) {
+               delete static_cast<std::shared_ptr<GateVDigiAttributeBuffer> *>(
+                   p);
+             });
+             return column->ToNumpy(base);
+           });
+
+  py::class_<GateDigiCollectionManager,
+             std::unique_ptr<GateDigiCollectionManager, py::nodelete>>(
+      m, "GateDigiCollectionManager")
+      .def_static("GetInstance", &GateDigiCollectionManager::GetInstance,
+                  py::return_value_policy::reference)
+      .def("GetDigiCollection", &GateDigiCollectionManager::GetDigiCollection,
+           py::return_value_policy::reference)
+      .def("DumpAllDigiCollections",
+           &GateDigiCollectionManager::DumpAllDigiCollections);
+}
@@ -0,0 +1,24 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+
+namespace py = pybind11;
+
+#include "GateDigitizerChainActor.h"
+
+void init_GateDigitizerChainActor(py::module &m) {
+
+  py::class_<GateDigitizerChainActor,
+             std::unique_ptr<GateDigitizerChainActor, py::nodelete>,
+             GateVActor>(m, "GateDigitizerChainActor")
+      .def(py::init<py::dict &>())
+      .def("SetStages", &GateDigitizerChainActor::SetStages)
+      .def("GetIgnoredHitsCount",
+           &GateDigitizerChainActor::GetIgnoredHitsCount);
+}
@@ -0,0 +1,20 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include <pybind11/pybind11.h>
+
+namespace py = pybind11;
+
+#include "GateDigitizerCoincidenceSorterActor.h"
+
+void init_GateDigitizerCoincidenceSorterActor(py::module &m) {
+
+  py::class_<GateDigitizerCoincidenceSorterActor,
+             std::unique_ptr<GateDigitizerCoincidenceSorterActor, py::nodelete>,
+             GateVActor>(m, "GateDigitizerCoincidenceSorterActor")
+      .def(py::init<py::dict &>());
+}
@@ -0,0 +1,24 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include <pybind11/pybind11.h>
+
+namespace py = pybind11;
+
+#include "GateDigitizerDeadTimeActor.h"
+
+void init_GateDigitizerDeadTimeActor(py::module &m) {
+
+  py::class_<GateDigitizerDeadTimeActor,
+             std::unique_ptr<GateDigitizerDeadTimeActor, py::nodelete>,
+             GateVActor>(m, "GateDigitizerDeadTimeActor")
+      .def(py::init<py::dict &>())
+      .def("SetGroupVolumeDepth",
+           &GateDigitizerDeadTimeActor::SetGroupVolumeDepth)
+      .def("GetRejectedDigisCount",
+           &GateDigitizerDeadTimeActor::GetRejectedDigisCount);
+}
@@ -20,5 +20,7 @@ void init_GateDigitizerProjectionActor(py::module &m) {
       .def(py::init<py::dict &>())
       .def_readwrite("fImage", &GateDigitizerProjectionActor::fImage)
       .def_readwrite("fPhysicalVolumeName",
-                     &GateDigitizerProjectionActor::fPhysicalVolumeName);
+                     &GateDigitizerProjectionActor::fPhysicalVolumeName)
+      .def_readwrite("fRunFilenames",
+                     &GateDigitizerProjectionActor::fRunFilenames);
 }
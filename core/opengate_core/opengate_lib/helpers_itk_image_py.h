@@ -49,7 +49,8 @@ inline void set_region(TImagePointer &img,
                            index,
                        pybind11::array_t<int, pybind11::array::c_style |
                                                   pybind11::array::forcecast>
-                           size) {
+                           size,
+                       bool allocate = true) {
   using RegionType = typename TImagePointer::ObjectType::RegionType;
   typename RegionType::IndexType itk_index;
   const auto *data_index =
@@ -68,7 +69,9 @@ inline void set_region(TImagePointer &img,
   itk_size[2] = data_size[2];
   RegionType itk_region(itk_index, itk_size);
   img->SetRegions(itk_region);
-  img->Allocate();
+  // (no allocation: only the geometry of the image is set)
+  if (allocate)
+    img->Allocate();
 };
 
 template <typename TImagePointer>
@@ -93,21 +96,24 @@ void declare_itk_image_ptr(pybind11::module &m, const std::string &typestr) {
       .def(
           "set_size",
           [](TImagePointer &img,
-             py::array_t<int, py::array::c_style | py::array::forcecast> size) {
+             py::array_t<int, py::array::c_style | py::array::forcecast> size,
+             bool allocate) {
             py::array_t<int, py::array::c_style | py::array::forcecast>
                 zero_index(3);
             int *raw = static_cast<int *>(zero_index.request().ptr);
             raw[0] = raw[1] = raw[2] = 0;
-            return set_region(img, zero_index, size);
-          })
+            return set_region(img, zero_index, size, allocate);
+          },
+          py::arg("size"), py::arg("allocate") = true)
       .def(
           "set_region",
           [](TImagePointer &img,
              py::array_t<int, py::array::c_style | py::array::forcecast> index,
-             py::array_t<int, py::array::c_style | py::array::forcecast> size) {
-            return set_region<TImagePointer>(img, index, size);
+             py::array_t<int, py::array::c_style | py::array::forcecast> size,
+             bool allocate) {
+            return set_region<TImagePointer>(img, index, size, allocate);
           },
-          py::arg("index"), py::arg("size"))
+          py::arg("index"), py::arg("size"), py::arg("allocate") = true)
       .def("spacing",
            [](const TImagePointer &img) {
              return py::array(img->ImageDimension, // shape
@@ -20,7 +20,12 @@ void init_GateARFActor(py::module &m) {
       .def("SetARFFunction",
            &GateARFActor::SetARFFunction) // FIXME, unsure what to do, seg fault
                                           // after dest
+      // the inference thread needs the GIL to apply the remaining batches
+      .def("EndSimulationAction", &GateARFActor::EndSimulationAction,
+           py::call_guard<py::gil_scoped_release>())
       .def_readonly("fCurrentNumberOfHits", &GateARFActor::fCurrentNumberOfHits)
+      .def_readonly("fCurrentRunId", &GateARFActor::fCurrentRunId)
+      .def_readwrite("fMaxQueuedBatches", &GateARFActor::fMaxQueuedBatches)
       .def_readonly("fEnergy", &GateARFActor::fEnergy)
       .def_readonly("fPositionX", &GateARFActor::fPositionX)
       .def_readonly("fPositionY", &GateARFActor::fPositionY)
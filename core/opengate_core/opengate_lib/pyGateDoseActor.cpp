@@ -21,6 +21,15 @@ void init_GateDoseActor(py::module &m) {
       .def_readwrite("cpp_temp_image", &GateDoseActor::cpp_temp_image)
       .def_readwrite("cpp_dose_image", &GateDoseActor::cpp_dose_image)
       .def_readwrite("cpp_last_id_image", &GateDoseActor::cpp_last_id_image)
+      .def_readwrite("cpp_batch_images", &GateDoseActor::cpp_batch_images)
+      .def_readwrite("cpp_total_edep_image",
+                     &GateDoseActor::cpp_total_edep_image)
+      .def_readwrite("cpp_total_dose_image",
+                     &GateDoseActor::cpp_total_dose_image)
+      .def_readwrite("fRunEdepFilenames", &GateDoseActor::fRunEdepFilenames)
+      .def_readwrite("fRunDoseFilenames", &GateDoseActor::fRunDoseFilenames)
+      .def_readwrite("fOutputOrigin", &GateDoseActor::fOutputOrigin)
+      .def("GetSparseVoxels", &GateDoseActor::GetSparseVoxels)
       .def_readwrite("fPhysicalVolumeName",
                      &GateDoseActor::fPhysicalVolumeName);
 }
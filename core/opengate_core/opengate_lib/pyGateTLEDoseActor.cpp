@@ -0,0 +1,20 @@
+/* --------------------------------------------------
+   Copyright (C): OpenGATE Collaboration
+   This software is distributed under the terms
+   of the GNU Lesser General  Public Licence (LGPL)
+   See LICENSE.md for further details
+   -------------------------------------------------- */
+
+#include <pybind11/pybind11.h>
+#include <pybind11/stl.h>
+
+namespace py = pybind11;
+
+#include "GateTLEDoseActor.h"
+
+void init_GateTLEDoseActor(py::module &m) {
+  py::class_<GateTLEDoseActor, std::unique_ptr<GateTLEDoseActor, py::nodelete>,
+             GateDoseActor>(m, "GateTLEDoseActor")
+      .def(py::init<py::dict &>())
+      .def("GetMuEn", &GateTLEDoseActor::GetMuEn);
+}
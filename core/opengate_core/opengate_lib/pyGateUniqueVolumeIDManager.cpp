@@ -18,5 +18,10 @@ void init_GateUniqueVolumeIDManager(py::module &m) {
              std::unique_ptr<GateUniqueVolumeIDManager, py::nodelete>>(
       m, "GateUniqueVolumeIDManager")
       .def("GetInstance", &GateUniqueVolumeIDManager::GetInstance)
-      .def("GetAllVolumeIDs", &GateUniqueVolumeIDManager::GetAllVolumeIDs);
+      .def("GetAllVolumeIDs", &GateUniqueVolumeIDManager::GetAllVolumeIDs)
+      .def("InitializeVolumeIDs",
+           &GateUniqueVolumeIDManager::InitializeVolumeIDs)
+      .def_readwrite(
+          "fMaxNumberOfInitializedVolumeIDs",
+          &GateUniqueVolumeIDManager::fMaxNumberOfInitializedVolumeIDs);
 }
@@ -10,6 +10,8 @@ from .helpers_image import *
 from .helpers_tests import *
 from .helpers_tests_root import *
 from .helpers_transform import *
+from .helpers_digi_merge import *
+from .helpers_onnx import *
 
 # main mechanism for the 'elements': source, actor, volume
 from .UserInfo import *
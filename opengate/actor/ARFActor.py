@@ -1,6 +1,5 @@
 import opengate_core as g4
 import opengate as gate
-import sys
 from box import Box
 import numpy as np
 import itk
@@ -13,6 +12,10 @@ class ARFActor(g4.GateARFActor, gate.ActorBase):
     It runs the neural network model to provide the probability of detection in all energy windows.
 
     Output is an (FIXME itk ?numpy ?) image that can be retrieved with self.output_image
+
+    In MT, each thread stores the particles in its own batch. Full batches are queued and
+    the neural network is applied (see apply) in a dedicated inference thread, on the
+    queued batches of all threads, while the threads continue the simulation.
     """
 
     type_name = "ARFActor"
@@ -29,15 +32,16 @@ class ARFActor(g4.GateARFActor, gate.ActorBase):
         user_info.distance_to_crystal = 75 * mm
         user_info.verbose_batch = False
         user_info.output = ""
+        # neural network backend: "torch" (garf) or "onnx" (onnxruntime)
+        user_info.nn_backend = "torch"
+        user_info.onnx_threads = 1
 
     def __init__(self, user_info):
         gate.ActorBase.__init__(self, user_info)
         g4.GateARFActor.__init__(self, user_info.__dict__)
         # import module
-        self.garf = gate.import_garf()
-        if self.garf is None:
-            print("Cannot run GANSource")
-            sys.exit()
+        self.garf = None
+        self.import_nn_backend()
         # create the default detector
         # self.user_info.arf_detector = gate.ARFDetector(self.user_info)
         # prepare output
@@ -56,11 +60,25 @@ class ARFActor(g4.GateARFActor, gate.ActorBase):
         s = f'ARFActor "{u.name}"'
         return s
 
+    def import_nn_backend(self):
+        # the onnx backend provides the same functions as garf
+        backend = self.user_info.nn_backend
+        if backend == "torch":
+            self.garf = gate.import_garf()
+        elif backend == "onnx":
+            self.garf = gate.ARFOnnxBackend(self.user_info.onnx_threads)
+        else:
+            gate.fatal(
+                f'Unknown nn_backend "{backend}" in the ARFActor {self.user_info.name}, '
+                f'must be "torch" or "onnx"'
+            )
+
     def __getstate__(self):
         # needed to not pickle. Need to reset some attributes
         gate.ActorBase.__getstate__(self)
         self.garf = None
         self.nn = None
+        self.model = None
         self.output_image = None
         return self.__dict__
 
@@ -69,6 +87,8 @@ class ARFActor(g4.GateARFActor, gate.ActorBase):
         # self.user_info.arf_detector.initialize(self)
         self.ActorInitialize()
         self.SetARFFunction(self.apply)
+        # max number of batches waiting for the inference thread
+        self.fMaxQueuedBatches = 2 * max(1, self.simulation.user_info.number_of_threads)
         self.user_info.output_image = None
 
         # load the pth file
@@ -145,18 +165,16 @@ class ARFActor(g4.GateARFActor, gate.ActorBase):
             temp = self.garf.image_from_coordinates(temp, u, v, w_pred)
             # add to previous, at the correct slice location
             # the slice is : current_ene_window + run_id * nb_ene_windows
-            run_id = (
-                self.simulation_engine_wr().g4_RunManager.GetCurrentRun().GetRunID()
-            )
+            # (this function is called by the inference thread, not during the run)
+            run_id = actor.fCurrentRunId
             s = p.nb_ene * run_id
             self.output_image[s : s + p.nb_ene] = (
                 self.output_image[s : s + p.nb_ene] + temp
             )
 
     def EndSimulationAction(self):
+        # wait for the remaining batches to be processed
         g4.GateARFActor.EndSimulationAction(self)
-        # process the remaining elements in the batch
-        self.apply(self)
         # convert to itk image
         self.output_image = itk.image_from_array(self.output_image)
         # set spacing and origin like HitsProjectionActor
@@ -29,6 +29,10 @@ class DigitizerAdderActor(g4.GateDigitizerAdderActor, gate.ActorBase):
         user_info.number_of_hits = False
         user_info.skip_attributes = []
         user_info.clear_every = 1e5
+        # write the output (npy or hdf5) in a background thread
+        user_info.async_write = False
+        # keep the values (all threads) in memory, see get_digi_collection_arrays
+        user_info.keep_in_memory = False
         user_info.group_volume = None
 
     def __init__(self, user_info):
@@ -22,6 +22,10 @@ class DigitizerBlurringActor(g4.GateDigitizerBlurringActor, gate.ActorBase):
         user_info.input_digi_collection = "Hits"
         user_info.skip_attributes = []
         user_info.clear_every = 1e5
+        # write the output (npy or hdf5) in a background thread
+        user_info.async_write = False
+        # keep the values (all threads) in memory, see get_digi_collection_arrays
+        user_info.keep_in_memory = False
         user_info.blur_attribute = None
         user_info.blur_method = "Gaussian"
         user_info.blur_fwhm = None
@@ -0,0 +1,161 @@
+import opengate as gate
+import opengate_core as g4
+import numpy as np
+
+sigma_to_fwhm = 2 * np.sqrt(2 * np.log(2))
+fwhm_to_sigma = 1.0 / sigma_to_fwhm
+
+
+class DigitizerChainActor(g4.GateDigitizerChainActor, gate.ActorBase):
+    """
+    Fused digitizer: a sequence of stages applied to the hits of each event,
+    without intermediate digi collections. Only the final digi are stored.
+
+    Each stage is a dict with a 'type' and the same options as the
+    corresponding actor:
+    - adder: policy, group_volume
+    - readout: policy, group_volume, discretize_volume
+    - blurring: blur_attribute (TotalEnergyDeposit or GlobalTime), blur_method,
+      blur_fwhm or blur_sigma, blur_reference_value, blur_resolution, blur_slope
+    - spatial_blurring: blur_fwhm or blur_sigma, keep_in_solid_limits
+      (the position is PostPosition)
+    - energy_window: min, max
+    """
+
+    type_name = "DigitizerChainActor"
+
+    stage_defaults = {
+        "adder": {"policy": "EnergyWinnerPosition", "group_volume": None},
+        "readout": {
+            "policy": "EnergyWinnerPosition",
+            "group_volume": None,
+            "discretize_volume": None,
+        },
+        "blurring": {
+            "blur_attribute": None,
+            "blur_method": "Gaussian",
+            "blur_fwhm": None,
+            "blur_sigma": None,
+            "blur_reference_value": None,
+            "blur_resolution": None,
+            "blur_slope": None,
+        },
+        "spatial_blurring": {
+            "blur_fwhm": None,
+            "blur_sigma": None,
+            "keep_in_solid_limits": True,
+        },
+        "energy_window": {"min": None, "max": None},
+    }
+
+    @staticmethod
+    def set_default_user_info(user_info):
+        gate.ActorBase.set_default_user_info(user_info)
+        user_info.attributes = []
+        user_info.output = "singles.root"
+        user_info.input_digi_collection = "Hits"
+        user_info.skip_attributes = []
+        user_info.clear_every = 1e5
+        # write the output (npy or hdf5) in a background thread
+        user_info.async_write = False
+        # keep the values (all threads) in memory, see get_digi_collection_arrays
+        user_info.keep_in_memory = False
+        user_info.stages = []
+
+    def __init__(self, user_info):
+        gate.ActorBase.__init__(self, user_info)
+        g4.GateDigitizerChainActor.__init__(self, user_info.__dict__)
+        actions = {"StartSimulationAction", "EndSimulationAction"}
+        self.AddActions(actions)
+
+    def __del__(self):
+        pass
+
+    def __str__(self):
+        s = f"DigitizerChainActor {self.user_info.name}"
+        return s
+
+    def get_stage(self, stage):
+        if "type" not in stage or stage["type"] not in self.stage_defaults:
+            gate.fatal(
+                f"Error in the DigitizerChainActor '{self.user_info.name}', "
+                f"the type of the stage {stage} must be in "
+                f"{list(self.stage_defaults.keys())}"
+            )
+        s = dict(self.stage_defaults[stage["type"]])
+        for k, v in stage.items():
+            if k != "type" and k not in s:
+                gate.fatal(f"Error, unknown option '{k}' for the stage {stage}")
+            s[k] = v
+        t = s["type"]
+        if t == "adder" or t == "readout":
+            self.set_stage_depths(s)
+        if t == "blurring":
+            self.set_stage_blur(s)
+        if t == "spatial_blurring":
+            self.set_stage_spatial_blur(s)
+        if t == "energy_window":
+            if s["min"] is None or s["max"] is None:
+                gate.fatal(f"Error, min and max are required for the stage {stage}")
+        return s
+
+    def set_stage_depths(self, s):
+        policies = ["EnergyWinnerPosition", "EnergyWeightedCentroidPosition"]
+        if s["policy"] not in policies:
+            gate.fatal(f"Error, the policy must be within {policies} in {s}")
+        vm = self.simulation.volume_manager
+        s["group_depth"] = -1
+        if s["group_volume"] is not None:
+            s["group_depth"] = vm.get_volume_depth(s["group_volume"])
+        if s["type"] == "readout":
+            if s["discretize_volume"] is None:
+                gate.fatal(f'Please, set the option "discretize_volume" in {s}')
+            s["discretize_depth"] = vm.get_volume_depth(s["discretize_volume"])
+
+    def set_stage_blur(self, s):
+        am = ["Gaussian", "InverseSquare", "Linear"]
+        if s["blur_method"] not in am:
+            gate.fatal(f"Error, the blur_method must be within {am} in {s}")
+        if s["blur_attribute"] not in ["TotalEnergyDeposit", "GlobalTime"]:
+            gate.fatal(
+                f"Error, only TotalEnergyDeposit or GlobalTime can be blurred in "
+                f"a DigitizerChainActor (use a DigitizerBlurringActor), in {s}"
+            )
+        if s["blur_method"] == "Gaussian":
+            self.set_stage_sigma(s)
+            s["blur_sigma"] = float(s["blur_sigma"])
+            s["blur_reference_value"] = -1
+            s["blur_resolution"] = -1
+            s["blur_slope"] = 0
+            return
+        if s["blur_reference_value"] is None or s["blur_reference_value"] < 0:
+            gate.fatal(f"Error, use positive blur_reference_value in {s}")
+        if s["blur_resolution"] is None or s["blur_resolution"] < 0:
+            gate.fatal(f"Error, use positive blur_resolution in {s}")
+        if s["blur_method"] == "Linear" and s["blur_slope"] is None:
+            gate.fatal(f"Error, use positive blur_slope in {s}")
+        if s["blur_slope"] is None:
+            s["blur_slope"] = 0
+        s["blur_sigma"] = -1
+
+    def set_stage_sigma(self, s):
+        if s["blur_fwhm"] is not None and s["blur_sigma"] is not None:
+            gate.fatal(f"Error, use blur_sigma or blur_fwhm, not both, in {s}")
+        if s["blur_fwhm"] is not None:
+            s["blur_sigma"] = np.array(s["blur_fwhm"]) * fwhm_to_sigma
+        if s["blur_sigma"] is None:
+            gate.fatal(f"Error, use blur_sigma or blur_fwhm in {s}")
+
+    def set_stage_spatial_blur(self, s):
+        self.set_stage_sigma(s)
+        if not hasattr(s["blur_sigma"], "__len__"):
+            s["blur_sigma"] = [s["blur_sigma"]] * 3
+        s["blur_sigma"] = [float(x) for x in s["blur_sigma"]]
+
+    def StartSimulationAction(self):
+        stages = [self.get_stage(s) for s in self.user_info.stages]
+        self.SetStages(stages)
+        g4.GateDigitizerChainActor.StartSimulationAction(self)
+
+    def EndSimulationAction(self):
+        g4.GateDigitizerChainActor.EndSimulationAction(self)
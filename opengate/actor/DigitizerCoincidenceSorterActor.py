@@ -0,0 +1,80 @@
+import opengate as gate
+import opengate_core as g4
+
+
+class DigitizerCoincidenceSorterActor(
+    g4.GateDigitizerCoincidenceSorterActor, gate.ActorBase
+):
+    """
+    Online coincidence sorter: the singles (of all threads) are sorted in time
+    and grouped in coincidence windows, during the simulation.
+    Input: one DigiCollection of singles (GlobalTime, TotalEnergyDeposit and
+    PostPosition are required)
+    Output: the prompt coincidences (DigiCollection with the same name as the
+    actor) and the delayed coincidences (name + '_delayed'), with the selected
+    attributes of both singles (suffix 1 and 2).
+
+    The multiples policies are the ones of Gate 9 (the winner is the pair with
+    the highest energy, a pair is good if the transaxial distance is larger
+    than min_transaxial_distance).
+    """
+
+    type_name = "DigitizerCoincidenceSorterActor"
+
+    policies = [
+        "takeAllGoods",
+        "takeWinnerOfGoods",
+        "takeWinnerIfIsGood",
+        "takeWinnerIfAllAreGoods",
+        "takeIfOnlyOneGood",
+        "removeMultiples",
+    ]
+
+    @staticmethod
+    def set_default_user_info(user_info):
+        gate.ActorBase.set_default_user_info(user_info)
+        ns = gate.g4_units("ns")
+        user_info.attributes = []
+        user_info.output = "coincidences.root"
+        user_info.input_digi_collection = "Singles"
+        user_info.window = 10 * ns
+        # no delayed coincidences if the offset is zero
+        user_info.delayed_window_offset = 0
+        user_info.multiples_policy = "takeWinnerOfGoods"
+        user_info.min_transaxial_distance = 0
+        # windows are processed when the buffer is larger than this size, even
+        # if some threads are late
+        user_info.max_buffer_size = 100000
+        # the singles are buffered in each thread (no lock) and merged with the
+        # ones of the other threads when there are more than this number
+        user_info.thread_buffer_size = 1000
+        user_info.clear_every = 1e5
+
+    def __init__(self, user_info):
+        gate.ActorBase.__init__(self, user_info)
+        if user_info.multiples_policy not in self.policies:
+            gate.fatal(
+                f"Error, the multiples_policy '{user_info.multiples_policy}' is "
+                f"unknown, must be within {self.policies}"
+            )
+        if 0 < user_info.delayed_window_offset < user_info.window:
+            gate.fatal(
+                f"Error, the delayed_window_offset must be larger than the "
+                f"window ({user_info.window}) in the actor '{user_info.name}'"
+            )
+        g4.GateDigitizerCoincidenceSorterActor.__init__(self, user_info.__dict__)
+        actions = {"StartSimulationAction", "EndSimulationAction"}
+        self.AddActions(actions)
+
+    def __del__(self):
+        pass
+
+    def __str__(self):
+        s = f"DigitizerCoincidenceSorterActor {self.user_info.name}"
+        return s
+
+    def StartSimulationAction(self):
+        g4.GateDigitizerCoincidenceSorterActor.StartSimulationAction(self)
+
+    def EndSimulationAction(self):
+        g4.GateDigitizerCoincidenceSorterActor.EndSimulationAction(self)
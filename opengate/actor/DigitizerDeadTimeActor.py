@@ -0,0 +1,75 @@
+import opengate as gate
+import opengate_core as g4
+
+
+class DigitizerDeadTimeActor(g4.GateDigitizerDeadTimeActor, gate.ActorBase):
+    """
+    Digitizer module for dead time, per volume (group_volume, as in the adder).
+    The digi are considered in time order, a digi that occurs during the dead
+    time of its volume is rejected.
+    Input: a DigiCollection, with at least GlobalTime and PreStepUniqueVolumeID
+    Output: the DigiCollection of the accepted digi
+
+    Modes:
+    - nonparalyzable: only the accepted digi start a dead time
+    - paralyzable: all digi (also the rejected ones) start a dead time
+
+    The state of the volumes is kept from one event to the next. It is thread
+    local: in MT, each thread models the dead time of its own digi.
+    """
+
+    type_name = "DigitizerDeadTimeActor"
+
+    @staticmethod
+    def set_default_user_info(user_info):
+        gate.ActorBase.set_default_user_info(user_info)
+        user_info.attributes = []
+        user_info.output = "singles.root"
+        user_info.input_digi_collection = "Singles"
+        user_info.skip_attributes = []
+        user_info.clear_every = 1e5
+        # write the output (npy or hdf5) in a background thread
+        user_info.async_write = False
+        # keep the values (all threads) in memory, see get_digi_collection_arrays
+        user_info.keep_in_memory = False
+        user_info.group_volume = None
+        user_info.dead_time = None
+        user_info.mode = "nonparalyzable"
+
+    def __init__(self, user_info):
+        gate.ActorBase.__init__(self, user_info)
+        modes = ["nonparalyzable", "paralyzable"]
+        if user_info.mode not in modes:
+            gate.fatal(
+                f"Error, the mode for the DeadTime '{user_info.name}' must be "
+                f"within {modes}, while it is '{user_info.mode}'"
+            )
+        if user_info.dead_time is None or user_info.dead_time < 0:
+            gate.fatal(
+                f"Error, use a positive dead_time in the DeadTime '{user_info.name}'"
+            )
+        g4.GateDigitizerDeadTimeActor.__init__(self, user_info.__dict__)
+        actions = {"StartSimulationAction", "EndSimulationAction"}
+        self.AddActions(actions)
+
+    def __del__(self):
+        pass
+
+    def __str__(self):
+        s = f"DigitizerDeadTimeActor {self.user_info.name}"
+        return s
+
+    def set_group_by_depth(self):
+        depth = -1
+        if self.user_info.group_volume is not None:
+            depth = self.simulation.volume_manager.get_volume_depth(
+                self.user_info.group_volume
+            )
+        self.SetGroupVolumeDepth(depth)
+
+    def StartSimulationAction(self):
+        self.set_group_by_depth()
+        g4.GateDigitizerDeadTimeActor.StartSimulationAction(self)
+
+    def EndSimulationAction(self):
+        g4.GateDigitizerDeadTimeActor.EndSimulationAction(self)
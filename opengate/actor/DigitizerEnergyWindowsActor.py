@@ -20,6 +20,10 @@ class DigitizerEnergyWindowsActor(g4.GateDigitizerEnergyWindowsActor, gate.Actor
         user_info.channels = []
         user_info.skip_attributes = []
         user_info.clear_every = 1e5
+        # write the output (npy or hdf5) in a background thread
+        user_info.async_write = False
+        # keep the values (all threads) in memory, see get_digi_collection_arrays
+        user_info.keep_in_memory = False
 
     def __init__(self, user_info):
         gate.ActorBase.__init__(self, user_info)
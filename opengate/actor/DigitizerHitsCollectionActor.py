@@ -19,6 +19,13 @@ class DigitizerHitsCollectionActor(g4.GateDigitizerHitsCollectionActor, gate.Act
         user_info.debug = False
         user_info.clear_every = 1e5
         user_info.keep_zero_edep = False
+        # write and clear the hits during the run (per thread, 0 means no limit)
+        user_info.flush_every_n_digis = 0
+        user_info.flush_max_bytes = 0
+        # write the output (npy or hdf5) in a background thread
+        user_info.async_write = False
+        # keep the values (all threads) in memory, see get_digi_collection_arrays
+        user_info.keep_in_memory = False
 
     def __init__(self, user_info):
         gate.ActorBase.__init__(self, user_info)
@@ -0,0 +1,67 @@
+import opengate as gate
+import opengate_core as g4
+
+
+class DigitizerPileupActor(g4.GateDigitizerPileupActor, gate.ActorBase):
+    """
+    Digitizer module for pile-up, per volume (group_volume, as in the adder).
+    The digi are considered in time order, all digi of a volume that occur
+    less than pileup_time after the first one are merged: the energies are
+    summed, the time is the one of the first digi, all other attributes are
+    the ones of the digi with the highest energy.
+    Input: a DigiCollection, with at least TotalEnergyDeposit, GlobalTime and
+    PreStepUniqueVolumeID
+    Output: the DigiCollection of the merged digi
+
+    A merged digi may gather digi of several events. The state of the volumes
+    is thread local: in MT, each thread models the pile-up of its own digi.
+    """
+
+    type_name = "DigitizerPileupActor"
+
+    @staticmethod
+    def set_default_user_info(user_info):
+        gate.ActorBase.set_default_user_info(user_info)
+        user_info.attributes = []
+        user_info.output = "singles.root"
+        user_info.input_digi_collection = "Singles"
+        user_info.skip_attributes = []
+        user_info.clear_every = 1e5
+        # write the output (npy or hdf5) in a background thread
+        user_info.async_write = False
+        # keep the values (all threads) in memory, see get_digi_collection_arrays
+        user_info.keep_in_memory = False
+        user_info.group_volume = None
+        user_info.pileup_time = None
+
+    def __init__(self, user_info):
+        gate.ActorBase.__init__(self, user_info)
+        if user_info.pileup_time is None or user_info.pileup_time < 0:
+            gate.fatal(
+                f"Error, use a positive pileup_time in the Pileup '{user_info.name}'"
+            )
+        g4.GateDigitizerPileupActor.__init__(self, user_info.__dict__)
+        actions = {"StartSimulationAction", "EndSimulationAction"}
+        self.AddActions(actions)
+
+    def __del__(self):
+        pass
+
+    def __str__(self):
+        s = f"DigitizerPileupActor {self.user_info.name}"
+        return s
+
+    def set_group_by_depth(self):
+        depth = -1
+        if self.user_info.group_volume is not None:
+            depth = self.simulation.volume_manager.get_volume_depth(
+                self.user_info.group_volume
+            )
+        self.SetGroupVolumeDepth(depth)
+
+    def StartSimulationAction(self):
+        self.set_group_by_depth()
+        g4.GateDigitizerPileupActor.StartSimulationAction(self)
+
+    def EndSimulationAction(self):
+        g4.GateDigitizerPileupActor.EndSimulationAction(self)
@@ -10,6 +10,10 @@ class DigitizerProjectionActor(g4.GateDigitizerProjectionActor, gate.ActorBase):
     This actor takes as input HitsCollections and performed binning in 2D images.
     If there are several HitsCollection as input, the slices will correspond to each HC.
     If there are several runs, images will also be slice-stacked.
+    If output_per_run is True, the image only contains the slices of one run,
+    the projections of every run are written at the end of the run (with
+    _run<id> added to the filename, before the extension), the final image
+    is the last run.
     """
 
     type_name = "HitsProjectionActor"
@@ -25,6 +29,7 @@ class DigitizerProjectionActor(g4.GateDigitizerProjectionActor, gate.ActorBase):
         user_info.physical_volume_index = None
         user_info.origin_as_image_center = True
         user_info.detector_orientation_matrix = Rotation.from_euler("x", 0).as_matrix()
+        user_info.output_per_run = False
 
     def __init__(self, user_info):
         gate.ActorBase.__init__(self, user_info)
@@ -34,6 +39,11 @@ class DigitizerProjectionActor(g4.GateDigitizerProjectionActor, gate.ActorBase):
         self.output_image = None
         if len(user_info.input_digi_collections) < 1:
             gate.fatal(f"Error, not input hits collection.")
+        if user_info.output_per_run and not user_info.output:
+            gate.fatal(
+                f"Error, output_per_run requires an output filename in the "
+                f"DigitizerProjectionActor {user_info.name}"
+            )
 
     def __del__(self):
         pass
@@ -86,9 +96,10 @@ class DigitizerProjectionActor(g4.GateDigitizerProjectionActor, gate.ActorBase):
         # and according to the volume shape
         size = np.array(self.user_info.size)
         spacing = np.array(self.user_info.spacing)
-        size[2] = len(self.user_info.input_digi_collections) * len(
-            self.simulation.run_timing_intervals
-        )
+        n = len(self.simulation.run_timing_intervals)
+        size[2] = len(self.user_info.input_digi_collections)
+        if not self.user_info.output_per_run:
+            size[2] *= n
         spacing[2] = self.compute_thickness(self.user_info.mother, size[2])
 
         # create image
@@ -106,6 +117,12 @@ class DigitizerProjectionActor(g4.GateDigitizerProjectionActor, gate.ActorBase):
             gate.fatal(f"Error in the HitsProjectionActor {self.user_info.name}")
         gate.attach_image_to_physical_volume(pv.GetName(), self.output_image)
         self.fPhysicalVolumeName = str(pv.GetName())
+        # filenames of the projections of every run
+        if self.user_info.output_per_run:
+            self.fRunFilenames = [
+                gate.insert_suffix_before_extension(self.user_info.output, f"_run{i}")
+                for i in range(n)
+            ]
         # update the cpp image and start
         gate.update_image_py_to_cpp(self.output_image, self.fImage, True)
         g4.GateDigitizerProjectionActor.StartSimulationAction(self)
@@ -126,7 +143,7 @@ class DigitizerProjectionActor(g4.GateDigitizerProjectionActor, gate.ActorBase):
         origin[2] = 0
         self.output_image.SetSpacing(spacing)
         self.output_image.SetOrigin(origin)
-        if self.user_info.output:
+        if self.user_info.output and not self.user_info.output_per_run:
             itk.imwrite(
                 self.output_image, gate.check_filename_type(self.user_info.output)
             )
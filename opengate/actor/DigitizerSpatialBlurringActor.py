@@ -24,6 +24,10 @@ class DigitizerSpatialBlurringActor(
         user_info.input_digi_collection = "Hits"
         user_info.skip_attributes = []
         user_info.clear_every = 1e5
+        # write the output (npy or hdf5) in a background thread
+        user_info.async_write = False
+        # keep the values (all threads) in memory, see get_digi_collection_arrays
+        user_info.keep_in_memory = False
         user_info.blur_attribute = None
         user_info.blur_fwhm = None
         user_info.blur_sigma = None
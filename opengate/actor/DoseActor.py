@@ -26,6 +26,53 @@ class DoseActor(g4.GateDoseActor, gate.ActorBase):
         - edep only for the moment
         - later: add dose, uncertainty, squared etc
 
+    Dose in Gray:
+    - if "gray" is True, the dose is also computed. With "gray_method" = "step" (default),
+        the dose of every step is computed from the density of the current material and
+        stored in a second image (exact, even when the materials vary within a voxel).
+    - with "gray_method" = "density", only the edep is scored, and the dose is computed
+        once at the end from a mass map, computed from the labels and material densities
+        of the attached Image volume (density at the center of each dose voxel).
+
+    Replica index:
+    - if "replica_index" is True, the actor must be attached to an Image volume with the
+        same size and spacing (and no translation). The voxel index is then directly given
+        by the replica numbers of the navigation (voxel of the pre step point), without
+        any coordinate transformation. Outside the image voxels, the usual lookup is used.
+
+    Uncertainty:
+    - "uncertainty_method" is "image" (default): the edep of the current event is kept
+        in temporary full images (with the last event id for each voxel)
+    - "uncertainty_method" is "event": the edep of the current event is kept in a small
+        thread local buffer of the touched voxels, folded into edep and squared edep
+        at the end of every event. Require less memory and less work per step.
+    - "uncertainty_method" is "batch": the events are split in "number_of_batches" batches
+        (according to their id), each one accumulated in its own edep image. The uncertainty
+        is computed from the variance between the batches.
+
+    Sparse:
+    - if "sparse" is True, only the touched voxels are stored (in thread local hash maps),
+        the dense images are never allocated during the simulation. Useful for huge and
+        mostly empty grids. If the output is a ".npz" file, the sparse values are written
+        as is (see gate.read_sparse_image), otherwise dense images are written.
+        The edep of the current event is kept in the event buffer: the uncertainty method
+        must be "event" (the "image" default and "batch" are not available).
+
+    Several runs:
+    - if "output_per_run" is True, the edep (and dose) images of every run are also written
+        (with "_run<id>" added to the output filename, before the extension), at the end of
+        each run. The same buffer is reused for all runs, the final images are the sum of
+        all runs. With the "density" gray_method, the dose images of the runs are computed
+        from their edep images at the end of the simulation. Not available with "sparse",
+        "thread_local_buffers" or the "batch" method.
+
+    Multi-thread:
+    - by default, all threads write in the same images (with a lock)
+    - if "thread_local_buffers" is True, each thread accumulates in its own buffers,
+        merged at the end of the simulation. Faster, but memory is multiplied
+        by the number of threads. Use "threads_per_buffer" to share
+        the buffers among groups of threads and limit the memory.
+
     """
 
     type_name = "DoseActor"
@@ -41,13 +88,21 @@ class DoseActor(g4.GateDoseActor, gate.ActorBase):
         user_info.img_coord_system = None
         user_info.output_origin = None
         user_info.uncertainty = True
+        user_info.uncertainty_method = "image"
+        user_info.number_of_batches = 10
         user_info.gray = False
+        user_info.gray_method = "step"
         user_info.physical_volume_index = None
         user_info.hit_type = "random"
+        user_info.replica_index = False
+        user_info.thread_local_buffers = False
+        user_info.threads_per_buffer = 1
+        user_info.sparse = False
+        user_info.output_per_run = False
 
     def __init__(self, user_info):
         gate.ActorBase.__init__(self, user_info)
-        g4.GateDoseActor.__init__(self, user_info.__dict__)
+        self.init_cpp_actor(user_info)
         # attached physical volume (at init)
         self.g4_phys_vol = None
         # default image (py side)
@@ -58,11 +113,17 @@ class DoseActor(g4.GateDoseActor, gate.ActorBase):
         self.py_last_id_image = None
         # default uncertainty
         self.uncertainty_image = None
+        # sparse values (index, edep, square, dose)
+        self.sparse_voxels = None
         # internal states
         self.img_origin_during_run = None
         self.first_run = None
         self.output_origin = None
 
+    def init_cpp_actor(self, user_info):
+        # (overloaded by actors that use another cpp class, e.g. TLEDoseActor)
+        g4.GateDoseActor.__init__(self, user_info.__dict__)
+
     def __str__(self):
         u = self.user_info
         s = f'DoseActor "{u.name}": dim={u.size} spacing={u.spacing} {u.output} tr={u.translation}'
@@ -91,13 +152,65 @@ class DoseActor(g4.GateDoseActor, gate.ActorBase):
         # create itk image (py side)
         size = np.array(self.user_info.size)
         spacing = np.array(self.user_info.spacing)
-        self.py_edep_image = gate.create_3d_image(size, spacing)
+        # (with sparse scoring, the dense image is not allocated)
+        self.py_edep_image = gate.create_3d_image(
+            size, spacing, allocate=not self.user_info.sparse
+        )
         # compute the center, using translation and half pixel spacing
         self.img_origin_during_run = (
             -size * spacing / 2.0 + spacing / 2.0 + self.user_info.translation
         )
         # for initialization during the first run
         self.first_run = True
+        # check the method for the uncertainty
+        methods = ["image", "event", "batch"]
+        if self.user_info.uncertainty_method not in methods:
+            gate.fatal(
+                f'DoseActor "{self.user_info.name}": uncertainty_method must be '
+                f"one of {methods}, while it is {self.user_info.uncertainty_method}"
+            )
+        if (
+            self.user_info.uncertainty_method == "batch"
+            and self.user_info.number_of_batches < 2
+        ):
+            gate.fatal(
+                f'DoseActor "{self.user_info.name}": number_of_batches must be '
+                f"at least 2, while it is {self.user_info.number_of_batches}"
+            )
+        if (
+            self.user_info.sparse
+            and self.user_info.uncertainty
+            and self.user_info.uncertainty_method != "event"
+        ):
+            gate.fatal(
+                f'DoseActor "{self.user_info.name}": with sparse scoring, the '
+                f'uncertainty_method must be "event", while it is '
+                f'"{self.user_info.uncertainty_method}"'
+            )
+        # check the method for the dose
+        gray_methods = ["step", "density"]
+        if self.user_info.gray_method not in gray_methods:
+            gate.fatal(
+                f'DoseActor "{self.user_info.name}": gray_method must be '
+                f"one of {gray_methods}, while it is {self.user_info.gray_method}"
+            )
+        # check the per run output
+        if self.user_info.output_per_run:
+            if (
+                self.user_info.sparse
+                or self.user_info.thread_local_buffers
+                or self.user_info.uncertainty_method == "batch"
+            ):
+                gate.fatal(
+                    f'DoseActor "{self.user_info.name}": output_per_run cannot be '
+                    f'used with sparse, thread_local_buffers or the "batch" method'
+                )
+        # check the options for the thread local buffers
+        if self.user_info.threads_per_buffer < 1:
+            gate.fatal(
+                f'DoseActor "{self.user_info.name}": threads_per_buffer must be '
+                f"strictly positive, while it is {self.user_info.threads_per_buffer}"
+            )
 
     def StartSimulationAction(self):
         # init the origin and direction according to the physical volume
@@ -117,31 +230,64 @@ class DoseActor(g4.GateDoseActor, gate.ActorBase):
         # Set the real physical volume name
         self.fPhysicalVolumeName = str(self.g4_phys_vol.GetName())
 
+        # the replica numbers can only be used with the same grid as the image
+        if self.user_info.replica_index:
+            self.check_replica_index()
+
+        # the density map is computed from the attached image volume
+        if self.user_info.gray and self.user_info.gray_method == "density":
+            vol_name = self.user_info.mother
+            vol_type = self.simulation.get_volume_user_info(vol_name).type_name
+            if vol_type != "Image":
+                gate.fatal(
+                    f'DoseActor "{self.user_info.name}": gray_method "density" '
+                    f'requires to be attached to an Image volume, while "{vol_name}" '
+                    f'is {vol_type}. Use gray_method "step" instead.'
+                )
+
         # FIXME for multiple run and motion
         if not self.first_run:
             gate.warning(f"Not implemented yet: DoseActor with several runs")
+        # sparse scoring: only the geometry of the image is needed
+        if self.user_info.sparse:
+            gate.update_image_py_to_cpp(
+                self.py_edep_image, self.cpp_edep_image, False, allocate=False
+            )
+            self.first_run = False
+            self.compute_output_origin()
+            return
+
         # send itk image to cpp side, copy data only the first run.
         gate.update_image_py_to_cpp(
             self.py_edep_image, self.cpp_edep_image, self.first_run
         )
 
         # for uncertainty
-        if self.user_info.uncertainty:
-            self.py_temp_image = gate.create_image_like(self.py_edep_image)
+        method = self.user_info.uncertainty_method
+        if self.user_info.uncertainty and method != "batch":
             self.py_square_image = gate.create_image_like(self.py_edep_image)
-            self.py_last_id_image = gate.create_image_like(self.py_edep_image)
             gate.update_image_py_to_cpp(
-                self.py_temp_image, self.cpp_temp_image, self.first_run
+                self.py_square_image, self.cpp_square_image, self.first_run
             )
+        # temporary images are only needed with the "image" method
+        if self.user_info.uncertainty and method == "image":
+            self.py_temp_image = gate.create_image_like(self.py_edep_image)
+            self.py_last_id_image = gate.create_image_like(self.py_edep_image)
             gate.update_image_py_to_cpp(
-                self.py_square_image, self.cpp_square_image, self.first_run
+                self.py_temp_image, self.cpp_temp_image, self.first_run
             )
             gate.update_image_py_to_cpp(
                 self.py_last_id_image, self.cpp_last_id_image, self.first_run
             )
 
-        # for dose in Gray
-        if self.user_info.gray:
+        # one edep image per batch (all initialized with zeros)
+        if self.user_info.uncertainty and method == "batch":
+            zero_image = gate.create_image_like(self.py_edep_image)
+            for cpp_image in self.cpp_batch_images:
+                gate.update_image_py_to_cpp(zero_image, cpp_image, self.first_run)
+
+        # for dose in Gray (computed at each step)
+        if self.user_info.gray and self.user_info.gray_method == "step":
             self.py_dose_image = gate.create_image_like(self.py_edep_image)
             gate.update_image_py_to_cpp(
                 self.py_dose_image, self.cpp_dose_image, self.first_run
@@ -150,6 +296,57 @@ class DoseActor(g4.GateDoseActor, gate.ActorBase):
         # now, indicate the next run will not be the first
         self.first_run = False
 
+        # compute in advance the final origin of the dose map
+        self.compute_output_origin()
+
+        # one output image per run
+        if self.user_info.output_per_run:
+            self.initialize_output_per_run()
+
+    def initialize_output_per_run(self):
+        # the sum of all runs is kept in additional images
+        py_total_image = gate.create_image_like(self.py_edep_image)
+        gate.update_image_py_to_cpp(py_total_image, self.cpp_total_edep_image, True)
+        if self.user_info.gray and self.user_info.gray_method == "step":
+            gate.update_image_py_to_cpp(py_total_image, self.cpp_total_dose_image, True)
+        # filenames of the images of every run (the dose images are written
+        # by the cpp side with the "step" method, at the end otherwise)
+        output = self.user_info.output
+        n = len(self.simulation.run_timing_intervals)
+        self.fRunEdepFilenames = [
+            gate.insert_suffix_before_extension(output, f"_run{i}") for i in range(n)
+        ]
+        if self.user_info.gray:
+            self.fRunDoseFilenames = [
+                gate.insert_suffix_before_extension(output, f"_run{i}_dose")
+                for i in range(n)
+            ]
+        self.fOutputOrigin = list(self.output_origin)
+
+    def check_replica_index(self):
+        vol_name = self.user_info.mother
+        vol_type = self.simulation.get_volume_user_info(vol_name).type_name
+        if vol_type != "Image":
+            gate.fatal(
+                f'DoseActor "{self.user_info.name}": replica_index requires '
+                f'to be attached to an Image volume, while "{vol_name}" is {vol_type}'
+            )
+        vol = self.volume_engine.g4_volumes[vol_name]
+        img_info = gate.get_info_from_image(vol.image)
+        if (
+            not np.array_equal(img_info.size, self.user_info.size)
+            or not np.allclose(img_info.spacing, self.user_info.spacing)
+            or np.any(self.user_info.translation)
+        ):
+            gate.fatal(
+                f'DoseActor "{self.user_info.name}": replica_index requires '
+                f"the same size and spacing as the image {vol_name} "
+                f"({img_info.size} and {img_info.spacing}) without translation, "
+                f"while it is {self.user_info.size} and {self.user_info.spacing} "
+                f"with translation {self.user_info.translation}"
+            )
+
+    def compute_output_origin(self):
         # If attached to a voxelized volume, we may want to use its coord system.
         # So, we compute in advance what will be the final origin of the dose map
         vol_name = self.user_info.mother
@@ -189,6 +386,11 @@ class DoseActor(g4.GateDoseActor, gate.ActorBase):
     def EndSimulationAction(self):
         g4.GateDoseActor.EndSimulationAction(self)
 
+        # sparse scoring
+        if self.user_info.sparse:
+            self.end_simulation_action_sparse()
+            return
+
         # Get the itk image from the cpp side
         # Currently a copy. Maybe latter as_pyarray ?
         self.py_edep_image = gate.get_cpp_image(self.cpp_edep_image)
@@ -201,18 +403,24 @@ class DoseActor(g4.GateDoseActor, gate.ActorBase):
         # Uncertainty stuff need to be called before writing edep (to terminate temp events)
         if self.user_info.uncertainty:
             self.compute_uncertainty()
-            n = gate.check_filename_type(self.user_info.output).replace(
-                ".mhd", "_uncertainty.mhd"
+            n = gate.insert_suffix_before_extension(
+                self.user_info.output, "_uncertainty"
             )
             itk.imwrite(self.uncertainty_image, n)
 
         # dose in gray
         if self.user_info.gray:
-            self.py_dose_image = gate.get_cpp_image(self.cpp_dose_image)
+            if self.user_info.gray_method == "density":
+                mass = self.compute_mass_map()
+                self.py_dose_image = self.compute_dose_from_density_map(
+                    self.py_edep_image, mass
+                )
+                if self.user_info.output_per_run:
+                    self.write_run_dose_from_density_map(mass)
+            else:
+                self.py_dose_image = gate.get_cpp_image(self.cpp_dose_image)
             self.py_dose_image.SetOrigin(self.output_origin)
-            n = gate.check_filename_type(self.user_info.output).replace(
-                ".mhd", "_dose.mhd"
-            )
+            n = gate.insert_suffix_before_extension(self.user_info.output, "_dose")
             itk.imwrite(self.py_dose_image, n)
 
         # write the image at the end of the run
@@ -223,12 +431,33 @@ class DoseActor(g4.GateDoseActor, gate.ActorBase):
             )
 
     def compute_uncertainty(self):
-        self.py_temp_image = gate.get_cpp_image(self.cpp_temp_image)
+        if self.user_info.uncertainty_method == "batch":
+            self.compute_uncertainty_from_batches()
+            return
         self.py_square_image = gate.get_cpp_image(self.cpp_square_image)
-        self.py_last_id_image = gate.get_cpp_image(self.cpp_last_id_image)
+        self.py_square_image.SetOrigin(self.output_origin)
+        if self.user_info.uncertainty_method == "image":
+            self.complete_with_temp_image()
+        edep = itk.array_view_from_image(self.py_edep_image)
+        square = itk.array_view_from_image(self.py_square_image)
+
+        # uncertainty image
+        unc = compute_relative_uncertainty(edep, square, edep.size)
+        self.uncertainty_image = gate.itk_image_view_from_array(unc)
+        self.uncertainty_image.CopyInformation(self.py_square_image)
+        self.uncertainty_image.SetOrigin(self.output_origin)
+
+        # debug
+        """itk.imwrite(self.py_square_image, "square.mhd")
+        itk.imwrite(self.py_temp_image, "temp.mhd")
+        itk.imwrite(self.py_last_id_image, "lastid.mhd")
+        itk.imwrite(self.uncertainty_image, "uncer.mhd")"""
 
+    def complete_with_temp_image(self):
+        # the values of the last events are still in the temporary image
+        self.py_temp_image = gate.get_cpp_image(self.cpp_temp_image)
+        self.py_last_id_image = gate.get_cpp_image(self.cpp_last_id_image)
         self.py_temp_image.SetOrigin(self.output_origin)
-        self.py_square_image.SetOrigin(self.output_origin)
         self.py_last_id_image.SetOrigin(self.output_origin)
 
         # complete edep with temp values
@@ -244,21 +473,151 @@ class DoseActor(g4.GateDoseActor, gate.ActorBase):
         self.py_square_image = gate.itk_image_view_from_array(square)
         self.py_square_image.CopyInformation(self.py_temp_image)
 
-        # uncertainty image
-        self.uncertainty_image = gate.create_image_like(self.py_edep_image)
-        unc = itk.array_view_from_image(self.uncertainty_image)
-        N = unc.size
-        # unc = np.sqrt(1 / (N - 1) * (square / N - np.power(edep / N, 2)))
-        unc = 1 / (N - 1) * (square / N - np.power(edep / N, 2))
-        unc = np.ma.masked_array(unc, unc < 0)
-        unc = np.ma.sqrt(unc)
-        unc = np.divide(unc, edep / N, out=np.ones_like(unc), where=edep != 0)
+    def compute_uncertainty_from_batches(self):
+        # the final edep is the sum of the edep of all batches
+        batches = np.stack([img.to_pyarray() for img in self.cpp_batch_images])
+        K = batches.shape[0]
+        edep = np.sum(batches, axis=0)
+        edep_image = gate.itk_image_view_from_array(edep)
+        edep_image.CopyInformation(self.py_edep_image)
+        self.py_edep_image = edep_image
+
+        # relative uncertainty of the sum: std of the batches / (sqrt(K) * mean)
+        mean = edep / K
+        std = np.std(batches, axis=0, ddof=1)
+        unc = np.divide(std, np.sqrt(K) * mean, out=np.ones_like(edep), where=edep != 0)
         self.uncertainty_image = gate.itk_image_view_from_array(unc)
-        self.uncertainty_image.CopyInformation(self.py_temp_image)
+        self.uncertainty_image.CopyInformation(self.py_edep_image)
         self.uncertainty_image.SetOrigin(self.output_origin)
 
-        # debug
-        """itk.imwrite(self.py_square_image, "square.mhd")
-        itk.imwrite(self.py_temp_image, "temp.mhd")
-        itk.imwrite(self.py_last_id_image, "lastid.mhd")
-        itk.imwrite(self.uncertainty_image, "uncer.mhd")"""
+    def end_simulation_action_sparse(self):
+        self.sparse_voxels = self.GetSparseVoxels()
+        v = self.sparse_voxels
+        N = np.prod(self.user_info.size)
+        if self.user_info.uncertainty:
+            v["uncertainty"] = compute_relative_uncertainty(v["edep"], v["square"], N)
+        if self.user_info.gray and self.user_info.gray_method == "density":
+            mass = self.compute_mass_map().ravel()
+            v["dose"] = edep_to_dose(v["edep"], mass[v["index"]])
+        if not self.user_info.output:
+            return
+        output = str(gate.check_filename_type(self.user_info.output))
+
+        # write the sparse values directly
+        info = gate.get_info_from_image(self.py_edep_image)
+        if output.endswith(".npz"):
+            arrays = {"index": v["index"], "edep": v["edep"]}
+            if self.user_info.uncertainty:
+                arrays["uncertainty"] = v["uncertainty"]
+            if self.user_info.gray:
+                arrays["dose"] = v["dose"]
+            np.savez(
+                output,
+                size=info.size,
+                spacing=info.spacing,
+                origin=np.array(self.output_origin),
+                **arrays,
+            )
+            return
+
+        # or convert to dense images (only at write time)
+        self.py_edep_image = self.create_image_from_sparse(v["edep"])
+        itk.imwrite(self.py_edep_image, output)
+        if self.user_info.uncertainty:
+            self.uncertainty_image = self.create_image_from_sparse(
+                v["uncertainty"], fill_value=1
+            )
+            itk.imwrite(
+                self.uncertainty_image,
+                gate.insert_suffix_before_extension(output, "_uncertainty"),
+            )
+        if self.user_info.gray:
+            self.py_dose_image = self.create_image_from_sparse(v["dose"])
+            itk.imwrite(
+                self.py_dose_image, gate.insert_suffix_before_extension(output, "_dose")
+            )
+
+    def compute_mass_map(self):
+        """
+        Mass of each dose voxel, from the density of the material (label of the
+        attached image volume) at the center of the voxel.
+        """
+        vol = self.volume_engine.g4_volumes[self.user_info.mother]
+        labels = itk.array_view_from_image(vol.py_image)
+        densities = np.array(
+            [
+                self.volume_engine.find_or_build_material(m).GetDensity()
+                for m in vol.final_materials
+            ]
+        )
+        # centers of the dose voxels, in the coordinate system of the volume
+        size = np.array(self.user_info.size)
+        spacing = np.array(self.user_info.spacing)
+        x, y, z = [
+            self.img_origin_during_run[i] + np.arange(size[i]) * spacing[i]
+            for i in range(3)
+        ]
+        # corresponding voxels in the label image (same rounding as itk)
+        label_origin = np.array(vol.py_image.GetOrigin())
+        label_spacing = np.array(vol.py_image.GetSpacing())
+        label_size = np.array(itk.size(vol.py_image))
+        index = [
+            np.floor((c - label_origin[i]) / label_spacing[i] + 0.5).astype(int)
+            for i, c in enumerate((x, y, z))
+        ]
+        inside = [(idx >= 0) & (idx < label_size[i]) for i, idx in enumerate(index)]
+        index = [np.clip(idx, 0, label_size[i] - 1) for i, idx in enumerate(index)]
+        # arrays are in [z, y, x] order
+        density = densities[labels[np.ix_(index[2], index[1], index[0])]]
+        # outside the image: no edep, hence no dose
+        inside = (
+            inside[2][:, None, None]
+            & inside[1][None, :, None]
+            & inside[0][None, None, :]
+        )
+        density = np.where(inside, density, 0)
+        return density * np.prod(spacing)
+
+    def compute_dose_from_density_map(self, edep_image, mass):
+        edep = itk.array_view_from_image(edep_image)
+        dose = edep_to_dose(edep, mass)
+        dose_image = gate.itk_image_view_from_array(dose.astype(np.float32))
+        dose_image.CopyInformation(edep_image)
+        return dose_image
+
+    def write_run_dose_from_density_map(self, mass):
+        # the edep images of the runs have been written at the end of each run
+        for edep_filename, dose_filename in zip(
+            self.fRunEdepFilenames, self.fRunDoseFilenames
+        ):
+            edep_image = itk.imread(edep_filename)
+            itk.imwrite(
+                self.compute_dose_from_density_map(edep_image, mass), dose_filename
+            )
+
+    def create_image_from_sparse(self, values, fill_value=0):
+        size = self.user_info.size
+        arr = np.full(size[2] * size[1] * size[0], fill_value, dtype=np.float32)
+        arr[self.sparse_voxels["index"]] = values
+        img = gate.itk_image_view_from_array(arr.reshape(size[2], size[1], size[0]))
+        img.SetSpacing(self.py_edep_image.GetSpacing())
+        img.SetOrigin(self.output_origin)
+        return img
+
+
+def edep_to_dose(edep, mass):
+    # edep is in MeV, dose in Gray (zero where the mass is zero)
+    MeV = gate.g4_units("MeV")
+    Gy = gate.g4_units("Gy")
+    return np.divide(
+        edep * MeV / Gy, mass, out=np.zeros(np.shape(edep)), where=mass > 0
+    )
+
+
+def compute_relative_uncertainty(edep, square, N):
+    # unc = np.sqrt(1 / (N - 1) * (square / N - np.power(edep / N, 2)))
+    unc = 1 / (N - 1) * (square / N - np.power(edep / N, 2))
+    unc = np.ma.masked_array(unc, unc < 0)
+    unc = np.ma.sqrt(unc)
+    unc = np.divide(unc, edep / N, out=np.ones_like(unc), where=edep != 0)
+    return np.ma.getdata(unc)
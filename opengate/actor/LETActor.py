@@ -26,6 +26,13 @@ class LETActor(g4.GateLETActor, gate.ActorBase):
         - LETd only for the moment
         - later: LETt, Q, fluence ...
 
+    Multi-thread: each thread accumulates in its own numerator/denominator buffers,
+    merged at the end of the simulation.
+
+    The electronic dedx is cached (per thread) for each particle and material in log-spaced
+    energy bins and linearly interpolated. Set "dedx_cache_bins_per_decade" to 0 to compute
+    it at every step.
+
     """
 
     type_name = "LETActor"
@@ -50,6 +57,7 @@ class LETActor(g4.GateLETActor, gate.ActorBase):
         user_info.let_to_water = False
         user_info.other_material = ""
         user_info.separate_output = False
+        user_info.dedx_cache_bins_per_decade = 200
 
     def __init__(self, user_info):
         ## TODO: why not super? what would happen?
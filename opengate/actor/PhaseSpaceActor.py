@@ -18,6 +18,14 @@ class PhaseSpaceActor(g4.GatePhaseSpaceActor, gate.ActorBase):
         user_info.output = f"{user_info.name}.root"
         user_info.store_absorbed_event = False
         user_info.debug = False
+        # write and clear the phsp during the run (per thread, 0 means no limit)
+        user_info.flush_every_n_events = 0
+        user_info.flush_every_n_digis = 0
+        user_info.flush_max_bytes = 0
+        # write the output (npy or hdf5) in a background thread
+        user_info.async_write = False
+        # keep the values (all threads) in memory, see get_digi_collection_arrays
+        user_info.keep_in_memory = False
 
     def __getstate__(self):
         # needed to not pickle. Need to copy fNumberOfAbsorbedEvents from c++ part
@@ -0,0 +1,37 @@
+import opengate_core as g4
+from .DoseActor import DoseActor
+
+
+class TLEDoseActor(g4.GateTLEDoseActor, DoseActor):
+    """
+    TLEDoseActor: same as the DoseActor, but the edep/dose of the photons is
+    computed with a track length estimator (TLE): along each photon step, the
+    energy deposited in a voxel is energy x track length in the voxel x mu_en.
+    Converge much faster than the DoseActor for low energy photons.
+
+    - the energy given to the secondary electrons is assumed to be deposited
+        locally: the other particles are not scored (kerma approximation)
+    - mu_en is approximated by the energy transfer coefficient (photoelectric,
+        Compton and pair production cross sections from Geant4, radiative losses
+        of the electrons neglected). It is tabulated per material, in energy bins
+        ("mu_en_bins_per_decade", 0 means no table)
+    - all the options and outputs of the DoseActor are available, except
+        "hit_type" and "replica_index" that are not used
+    """
+
+    type_name = "TLEDoseActor"
+
+    def set_default_user_info(user_info):
+        DoseActor.set_default_user_info(user_info)
+        user_info.mu_en_bins_per_decade = 200
+
+    def __init__(self, user_info):
+        DoseActor.__init__(self, user_info)
+
+    def init_cpp_actor(self, user_info):
+        g4.GateTLEDoseActor.__init__(self, user_info.__dict__)
+
+    def __str__(self):
+        u = self.user_info
+        s = f'TLEDoseActor "{u.name}": dim={u.size} spacing={u.spacing} {u.output} tr={u.translation}'
+        return s
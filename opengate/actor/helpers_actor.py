@@ -1,7 +1,12 @@
 import opengate as gate
+import opengate_core as g4
+import numpy as np
+import pathlib
+import json
 from .ARFActor import *
 from .ARFTrainingDatasetActor import *
 from .DoseActor import *
+from .TLEDoseActor import *
 from .LETActor import *
 from .DigitizerAdderActor import *
 from .DigitizerReadoutActor import *
@@ -9,6 +14,10 @@ from .DigitizerEnergyWindowsActor import *
 from .DigitizerProjectionActor import *
 from .DigitizerBlurringActor import *
 from .DigitizerSpatialBlurringActor import *
+from .DigitizerChainActor import *
+from .DigitizerCoincidenceSorterActor import *
+from .DigitizerDeadTimeActor import *
+from .DigitizerPileupActor import *
 from .MotionVolumeActor import *
 from .PhaseSpaceActor import *
 from .SimulationStatisticsActor import *
@@ -18,6 +27,7 @@ from .TestActor import *
 actor_type_names = {
     SimulationStatisticsActor,
     DoseActor,
+    TLEDoseActor,
     LETActor,
     SourceInfoActor,
     PhaseSpaceActor,
@@ -28,6 +38,10 @@ actor_type_names = {
     DigitizerReadoutActor,
     DigitizerBlurringActor,
     DigitizerSpatialBlurringActor,
+    DigitizerChainActor,
+    DigitizerCoincidenceSorterActor,
+    DigitizerDeadTimeActor,
+    DigitizerPileupActor,
     MotionVolumeActor,
     ARFActor,
     ARFTrainingDatasetActor,
@@ -36,6 +50,87 @@ actor_type_names = {
 actor_builders = gate.make_builders(actor_type_names)
 
 
+def get_digi_collection_arrays(name):
+    """
+    Values of a digi collection (the name of the actor) kept in memory with
+    the option keep_in_memory, as a dict of numpy arrays, one per attribute.
+    The arrays are read-only views on the collection (no copy), except for
+    string attributes (lists). 3D vectors are Nx3 arrays.
+    A view keeps its values alive and unchanged: if the collection is filled
+    again, the new values are appended to a copy of the column, and are only
+    seen by the next call.
+    """
+    dcm = g4.GateDigiCollectionManager.GetInstance()
+    hc = dcm.GetDigiCollection(name)
+    arrays = {}
+    for att_name in hc.GetDigiAttributeNames():
+        a = hc.GetColumn(att_name)
+        if a is None:
+            # no values have been stored
+            a = []
+        elif isinstance(a, np.ndarray):
+            a.flags.writeable = False
+        arrays[att_name] = a
+    return arrays
+
+
+def read_digi_collection_index(filename):
+    """
+    Read the index (json) of a digi collection written as one file per
+    thread (npy or hdf5 output). The filename can be the index file
+    (e.g. hits.index.json) or the output of the actor (e.g. hits.npy).
+    """
+    filename = pathlib.Path(filename)
+    if not filename.name.endswith(".index.json"):
+        filename = filename.with_suffix(".index.json")
+    with open(filename) as f:
+        index = json.load(f)
+    # the shards filenames are relative to the index
+    for shard in index["shards"]:
+        shard["filename"] = filename.parent / shard["filename"]
+    return index
+
+
+def read_digi_collection_shards(filename):
+    """
+    Iterate over the shards (one per thread) of a digi collection written in
+    npy or hdf5. Each shard is a dict of arrays, one per attribute, that are
+    read lazily (memory map for npy, h5py datasets for hdf5). The hdf5 file
+    of a shard is closed when the next shard is read: the datasets must be
+    copied (e.g. np.array) to be used after that.
+    """
+    index = read_digi_collection_index(filename)
+    names = [att["name"] for att in index["attributes"]]
+    for shard in index["shards"]:
+        if index["format"] == "npy":
+            a = np.load(shard["filename"], mmap_mode="r")
+            yield {name: a[name] for name in names}
+        else:
+            h5py = gate.import_h5py()
+            with h5py.File(shard["filename"], "r") as f:
+                yield {name: f[name] for name in names}
+
+
+def read_digi_collection(filename):
+    """
+    Read all the shards of a digi collection written in npy or hdf5, as a
+    dict of numpy arrays (one per attribute).
+    """
+    # (copy the values while the file of the shard is open)
+    shards = [
+        {k: np.array(v) for k, v in shard.items()}
+        for shard in read_digi_collection_shards(filename)
+    ]
+    index = read_digi_collection_index(filename)
+    arrays = {}
+    for att in index["attributes"]:
+        if len(shards) == 0:
+            arrays[att["name"]] = np.array([])
+        else:
+            arrays[att["name"]] = np.concatenate([s[att["name"]] for s in shards])
+    return arrays
+
+
 def get_simplified_digitizer_channels_Tc99m(spect_name, scatter_flag):
     keV = gate.g4_units("keV")
     # Tc99m
@@ -148,6 +148,19 @@ def check_filename_type(filename):
     return filename
 
 
+def insert_suffix_before_extension(filename, suffix):
+    """
+    Insert a suffix in the filename, before the extension (including the
+    compressed ones): edep.nii.gz with "_run0" gives edep_run0.nii.gz
+    """
+    p = Path(filename)
+    ext = p.suffix
+    if ext == ".gz" and len(p.suffixes) > 1:
+        ext = p.suffixes[-2] + ext
+    stem = p.name[: len(p.name) - len(ext)]
+    return str(p.with_name(stem + suffix + ext))
+
+
 def get_random_folder_name(size=8, create=True):
     r = "".join(random.choices(string.ascii_lowercase + string.digits, k=size))
     r = "run." + r
@@ -191,6 +204,26 @@ def import_gaga_phsp():
     return gaga
 
 
+def import_h5py():
+    # Try to import h5py
+    try:
+        import h5py
+    except:
+        gate.fatal("The module \"h5py\" is needed. Use 'pip install h5py'")
+    return h5py
+
+
+def import_onnxruntime():
+    # Try to import onnxruntime
+    try:
+        import onnxruntime
+    except:
+        gate.fatal(
+            "The module \"onnxruntime\" is needed. Use 'pip install onnxruntime'"
+        )
+    return onnxruntime
+
+
 def import_garf():
     # Try to import torch
     try:
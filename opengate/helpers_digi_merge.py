@@ -0,0 +1,288 @@
+import opengate as gate
+import numpy as np
+import pathlib
+import tempfile
+import struct
+import multiprocessing
+
+
+def merge_digi_files(
+    inputs,
+    output,
+    sort_key=None,
+    chunk_size=1000000,
+    processes=1,
+    tree_name=None,
+    tmp_folder=None,
+):
+    """
+    Concatenate digi collections files (root, npy, hdf5, or the index of
+    the shards written by the digitizer actors) into a single output file
+    (root or npy, according to the extension).
+
+    The data are streamed chunk by chunk (chunk_size rows), the memory
+    footprint is bounded to about (processes + 1) chunks. The chunks are
+    read with several processes.
+
+    If sort_key is given (e.g. "GlobalTime" or "EventID"), the output is
+    sorted with an external merge sort: every chunk is sorted and stored in
+    a temporary file (in tmp_folder), then all sorted files are merged.
+    """
+    sources = _expand_inputs(inputs, tree_name)
+    if len(sources) == 0:
+        gate.fatal(f"No input digi files in {inputs}")
+    tasks = []
+    for src in sources:
+        n = _get_source_size(src)
+        for start in range(0, n, chunk_size):
+            tasks.append((src, start, min(start + chunk_size, n)))
+
+    writer = _new_stream_writer(output, tree_name)
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    try:
+        if sort_key is None:
+            _merge_chunks(tasks, writer, pool, processes)
+        else:
+            with tempfile.TemporaryDirectory(dir=tmp_folder) as folder:
+                tasks = [t + (sort_key, folder, i) for i, t in enumerate(tasks)]
+                runs = _map(_sort_chunk_to_run, tasks, pool, processes)
+                block_size = max(1, chunk_size // max(1, len(runs)))
+                _merge_sorted_runs(runs, sort_key, writer, block_size)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        writer.close()
+    return writer.n
+
+
+def _expand_inputs(inputs, tree_name):
+    # a source is a tuple (format, filename, tree name)
+    sources = []
+    for f in inputs:
+        f = pathlib.Path(f)
+        index = f
+        if not f.name.endswith(".index.json"):
+            index = f.with_suffix(".index.json")
+        if f.name.endswith(".index.json") or (not f.exists() and index.exists()):
+            idx = gate.read_digi_collection_index(index)
+            for shard in idx["shards"]:
+                sources.append((idx["format"], str(shard["filename"]), None))
+            continue
+        if not f.exists():
+            gate.fatal(f"Cannot find the digi file {f}")
+        if f.suffix == ".npy":
+            sources.append(("npy", str(f), None))
+        elif f.suffix in [".h5", ".hdf5"]:
+            sources.append(("hdf5", str(f), None))
+        elif f.suffix == ".root":
+            sources.append(("root", str(f), _get_root_tree_name(f, tree_name)))
+        else:
+            gate.fatal(f"Unknown digi file format for {f} (root, npy, h5)")
+    return sources
+
+
+def _get_root_tree_name(filename, tree_name):
+    import uproot
+
+    if tree_name is not None:
+        return tree_name
+    with uproot.open(filename) as f:
+        trees = [k.split(";")[0] for k, c in f.classnames().items() if c == "TTree"]
+    if len(trees) != 1:
+        gate.fatal(f"Several (or no) trees in {filename}: {trees}, use the tree name")
+    return trees[0]
+
+
+def _get_source_size(src):
+    fmt, filename, tree = src
+    if fmt == "npy":
+        return len(np.load(filename, mmap_mode="r"))
+    if fmt == "hdf5":
+        h5py = gate.import_h5py()
+        with h5py.File(filename, "r") as f:
+            return len(f[list(f.keys())[0]])
+    import uproot
+
+    with uproot.open(filename) as f:
+        return f[tree].num_entries
+
+
+def _read_chunk(task):
+    # read rows [start, stop[ of the source, as a numpy structured array
+    src, start, stop = task[:3]
+    fmt, filename, tree = src
+    if fmt == "npy":
+        return np.array(np.load(filename, mmap_mode="r")[start:stop])
+    if fmt == "hdf5":
+        h5py = gate.import_h5py()
+        with h5py.File(filename, "r") as f:
+            columns = {k: f[k][start:stop] for k in f.keys()}
+    else:
+        import uproot
+
+        with uproot.open(filename) as f:
+            columns = f[tree].arrays(entry_start=start, entry_stop=stop, library="np")
+    return _columns_to_structured(columns)
+
+
+def _columns_to_structured(columns):
+    dtype = []
+    for name, v in columns.items():
+        v = np.asarray(v)
+        if v.dtype.kind in "OUS":
+            # strings are stored with a fixed size (same as the digitizer)
+            v = v.astype("S64")
+            columns[name] = v
+        dtype.append((name, v.dtype, v.shape[1:]))
+    a = np.empty(len(next(iter(columns.values()))), dtype=dtype)
+    for name, v in columns.items():
+        a[name] = v
+    return a
+
+
+def _map(f, tasks, pool, processes):
+    # ordered map, by waves, so that only 'processes' results are in memory
+    results = []
+    for i in range(0, len(tasks), max(1, processes)):
+        wave = tasks[i : i + max(1, processes)]
+        results += pool.map(f, wave) if pool is not None else [f(t) for t in wave]
+    return results
+
+
+def _merge_chunks(tasks, writer, pool, processes):
+    for i in range(0, len(tasks), max(1, processes)):
+        wave = tasks[i : i + max(1, processes)]
+        chunks = pool.map(_read_chunk, wave) if pool else map(_read_chunk, wave)
+        for chunk in chunks:
+            writer.write(chunk)
+
+
+def _sort_chunk_to_run(task):
+    sort_key, folder, i = task[3:]
+    a = _read_chunk(task)
+    if sort_key not in a.dtype.names:
+        gate.fatal(f"Cannot sort by {sort_key}, attributes are {a.dtype.names}")
+    a = a[np.argsort(a[sort_key], kind="stable")]
+    filename = pathlib.Path(folder) / f"run_{i}.npy"
+    np.save(filename, a)
+    return filename
+
+
+def _merge_sorted_runs(runs, key, writer, block_size):
+    """
+    k-way merge of the sorted files, by blocks: at each step, all loaded rows
+    with a key lower than the smallest last loaded key (among the files not
+    completely loaded) can be sorted and written.
+    """
+    arrays = [np.load(r, mmap_mode="r") for r in runs]
+    pos = [0] * len(arrays)
+    buffers = [None] * len(arrays)
+
+    def refill(i):
+        buffers[i] = np.array(arrays[i][pos[i] : pos[i] + block_size])
+        pos[i] += len(buffers[i])
+
+    for i in range(len(arrays)):
+        refill(i)
+    while any(len(b) > 0 for b in buffers):
+        active = [i for i in range(len(arrays)) if len(buffers[i]) > 0]
+        loading = [i for i in active if pos[i] < len(arrays[i])]
+        threshold = None
+        if len(loading) > 0:
+            threshold = min(buffers[i][key][-1] for i in loading)
+        parts = []
+        for i in active:
+            b = buffers[i]
+            n = len(b)
+            if threshold is not None:
+                n = np.searchsorted(b[key], threshold, side="right")
+            parts.append(b[:n])
+            buffers[i] = b[n:]
+        merged = np.concatenate(parts)
+        writer.write(merged[np.argsort(merged[key], kind="stable")])
+        for i in active:
+            if len(buffers[i]) == 0 and pos[i] < len(arrays[i]):
+                refill(i)
+
+
+def _new_stream_writer(output, tree_name):
+    output = pathlib.Path(output)
+    if output.suffix == ".npy":
+        return _NpyStreamWriter(output)
+    if output.suffix == ".root":
+        return _RootStreamWriter(output, tree_name)
+    gate.fatal(f"Unknown output format for {output} (root or npy)")
+
+
+class _NpyStreamWriter:
+    """
+    Write a npy structured array chunk by chunk: the header (fixed size) is
+    written again at the end with the final number of rows.
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, "wb")
+        self.dtype = None
+        self.n = 0
+
+    def header(self):
+        descr = np.lib.format.dtype_to_descr(self.dtype)
+        h = f"{{'descr': {repr(descr)}, 'fortran_order': False, 'shape': ({self.n:20d},), }}"
+        total = 10 + len(h) + 1
+        h += " " * ((64 - total % 64) % 64) + "\n"
+        return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(h)) + h.encode("latin1")
+
+    def write(self, a):
+        if self.dtype is None:
+            self.dtype = a.dtype
+            self.file.write(self.header())
+        if a.dtype != self.dtype:
+            gate.fatal(f"Cannot merge digi with different attributes: {a.dtype}")
+        self.file.write(a.tobytes())
+        self.n += len(a)
+
+    def close(self):
+        if self.dtype is None:
+            self.dtype = np.dtype("f8")
+        self.file.seek(0)
+        self.file.write(self.header())
+        self.file.close()
+
+
+class _RootStreamWriter:
+    """
+    Write a root tree chunk by chunk, 3D vectors are split in _X _Y _Z
+    branches and fixed size strings are written as strings (as the digitizer).
+    """
+
+    def __init__(self, filename, tree_name):
+        import uproot
+
+        self.file = uproot.recreate(filename)
+        self.tree_name = tree_name if tree_name is not None else "digi"
+        self.tree = None
+        self.n = 0
+
+    def write(self, a):
+        branches = {}
+        for name in a.dtype.names:
+            v = a[name]
+            if v.ndim == 2 and v.shape[1] == 3:
+                for j, axis in enumerate("XYZ"):
+                    branches[f"{name}_{axis}"] = np.ascontiguousarray(v[:, j])
+            elif v.dtype.kind == "S":
+                import awkward
+
+                branches[name] = awkward.from_numpy(np.char.decode(v, "ascii"))
+            else:
+                branches[name] = np.ascontiguousarray(v)
+        if self.tree is None:
+            self.file[self.tree_name] = branches
+            self.tree = self.file[self.tree_name]
+        else:
+            self.tree.extend(branches)
+        self.n += len(a)
+
+    def close(self):
+        self.file.close()
@@ -6,14 +6,16 @@ import opengate_core as g4
 from scipy.spatial.transform import Rotation
 
 
-def update_image_py_to_cpp(py_img, cpp_img, copy_data=False):
-    cpp_img.set_size(py_img.GetLargestPossibleRegion().GetSize())
+def update_image_py_to_cpp(py_img, cpp_img, copy_data=False, allocate=True):
+    # if allocate is False, only the geometry (size, spacing, etc.) is set
+    cpp_img.set_size(py_img.GetLargestPossibleRegion().GetSize(), allocate)
     cpp_img.set_spacing(py_img.GetSpacing())
     cpp_img.set_origin(py_img.GetOrigin())
     # this is needed !
     cpp_img.set_region(
         py_img.GetLargestPossibleRegion().GetIndex(),
         py_img.GetLargestPossibleRegion().GetSize(),
+        allocate,
     )
     # It is really a pain to convert GetDirection into
     # something that can be read by SetDirection !
@@ -25,6 +27,25 @@ def update_image_py_to_cpp(py_img, cpp_img, copy_data=False):
         cpp_img.from_pyarray(arr)
 
 
+def read_sparse_image(filename, key="edep"):
+    """
+    Read a sparse image (.npz file, written for example by the DoseActor with the
+    sparse option) and convert it to a dense itk image.
+    """
+    data = np.load(filename)
+    if key not in data:
+        gate.fatal(f'Cannot find "{key}" in the sparse image {filename}')
+    size = data["size"]
+    # the uncertainty of the non-touched voxels is 1 (100%)
+    fill_value = 1 if key == "uncertainty" else 0
+    arr = np.full(np.prod(size), fill_value, dtype=np.float32)
+    arr[data["index"]] = data[key]
+    img = itk_image_view_from_array(arr.reshape(size[2], size[1], size[0]))
+    img.SetSpacing(data["spacing"])
+    img.SetOrigin(data["origin"])
+    return img
+
+
 def itk_dir_to_rotation(dir):
     return itk.GetArrayFromVnlMatrix(dir.GetVnlMatrix().as_matrix())
 
@@ -0,0 +1,318 @@
+import opengate as gate
+import numpy as np
+import pathlib
+import threading
+import json
+from box import Box
+
+
+def export_gan_to_onnx(pth_filename, onnx_filename=None, verbose=False):
+    """
+    Export the Generator of a GAN (gaga_phsp .pth file) to an ONNX file that
+    can be used by the GAN sources with nn_backend = "onnx", without torch.
+
+    The parameters needed to sample the latent space and to denormalize the
+    generated samples (as in gaga_phsp generate_samples2) are stored in the
+    metadata of the ONNX file. torch and gaga_phsp are only needed here.
+    """
+    gaga = gate.import_gaga_phsp()
+    import torch
+
+    pth_filename = pathlib.Path(pth_filename)
+    if onnx_filename is None:
+        onnx_filename = pth_filename.with_suffix(".onnx")
+    params, G, D, optim, dtypef = gaga.load(str(pth_filename), "auto", verbose=False)
+    if "langevin_latent_sampling" in params:
+        gate.fatal(
+            f"Cannot export the GAN {pth_filename} to ONNX: the langevin latent "
+            f"sampling is not supported"
+        )
+
+    # G input is z (+ the condition), output is the (normalized) samples
+    ncond = len(params["cond_keys"])
+    info = {
+        "type": "gan",
+        "z_dim": int(params["z_dim"]),
+        "x_dim": int(params["x_dim"]),
+        "x_mean": np.asarray(params["x_mean"], dtype=np.float64).ravel().tolist(),
+        "x_std": np.asarray(params["x_std"], dtype=np.float64).ravel().tolist(),
+        "keys_list": list(params["keys_list"]),
+        "cond_keys": list(params["cond_keys"]),
+        "z_rand_type": _get_z_rand_type(params),
+    }
+    z = torch.randn(2, info["z_dim"] + ncond)
+    _export_to_onnx(G.cpu().eval(), z, onnx_filename, info, verbose)
+    return onnx_filename
+
+
+def export_arf_to_onnx(pth_filename, onnx_filename=None, verbose=False):
+    """
+    Export the neural network of an ARF (garf .pth file) to an ONNX file that
+    can be used by the ARFActor with nn_backend = "onnx", without torch.
+
+    The normalization of the input and the russian roulette factor (as in
+    garf nn_predict) are stored in the metadata of the ONNX file. torch and
+    garf are only needed here.
+    """
+    garf = gate.import_garf()
+    import torch
+
+    pth_filename = pathlib.Path(pth_filename)
+    if onnx_filename is None:
+        onnx_filename = pth_filename.with_suffix(".onnx")
+    nn, model = garf.load_nn(str(pth_filename), gpu=False, verbose=False)
+    model_data = nn["model_data"]
+
+    # input is the two angles and the energy, output the log proba per window
+    info = {
+        "type": "arf",
+        "n_ene_win": int(model_data["n_ene_win"]),
+        "x_mean": np.asarray(model_data["x_mean"], dtype=np.float64).ravel().tolist(),
+        "x_std": np.asarray(model_data["x_std"], dtype=np.float64).ravel().tolist(),
+        "rr": float(model_data["rr"] if "rr" in model_data else model_data["RR"]),
+    }
+    x = torch.zeros(2, 3)
+    _export_to_onnx(model.cpu().eval(), x, onnx_filename, info, verbose)
+    return onnx_filename
+
+
+def _get_z_rand_type(params):
+    # same as gaga_phsp get_z_rand
+    if "z_rand_type" in params and params["z_rand_type"] in ("rand", "randn"):
+        return params["z_rand_type"]
+    if "z_rand" in params and params["z_rand"] == "uniform":
+        return "rand"
+    return "randn"
+
+
+def _export_to_onnx(net, dummy_input, onnx_filename, info, verbose):
+    import torch
+    import onnx
+
+    onnx_filename = str(onnx_filename)
+    torch.onnx.export(
+        net,
+        dummy_input,
+        onnx_filename,
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={"input": {0: "n"}, "output": {0: "n"}},
+    )
+    # store the info needed by opengate in the metadata
+    m = onnx.load(onnx_filename)
+    m.metadata_props.add(key="opengate", value=json.dumps(info))
+    onnx.save(m, onnx_filename)
+    if verbose:
+        print(f"Export {info['type']} network to {onnx_filename}")
+
+
+def get_onnx_filename(pth_filename, export_function):
+    """
+    Return the ONNX file of a network: the file itself if it is already an
+    .onnx file, otherwise the .onnx file next to the .pth file, exported
+    (once, torch is needed) if it does not exist or is older than the .pth.
+    """
+    filename = pathlib.Path(pth_filename)
+    if filename.suffix == ".onnx":
+        return filename
+    onnx_filename = filename.with_suffix(".onnx")
+    if (
+        not onnx_filename.exists()
+        or onnx_filename.stat().st_mtime < filename.stat().st_mtime
+    ):
+        export_function(filename, onnx_filename, verbose=True)
+    return onnx_filename
+
+
+class OnnxNetwork:
+    """
+    Run an ONNX network (one 2D float input, one 2D float output) with
+    onnxruntime on the CPU, with a given number of intra-op threads.
+
+    The input and output buffers are allocated once per thread, for the
+    largest batch, and bound to the session: no allocation is done for the
+    next batches. The thread that calls run (for example the GAN source of a
+    worker thread) fills the input buffer, the output is a view on the output
+    buffer, valid until the next call to run in the same thread.
+    """
+
+    def __init__(self, filename, threads=1):
+        ort = gate.import_onnxruntime()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(threads)
+        options.inter_op_num_threads = 1
+        self.filename = str(filename)
+        self.session = ort.InferenceSession(
+            self.filename, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        meta = self.session.get_modelmeta().custom_metadata_map
+        if "opengate" not in meta:
+            gate.fatal(
+                f"The ONNX file {filename} was not exported by opengate "
+                f"(see export_gan_to_onnx or export_arf_to_onnx)"
+            )
+        self.info = Box(json.loads(meta["opengate"]))
+        i = self.session.get_inputs()[0]
+        o = self.session.get_outputs()[0]
+        self.input_name = i.name
+        self.input_dim = i.shape[1]
+        self.output_name = o.name
+        self.output_dim = o.shape[1]
+        # buffers of each thread (the python thread state of the threads that
+        # come from the cpp side is not kept, so threading.local cannot be used)
+        self.buffers = {}
+        self.lock = threading.Lock()
+
+    def get_input_buffer(self, n):
+        """
+        Return the input buffer (n rows) of the current thread, to be filled
+        before calling run(n)
+        """
+        b = self._get_buffers(n)
+        return b.input[:n]
+
+    def run(self, n):
+        b = self._get_buffers(n)
+        x = b.input[:n]
+        y = b.output[:n]
+        b.binding.bind_cpu_input(self.input_name, x)
+        b.binding.bind_output(
+            self.output_name, "cpu", 0, np.float32, list(y.shape), y.ctypes.data
+        )
+        self.session.run_with_iobinding(b.binding)
+        return y
+
+    def _get_buffers(self, n):
+        tid = threading.get_ident()
+        b = self.buffers.get(tid)
+        if b is None:
+            b = Box()
+            b.input = np.empty((0, self.input_dim), dtype=np.float32)
+            b.output = np.empty((0, self.output_dim), dtype=np.float32)
+            b.binding = self.session.io_binding()
+            with self.lock:
+                self.buffers[tid] = b
+        if b.input.shape[0] < n:
+            b.input = np.empty((n, self.input_dim), dtype=np.float32)
+            b.output = np.empty((n, self.output_dim), dtype=np.float32)
+        return b
+
+
+class GANOnnxBackend:
+    """
+    Replace the gaga_phsp module (load and generate_samples2) in the GAN
+    source generators, with the Generator exported to ONNX.
+    """
+
+    def __init__(self, threads=1):
+        self.threads = threads
+        self.rng = np.random.default_rng()
+
+    def load(self, filename, gpu_mode="auto", verbose=False):
+        onnx_filename = get_onnx_filename(filename, export_gan_to_onnx)
+        G = OnnxNetwork(onnx_filename, self.threads)
+        if G.info.type != "gan":
+            gate.fatal(f"The ONNX file {onnx_filename} is not a GAN")
+        params = Box(G.info)
+        params.x_mean = np.array(params.x_mean)
+        params.x_std = np.array(params.x_std)
+        params.current_gpu = False
+        return params, G, None, None, None
+
+    def generate_samples2(
+        self,
+        params,
+        G,
+        D,
+        n,
+        batch_size=-1,
+        normalize=False,
+        to_numpy=True,
+        cond=None,
+        silence=True,
+    ):
+        # same as gaga_phsp generate_samples2 (to_numpy is always True)
+        n = int(n)
+        z_dim = params.z_dim
+        x = G.get_input_buffer(n)
+        if params.z_rand_type == "rand":
+            x[:, :z_dim] = self.rng.random((n, z_dim), dtype=np.float32)
+        else:
+            x[:, :z_dim] = self.rng.standard_normal((n, z_dim), dtype=np.float32)
+
+        # normalize the condition
+        x_mean = params.x_mean
+        x_std = params.x_std
+        if cond is not None:
+            xn = params.x_dim
+            cn = len(params.cond_keys)
+            x[:, z_dim:] = (cond[:n] - x_mean[xn - cn : xn]) / x_std[xn - cn : xn]
+            x_mean = x_mean[0 : xn - cn]
+            x_std = x_std[0 : xn - cn]
+        elif len(params.cond_keys) > 0:
+            gate.fatal(
+                f"Error : GAN is conditional, you should provide the condition: "
+                f"{params.cond_keys}"
+            )
+
+        fake = G.run(n).astype(np.float64)
+        if not normalize:
+            fake = fake * x_std + x_mean
+        return fake
+
+
+class ARFOnnxBackend:
+    """
+    Replace the garf module (load_nn, nn_predict and the image helpers) in
+    the ARFActor, with the network exported to ONNX.
+    """
+
+    def __init__(self, threads=1):
+        self.threads = threads
+
+    def load_nn(self, filename, gpu="auto", verbose=False):
+        onnx_filename = get_onnx_filename(filename, export_arf_to_onnx)
+        model = OnnxNetwork(onnx_filename, self.threads)
+        if model.info.type != "arf":
+            gate.fatal(f"The ONNX file {onnx_filename} is not an ARF")
+        model_data = Box(model.info)
+        model_data.x_mean = np.array(model_data.x_mean)
+        model_data.x_std = np.array(model_data.x_std)
+        return {"model_data": model_data}, model
+
+    def nn_predict(self, model, model_data, x):
+        # same as garf nn_predict
+        n = x.shape[0]
+        model.get_input_buffer(n)[:] = (x - model_data.x_mean) / model_data.x_std
+        y = model.run(n).astype(np.float64)
+        # normalize the log proba (exp-normalize trick, avoid overflow)
+        y = np.exp(y - np.max(y, axis=1, keepdims=True))
+        y /= np.sum(y, axis=1, keepdims=True)
+        # russian roulette of the first channel
+        y[:, 0] *= model_data.rr
+        y /= np.sum(y, axis=1, keepdims=True)
+        return y
+
+    @staticmethod
+    def compute_angle_offset(angles, length):
+        angles_rad = np.deg2rad(angles)
+        tx = length * np.cos(angles_rad[:, 1])
+        ty = length * np.cos(angles_rad[:, 0])
+        return np.column_stack((tx, ty))
+
+    @staticmethod
+    def remove_out_of_image_boundaries(u, v, w_pred, size):
+        inside = (v >= 0) & (u >= 0) & (v <= size[1] - 1) & (u <= size[2] - 1)
+        return u[inside], v[inside], w_pred[inside]
+
+    @staticmethod
+    def image_from_coordinates(img, u, v, w_pred):
+        # same as garf image_from_coordinates_add_numpy with hit_slice: the
+        # slice i is the sum of the weights of the window i, the first slice
+        # is the number of hits (one per particle)
+        img.fill(0.0)
+        nb_ene = w_pred.shape[1]
+        for i in range(1, nb_ene):
+            np.add.at(img[i], (u, v), w_pred[:, i])
+        np.add.at(img[0], (u, v), 1)
+        return img
@@ -31,6 +31,9 @@ class GANSource(GenericSource):
         user_info.batch_size = 10000
         user_info.generator = None
         user_info.verbose_generator = False
+        # neural network backend: "torch" (gaga_phsp) or "onnx" (onnxruntime)
+        user_info.nn_backend = "torch"
+        user_info.onnx_threads = 1
         user_info.use_time = False
         user_info.use_weight = False
         # specific to conditional GAN
@@ -34,6 +34,12 @@ class GANSourceConditionalPairsGenerator(GANSourceDefaultPairsGenerator):
         )
         return None
 
+    def import_nn_backend(self):
+        # from_tlor_to_pairs is computed with torch
+        if self.user_info.nn_backend != "torch":
+            self.fatal('only the nn_backend "torch" can be used with this generator')
+        super().import_nn_backend()
+
     def generator(self, source):
         # get the info
         g = self.gan_info
@@ -1,5 +1,4 @@
 from .GenericSource import *
-import sys
 import time
 import scipy
 import threading
@@ -9,8 +8,9 @@ class GANSourceDefaultGenerator:
     """
     This class manage the base components of a particle generator.
 
-    - In the constructor, the module 'gaga' is imported. It is only imported in the constructor to only required
-    this module if it is used
+    - In 'initialize', the module 'gaga' is imported. It is only imported there to only required
+    this module if it is used. With user_info.nn_backend = "onnx", the GAN is run with onnxruntime instead
+    (see GANOnnxBackend), and neither torch nor gaga are imported.
 
     - 'initialize' function: the GAN is loaded and the list of keys is initialized
 
@@ -29,11 +29,8 @@ class GANSourceDefaultGenerator:
 
     def __init__(self, user_info):
         self.user_info = user_info
-        self.gaga = gate.import_gaga_phsp()
+        self.gaga = None
         self.indexes_are_build = None
-        if self.gaga is None:
-            print("Cannot run GANSource, gaga_phsp not installed?")
-            sys.exit()
         self.lock = threading.Lock()
         self.initialize_is_done = False
         self.keys_output = None
@@ -51,10 +48,22 @@ class GANSourceDefaultGenerator:
                 self.read_gan_and_keys()
                 self.initialize_is_done = True
 
+    def import_nn_backend(self):
+        backend = self.user_info.nn_backend
+        if backend == "torch":
+            self.gaga = gate.import_gaga_phsp()
+        elif backend == "onnx":
+            self.gaga = gate.GANOnnxBackend(self.user_info.onnx_threads)
+        else:
+            self.fatal(f'unknown nn_backend "{backend}", must be "torch" or "onnx"')
+
     def read_gan_and_keys(self):
         # allow converting str like 1e5 to int
         self.user_info.batch_size = int(float(self.user_info.batch_size))
 
+        # torch (gaga) or onnx
+        self.import_nn_backend()
+
         # FIXME check the number of params
 
         # read pth and create the gan info structure
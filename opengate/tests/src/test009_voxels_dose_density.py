@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import opengate as gate
+
+paths = gate.get_default_test_paths(__file__, "gate_test009_voxels")
+
+# create the simulation
+sim = gate.Simulation()
+
+# main options
+ui = sim.user_info
+ui.g4_verbose = False
+ui.g4_verbose_level = 1
+ui.visu = False
+
+# add a material database
+sim.add_material_database(paths.data / "GateMaterials.db")
+
+# units
+m = gate.g4_units("m")
+cm = gate.g4_units("cm")
+MeV = gate.g4_units("MeV")
+Bq = gate.g4_units("Bq")
+mm = gate.g4_units("mm")
+
+#  change world size
+world = sim.world
+world.size = [1 * m, 1 * m, 1 * m]
+
+# image
+patient = sim.add_volume("Image", "patient")
+patient.image = paths.data / "patient-4mm.mhd"
+patient.material = "G4_AIR"  # material used by default
+vm = gate.read_voxel_materials(paths.gate_data / "patient-HU2mat-v1.txt")
+vm[0][0] = -2000
+patient.voxel_materials = vm
+
+# default source for tests
+source = sim.add_source("GenericSource", "mysource")
+source.energy.mono = 130 * MeV
+source.particle = "proton"
+source.position.type = "sphere"
+source.position.radius = 10 * mm
+source.position.translation = [0, 0, -14 * cm]
+source.activity = 5000 * Bq
+source.direction.type = "momentum"
+source.direction.momentum = [0, 0, 1]
+
+# cuts
+c = sim.get_physics_user_info().production_cuts
+c.patient.electron = 3 * mm
+
+# two dose actors with the same grid as the image: the dose is computed at
+# each step for the first one, and at the end from the density map for the
+# second one
+info = gate.read_image_info(patient.image)
+dose = sim.add_actor("DoseActor", "dose")
+dose.output = paths.output / "test009-edep-step.mhd"
+dose.mother = "patient"
+dose.size = info.size
+dose.spacing = info.spacing
+dose.img_coord_system = True
+dose.hit_type = "pre"
+dose.uncertainty = False
+dose.gray = True
+
+dose_density = sim.add_actor("DoseActor", "dose_density")
+dose_density.output = paths.output / "test009-edep-density.mhd"
+dose_density.mother = "patient"
+dose_density.size = info.size
+dose_density.spacing = info.spacing
+dose_density.img_coord_system = True
+dose_density.hit_type = "pre"
+dose_density.uncertainty = False
+dose_density.gray = True
+dose_density.gray_method = "density"
+
+# add stat actor
+stats = sim.add_actor("SimulationStatisticsActor", "Stats")
+stats.track_types_flag = True
+
+# start simulation
+output = sim.start()
+
+# print results at the end
+stat = output.get_actor("Stats")
+print(stat)
+
+# tests: same dose, except for the steps starting exactly
+# at the boundary of two voxels (rounding of the lookup)
+is_ok = gate.assert_images(
+    paths.output / "test009-edep-step_dose.mhd",
+    paths.output / "test009-edep-density_dose.mhd",
+    stat,
+    tolerance=10,
+)
+
+gate.test_ok(is_ok)
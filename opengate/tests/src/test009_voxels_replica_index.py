@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import opengate as gate
+
+paths = gate.get_default_test_paths(__file__, "gate_test009_voxels")
+
+# create the simulation
+sim = gate.Simulation()
+
+# main options
+ui = sim.user_info
+ui.g4_verbose = False
+ui.g4_verbose_level = 1
+ui.visu = False
+
+# add a material database
+sim.add_material_database(paths.data / "GateMaterials.db")
+
+# units
+m = gate.g4_units("m")
+cm = gate.g4_units("cm")
+MeV = gate.g4_units("MeV")
+Bq = gate.g4_units("Bq")
+mm = gate.g4_units("mm")
+
+#  change world size
+world = sim.world
+world.size = [1 * m, 1 * m, 1 * m]
+
+# image
+patient = sim.add_volume("Image", "patient")
+patient.image = paths.data / "patient-4mm.mhd"
+patient.material = "G4_AIR"  # material used by default
+vm = gate.read_voxel_materials(paths.gate_data / "patient-HU2mat-v1.txt")
+vm[0][0] = -2000
+patient.voxel_materials = vm
+
+# default source for tests
+source = sim.add_source("GenericSource", "mysource")
+source.energy.mono = 130 * MeV
+source.particle = "proton"
+source.position.type = "sphere"
+source.position.radius = 10 * mm
+source.position.translation = [0, 0, -14 * cm]
+source.activity = 5000 * Bq
+source.direction.type = "momentum"
+source.direction.momentum = [0, 0, 1]
+
+# cuts
+c = sim.get_physics_user_info().production_cuts
+c.patient.electron = 3 * mm
+
+# two dose actors with the same grid as the image:
+# the first one with the index from the replica numbers, the second with
+# the usual lookup of the pre step position
+info = gate.read_image_info(patient.image)
+dose = sim.add_actor("DoseActor", "dose")
+dose.output = paths.output / "test009-edep-replica.mhd"
+dose.mother = "patient"
+dose.size = info.size
+dose.spacing = info.spacing
+dose.img_coord_system = True
+dose.hit_type = "pre"
+dose.replica_index = True
+
+dose_ref = sim.add_actor("DoseActor", "dose_ref")
+dose_ref.output = paths.output / "test009-edep-lookup.mhd"
+dose_ref.mother = "patient"
+dose_ref.size = info.size
+dose_ref.spacing = info.spacing
+dose_ref.img_coord_system = True
+dose_ref.hit_type = "pre"
+
+# add stat actor
+stats = sim.add_actor("SimulationStatisticsActor", "Stats")
+stats.track_types_flag = True
+
+# start simulation
+output = sim.start()
+
+# print results at the end
+stat = output.get_actor("Stats")
+print(stat)
+
+# tests: same images, except for the steps starting exactly
+# at the boundary of two voxels (rounding of the lookup)
+is_ok = gate.assert_images(
+    paths.output / "test009-edep-lookup.mhd",
+    paths.output / "test009-edep-replica.mhd",
+    stat,
+    tolerance=10,
+)
+
+gate.test_ok(is_ok)
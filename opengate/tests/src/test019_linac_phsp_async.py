@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import opengate as gate
+import test019_linac_phsp_helpers as t
+import uproot
+import numpy as np
+
+paths = gate.get_default_test_paths(__file__, "gate_test019_linac_phsp")
+
+sim = t.init_test019(3)
+
+# same phsp, written as npy by a background I/O thread (one per thread)
+phsp = sim.get_actor_user_info("PhaseSpace")
+phsp_async = sim.add_actor("PhaseSpaceActor", "PhaseSpaceAsync")
+phsp_async.mother = phsp.mother
+phsp_async.attributes = phsp.attributes
+phsp_async.filters = phsp.filters
+phsp_async.output = paths.output / "test019_hits_async.npy"
+phsp_async.async_write = True
+phsp_async.flush_every_n_events = 1000
+
+# start simulation
+output = sim.start()
+stats = output.get_actor("Stats")
+print(stats)
+
+# the output must be the same as the root one
+root = uproot.open(paths.output / "test019_hits.root")["PhaseSpace"]
+root = root.arrays(library="numpy")
+index = gate.read_digi_collection_index(phsp_async.output)
+print(f"Index: {index['format']} with {len(index['shards'])} shards")
+for shard in index["shards"]:
+    print(f"    {shard['filename']} {shard['rows']}")
+arrays = gate.read_digi_collection(phsp_async.output)
+
+n = len(root["KineticEnergy"])
+is_ok = len(arrays["KineticEnergy"]) == n
+is_ok = is_ok and sum(s["rows"] for s in index["shards"]) == n
+gate.print_test(is_ok, f"Number of particles: {len(arrays['KineticEnergy'])} vs {n}")
+
+# the order may differ (threads), compare sorted values
+for k in ["KineticEnergy", "Weight", "GlobalTime"]:
+    b = np.allclose(np.sort(arrays[k]), np.sort(root[k]))
+    gate.print_test(b, f"Values of {k}")
+    is_ok = is_ok and b
+
+b = np.allclose(np.sort(arrays["PostPosition"][:, 2]), np.sort(root["PostPosition_Z"]))
+gate.print_test(b, "Values of PostPosition (Nx3)")
+is_ok = is_ok and b
+
+gate.test_ok(is_ok)
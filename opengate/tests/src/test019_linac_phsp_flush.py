@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import test019_linac_phsp_helpers as t
+
+sim = t.init_test019(3)
+
+# write and clear the phsp during the run, the output must be the same
+phsp = sim.get_actor_user_info("PhaseSpace")
+phsp.flush_every_n_events = 1000
+phsp.flush_max_bytes = 100000
+
+t.run_test019(sim)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import opengate as gate
+import test019_linac_phsp_helpers as t
+import uproot
+import numpy as np
+
+paths = gate.get_default_test_paths(__file__, "gate_test019_linac_phsp")
+
+sim = t.init_test019(3)
+
+# keep the phsp in memory, in addition to the root output
+phsp = sim.get_actor_user_info("PhaseSpace")
+phsp.keep_in_memory = True
+
+# splitting
+linac = sim.get_volume_user_info("linac")
+s = f"/process/em/setSecBiasing eBrem {linac.name}_target 100 100 MeV"
+sim.apply_g4_command(s)
+
+# start simulation
+output = sim.start()
+stats = output.get_actor("Stats")
+print(stats)
+
+# get the numpy arrays (kept in memory, the root file is only read for the comparison)
+arrays = gate.get_digi_collection_arrays("PhaseSpace")
+for k, v in arrays.items():
+    print(f"{k:<30} {type(v).__name__} {len(v)}")
+
+# compare with the root file
+root = uproot.open(paths.output / "test019_hits.root")["PhaseSpace"]
+root = root.arrays(library="numpy")
+n = len(root["KineticEnergy"])
+is_ok = len(arrays["KineticEnergy"]) == n
+gate.print_test(is_ok, f"Number of particles: {len(arrays['KineticEnergy'])} vs {n}")
+
+# the order may differ (threads), compare sorted values
+for k in ["KineticEnergy", "Weight"]:
+    b = np.allclose(np.sort(arrays[k]), np.sort(root[k]))
+    gate.print_test(b, f"Values of {k}")
+    is_ok = is_ok and b
+
+b = arrays["PostPosition"].shape == (n, 3)
+b = b and np.allclose(
+    np.sort(arrays["PostPosition"][:, 0]), np.sort(root["PostPosition_X"])
+)
+gate.print_test(b, f"3D vector as Nx3 array: {arrays['PostPosition'].shape}")
+is_ok = is_ok and b
+
+# the views share the column with the collection, they cannot be modified
+b = not arrays["KineticEnergy"].flags.writeable
+b = b and not arrays["PostPosition"].flags.writeable
+gate.print_test(b, "The numpy views are read-only")
+is_ok = is_ok and b
+
+gate.test_ok(is_ok)
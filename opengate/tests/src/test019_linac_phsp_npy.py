@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import opengate as gate
+import test019_linac_phsp_helpers as t
+import uproot
+import numpy as np
+
+paths = gate.get_default_test_paths(__file__, "gate_test019_linac_phsp")
+
+sim = t.init_test019(3)
+
+# same phsp, written as npy (one file per thread + index)
+phsp = sim.get_actor_user_info("PhaseSpace")
+phsp_npy = sim.add_actor("PhaseSpaceActor", "PhaseSpaceNpy")
+phsp_npy.mother = phsp.mother
+phsp_npy.attributes = phsp.attributes
+phsp_npy.filters = phsp.filters
+phsp_npy.output = paths.output / "test019_hits.npy"
+
+# start simulation
+output = sim.start()
+stats = output.get_actor("Stats")
+print(stats)
+
+# read the root and the npy shards
+root = uproot.open(paths.output / "test019_hits.root")["PhaseSpace"]
+root = root.arrays(library="numpy")
+index = gate.read_digi_collection_index(phsp_npy.output)
+print(f"Index: {index['format']} with {len(index['shards'])} shards")
+for shard in index["shards"]:
+    print(f"    {shard['filename']} {shard['rows']}")
+arrays = gate.read_digi_collection(phsp_npy.output)
+
+n = len(root["KineticEnergy"])
+is_ok = len(arrays["KineticEnergy"]) == n
+is_ok = is_ok and sum(s["rows"] for s in index["shards"]) == n
+gate.print_test(is_ok, f"Number of particles: {len(arrays['KineticEnergy'])} vs {n}")
+
+# the order may differ (threads), compare sorted values
+for k in ["KineticEnergy", "Weight"]:
+    b = np.allclose(np.sort(arrays[k]), np.sort(root[k]))
+    gate.print_test(b, f"Values of {k}")
+    is_ok = is_ok and b
+
+b = np.allclose(np.sort(arrays["PostPosition"][:, 2]), np.sort(root["PostPosition_Z"]))
+gate.print_test(b, f"Values of PostPosition (Nx3)")
+is_ok = is_ok and b
+
+names = np.unique(arrays["ParticleName"].astype(str))
+b = list(names) == list(np.unique(root["ParticleName"].astype(str)))
+gate.print_test(b, f"Values of ParticleName {names}")
+is_ok = is_ok and b
+
+gate.test_ok(is_ok)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from test029_volume_time_rotation_helpers import *
+import itk
+import numpy as np
+
+paths = gate.get_default_test_paths(__file__, "gate_test029_volume_time_rotation")
+
+# create the main simulation object
+sim = gate.Simulation()
+
+# create sim without AA, in MT
+create_simulation(sim, False)
+sim.user_info.number_of_threads = 2
+
+# second projection, one image per run
+proj = sim.get_actor_user_info("Projection")
+proj_run = sim.add_actor("HitsProjectionActor", "ProjectionPerRun")
+proj_run.mother = proj.mother
+proj_run.input_digi_collections = proj.input_digi_collections
+proj_run.spacing = proj.spacing
+proj_run.size = proj.size
+proj_run.origin_as_image_center = False
+proj_run.output_per_run = True
+# (another image format: the run suffix is inserted before the extension)
+proj_run.output = paths.output / "proj029_per_run.mha"
+
+# initialize & start
+output = sim.start()
+
+# the images of each run must be the slices of the stacked projection
+gate.warning("Compare per run images with the stacked image")
+img = itk.imread(str(paths.output / "proj029.mhd"))
+arr = itk.array_view_from_image(img)
+n = len(proj.input_digi_collections)
+is_ok = True
+for i in range(len(sim.run_timing_intervals)):
+    f = paths.output / f"proj029_per_run_run{i}.mha"
+    run_arr = itk.array_view_from_image(itk.imread(str(f)))
+    ok = np.array_equal(run_arr, arr[i * n : (i + 1) * n])
+    gate.print_test(ok, f"Run {i}: {f} counts = {run_arr.sum():.0f}")
+    is_ok = ok and is_ok
+
+gate.test_ok(is_ok)
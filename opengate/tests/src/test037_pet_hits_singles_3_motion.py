@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from test037_pet_hits_singles_helpers import *
+from scipy.spatial.transform import Rotation
+import uproot
+import numpy as np
+
+paths = gate.get_default_test_paths(__file__, "gate_test037_pet")
+
+"""
+The PET rotates between the runs (MotionVolumeActor). The readout must use the
+crystal centers of the current position of the PET, for both ways of finding
+the crystal: by navigation (group volume above the crystal, like the initial
+readout for all digi) or with the volume ID (group volume = crystal).
+"""
+
+# create the simulation
+sim = gate.Simulation()
+crystal = create_pet_simulation(sim, paths)
+stack = sim.get_volume_user_info("pet_stack")
+mm = gate.g4_units("mm")
+sec = gate.g4_units("second")
+output_file = paths.output / "test037_test3_motion.root"
+
+# digitizer hits
+hc = sim.add_actor("DigitizerHitsCollectionActor", "Hits")
+hc.mother = crystal.name
+hc.output = ""
+hc.attributes = [
+    "PostPosition",
+    "TotalEnergyDeposit",
+    "PreStepUniqueVolumeID",
+    "GlobalTime",
+    "RunID",
+]
+
+# Readout with navigation (reference)
+sc = sim.add_actor("DigitizerReadoutActor", "SinglesNav")
+sc.output = output_file
+sc.input_digi_collection = "Hits"
+sc.group_volume = stack.name
+sc.discretize_volume = crystal.name
+sc.policy = "EnergyWeightedCentroidPosition"
+
+# Readout with the volume ID of the crystal
+sc = sim.add_actor("DigitizerReadoutActor", "SinglesID")
+sc.output = output_file
+sc.input_digi_collection = "Hits"
+sc.group_volume = crystal.name
+sc.discretize_volume = crystal.name
+sc.policy = "EnergyWeightedCentroidPosition"
+
+# Adder with the same group: same singles than SinglesID, not discretized
+sc = sim.add_actor("DigitizerAdderActor", "SinglesAdder")
+sc.output = output_file
+sc.input_digi_collection = "Hits"
+sc.group_volume = crystal.name
+sc.policy = "EnergyWeightedCentroidPosition"
+
+# rotation of the PET between the runs
+motion = sim.add_actor("MotionVolumeActor", "Move")
+motion.mother = "pet"
+motion.translations = []
+motion.rotations = []
+sim.run_timing_intervals = []
+n = 3
+for r in range(n):
+    rot = Rotation.from_euler("z", 20 * r, degrees=True)
+    motion.translations.append([0, 0, 0])
+    motion.rotations.append(gate.rot_np_as_g4(rot.as_matrix()))
+    sim.run_timing_intervals.append([r * 0.00002 * sec, (r + 1) * 0.00002 * sec])
+
+# start simulation
+output = sim.start()
+
+# print results
+stats = output.get_actor("Stats")
+print(stats)
+
+# ----------------------------------------------------------------------------------------------------------
+f = uproot.open(output_file)
+
+
+def read_singles(name):
+    s = f[name].arrays(library="numpy")
+    pos = np.stack([s[f"PostPosition_{a}"] for a in "XYZ"], axis=1)
+    return pos, s["RunID"]
+
+
+pos_nav, run_nav = read_singles("SinglesNav")
+pos_id, run_id = read_singles("SinglesID")
+pos_adder, run_adder = read_singles("SinglesAdder")
+
+# the discretized position is in the same crystal than the centroid
+is_ok = len(pos_id) == len(pos_adder) and len(pos_id) > 0
+gate.print_test(is_ok, f"Same number of singles ID/adder: {len(pos_id)}")
+half_diagonal = np.linalg.norm(np.array(crystal.size) / 2) + 0.01 * mm
+for r in range(n):
+    m = run_id == r
+    d = np.linalg.norm(pos_id[m] - pos_adder[m], axis=1)
+    b = np.all(d <= half_diagonal)
+    gate.print_test(
+        b,
+        f"Run {r}: max distance to the centroid {np.max(d):.2f} mm (max {half_diagonal:.2f})",
+    )
+    is_ok = b and is_ok
+
+    # the crystal centers are the same with navigation and volume ID
+    centers_nav = {tuple(np.round(p, 3)) for p in pos_nav[run_nav == r]}
+    centers_id = {tuple(np.round(p, 3)) for p in pos_id[m]}
+    common = len(centers_nav & centers_id) / len(centers_nav)
+    b = common > 0.9
+    gate.print_test(b, f"Run {r}: {common * 100:.1f}% of common crystal centers")
+    is_ok = b and is_ok
+
+gate.test_ok(is_ok)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from test043_garf_helpers import *
+import itk
+import numpy as np
+import opengate.contrib.spect_ge_nm670 as gate_spect
+
+
+def compare_backends(pth_filename, onnx_filename, image_size=(128, 128), n=10000):
+    """
+    Apply the torch (garf) and onnx backends to the same inputs, compare the
+    predicted weights and the images (all slices, the first one included)
+    """
+    garf = gate.import_garf()
+    onnx = gate.ARFOnnxBackend()
+    nn, model = garf.load_nn(str(pth_filename), gpu=False, verbose=False)
+    nn_onnx, model_onnx = onnx.load_nn(onnx_filename)
+    model_data = nn["model_data"]
+    nb_ene = int(model_data["n_ene_win"])
+
+    # random inputs (two angles and energy) around the training data
+    rng = np.random.default_rng(123)
+    x_mean = np.asarray(model_data["x_mean"]).ravel()
+    x_std = np.asarray(model_data["x_std"]).ravel()
+    x = x_mean + x_std * rng.standard_normal((n, 3))
+
+    w = garf.nn_predict(model, model_data, x)
+    w_onnx = onnx.nn_predict(model_onnx, nn_onnx["model_data"], x)
+    b = np.allclose(w, w_onnx, rtol=1e-4, atol=1e-6)
+    d = np.max(np.abs(w - w_onnx))
+    gate.print_test(b, f"Compare nn_predict torch/onnx: max diff {d:.2e}")
+    is_ok = b
+
+    # same hits (with several hits in the same pixel) for the two images
+    size = [nb_ene, image_size[0], image_size[1]]
+    u = rng.integers(0, image_size[1] // 4, n)
+    v = rng.integers(0, image_size[0] // 4, n)
+    img_onnx = onnx.image_from_coordinates(np.zeros(size), u, v, w)
+    if hasattr(garf, "image_from_coordinates_add_numpy"):
+        img = np.zeros(size)
+        garf.image_from_coordinates_add_numpy(img, u, v, w, hit_slice=True)
+    else:
+        # older garf counts the hits once per energy window in the first slice
+        img = garf.image_from_coordinates(np.zeros(size), u, v, w)
+        img[0] /= nb_ene - 1
+    for i in range(nb_ene):
+        b = np.allclose(img[i], img_onnx[i])
+        gate.print_test(
+            b,
+            f"Compare image slice {i} torch/onnx: {np.sum(img[i]):.2f} {np.sum(img_onnx[i]):.2f}",
+        )
+        is_ok = b and is_ok
+    b = np.sum(img_onnx[0]) == n
+    gate.print_test(b, f"First slice is the number of hits: {np.sum(img_onnx[0])} {n}")
+    return b and is_ok
+
+
+# create the simulation
+sim = gate.Simulation()
+
+# main options
+ui = sim.user_info
+ui.g4_verbose = False
+ui.g4_verbose_level = 1
+ui.number_of_threads = 1
+ui.visu = False
+ui.random_seed = 321654987
+
+# activity
+activity = 1e6 * Bq / ui.number_of_threads
+
+# add a material database
+sim.add_material_database(paths.gate_data / "GateMaterials.db")
+
+# init world
+sim_set_world(sim)
+
+# fake spect head
+head = gate_spect.add_ge_nm67_fake_spect_head(sim, "spect")
+head.translation = [0, 0, -15 * cm]
+
+# detector input plane (+ 1nm to avoid overlap)
+pos, crystal_dist, psd = gate_spect.get_plane_position_and_distance_to_crystal("lehr")
+pos += 1 * nm
+print(f"plane position     {pos / mm} mm")
+print(f"crystal distance   {crystal_dist / mm} mm")
+detPlane = sim_add_detector_plane(sim, head.name, pos)
+
+# physics
+sim_phys(sim)
+
+# sources
+sim_source_test(sim, activity)
+
+# arf actor
+arf = sim.add_actor("ARFActor", "arf")
+arf.mother = detPlane.name
+arf.output = paths.output / "test043_projection_garf_onnx.mhd"
+arf.batch_size = 2e5
+arf.image_size = [128, 128]
+arf.image_spacing = [4.41806 * mm, 4.41806 * mm]
+arf.verbose_batch = True
+arf.distance_to_crystal = crystal_dist  # 74.625 * mm
+arf.distance_to_crystal = 74.625 * mm
+# export the network to onnx (needs torch), then run it with onnxruntime
+pth_filename = paths.gate_data / "pth" / "arf_Tc99m_v3.pth"
+arf.pth_filename = gate.export_arf_to_onnx(
+    pth_filename, paths.output / "arf_Tc99m_v3.onnx"
+)
+arf.nn_backend = "onnx"
+arf.onnx_threads = 2
+
+# add stat actor
+s = sim.add_actor("SimulationStatisticsActor", "stats")
+s.track_types_flag = True
+
+# start simulation
+output = sim.start()
+
+# print results at the end
+stat = output.get_actor("stats")
+print(stat)
+
+# print info
+print("")
+arf = output.get_actor("arf")
+img = itk.imread(str(arf.user_info.output))
+# the first channel is the number of hits, at least the sum of the other ones
+arr = itk.array_view_from_image(img)
+is_ok_hits = np.all(arr[0] == np.round(arr[0])) and np.all(
+    arr[0] >= np.sum(arr[1:], axis=0) - 1e-6
+)
+# set the first channel to the same channel (spectrum) than the analog
+img[0, :] = img[1, :] + img[2, :]
+print(f"Number of batch: {arf.batch_nb}")
+print(f"Number of detected particles: {arf.detected_particles}")
+filename1 = str(arf.user_info.output).replace(".mhd", "_0.mhd")
+itk.imwrite(img, filename1)
+
+# high stat
+filename2 = str(arf.user_info.output).replace(".mhd", "_hs.mhd")
+scale = 4e8 * Bq / activity
+print(f"Scaling ref = 4e8, activity = {activity}, scale = {scale}")
+img2 = gate.scale_itk_image(img, scale)
+itk.imwrite(img2, filename2)
+
+# ----------------------------------------------------------------------------------------------------------------
+# tests
+print()
+gate.warning("Compare the torch and onnx backends")
+is_ok = compare_backends(pth_filename, arf.user_info.pth_filename)
+gate.print_test(is_ok_hits, "First channel of the image is the number of hits")
+is_ok = is_ok_hits and is_ok
+
+print()
+gate.warning("Tests stats file")
+stats_ref = gate.read_stat_file(paths.gate_output / "stats_analog.txt")
+# dont compare steps of course
+stats_ref.counts.step_count = stat.counts.step_count
+is_ok = gate.assert_stats(stat, stats_ref, 0.01) and is_ok
+
+print()
+gate.warning("Compare image to analog")
+is_ok = (
+    gate.assert_images(
+        paths.output_ref / "test043_projection_analog.mhd",
+        filename1,
+        stat,
+        tolerance=100,
+        ignore_value=0,
+        axis="x",
+        sum_tolerance=20,
+    )
+    and is_ok
+)
+
+print()
+gate.warning("Compare image to analog high statistics")
+is_ok = (
+    gate.assert_images(
+        paths.output_ref / "test043_projection_analog_high_stat.mhd",
+        filename2,
+        stat,
+        tolerance=52,
+        ignore_value=0,
+        axis="x",
+    )
+    and is_ok
+)
+
+print()
+gate.warning("profile compare : ")
+p = paths.output_ref
+print(
+    f'garf_compare_image_profile {p / "test043_projection_analog.mhd"} {filename1} -w 3'
+)
+print(
+    f'garf_compare_image_profile {p / "test043_projection_analog.mhd"} {filename1} -w 3 -s 75'
+)
+print(
+    f'garf_compare_image_profile {p / "test043_projection_analog_high_stat.mhd"} {filename2} -w 3'
+)
+print(
+    f'garf_compare_image_profile {p / "test043_projection_analog_high_stat.mhd"} {filename2} -w 3 -s 75'
+)
+
+gate.delete_run_manager_if_needed(sim)
+gate.test_ok(is_ok)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from test049_pet_digit_blurring_helpers import *
+import numpy as np
+import uproot
+
+paths = gate.get_default_test_paths(__file__, "gate_test049_pet_blur")
+
+"""
+PET simulation with an online coincidence sorter (DigitizerCoincidenceSorterActor)
+The coincidences are compared to the ones obtained offline from the singles,
+in single thread and in multi-thread (singles of all threads sorted together).
+The rates of coincidences of the two simulations are then compared.
+"""
+
+# const
+ns = gate.g4_units("ns")
+mm = gate.g4_units("mm")
+
+
+def run_simulation(threads, name):
+    # create the simulation
+    sim = gate.Simulation()
+    create_simulation(sim, threads)
+    hc = sim.get_actor_user_info("Hits")
+    hc.output = paths.output / f"test049_pet_{name}.root"
+    sc = sim.get_actor_user_info("Singles")
+    sc.output = hc.output
+
+    # add the coincidence sorter
+    cc = sim.add_actor("DigitizerCoincidenceSorterActor", "Coincidences")
+    cc.output = paths.output / f"test049_coincidences_{name}.root"
+    cc.input_digi_collection = "Singles"
+    cc.window = 5 * ns
+    cc.delayed_window_offset = 500 * ns
+    cc.multiples_policy = "takeAllGoods"
+    cc.min_transaxial_distance = 10 * mm
+    # several merges of the singles of the threads during the run
+    cc.thread_buffer_size = 100
+    cc.attributes = ["GlobalTime", "TotalEnergyDeposit", "PostPosition"]
+
+    # start simulation (in a new process, two simulations are run)
+    output = sim.start(start_new_process=True)
+
+    # print results
+    stats = output.get_actor("Stats")
+    print(stats)
+    return sc, cc
+
+
+# ----------------------------------------------------------------------------------------------------------
+def sort_coincidences(t, pos, window, offset, min_dist):
+    # offline reference: windows opened by the first single not in a window
+    prompts = []
+    delayed = []
+    i = 0
+    while i < len(t):
+        n = np.searchsorted(t, t[i] + window, side="left")
+        for a in range(i, n):
+            for b in range(a + 1, n):
+                if np.linalg.norm(pos[a, :2] - pos[b, :2]) >= min_dist:
+                    prompts.append((a, b))
+        d1 = max(n, np.searchsorted(t, t[i] + offset, side="left"))
+        d2 = np.searchsorted(t, t[i] + offset + window, side="left")
+        for b in range(d1, d2):
+            if np.linalg.norm(pos[i, :2] - pos[b, :2]) >= min_dist:
+                delayed.append((i, b))
+        i = n
+    return prompts, delayed
+
+
+def check_coincidences(sc, cc, name):
+    print()
+    gate.warning(f"Check coincidences ({name})")
+    singles = uproot.open(sc.output)["Singles"].arrays(library="numpy")
+    order = np.argsort(singles["GlobalTime"], kind="stable")
+    t = singles["GlobalTime"][order]
+    pos = np.stack([singles[f"PostPosition_{a}"][order] for a in "XYZ"], axis=1)
+    ref_prompts, ref_delayed = sort_coincidences(
+        t, pos, cc.window, cc.delayed_window_offset, cc.min_transaxial_distance
+    )
+
+    f = uproot.open(cc.output)
+    prompts = f["Coincidences"].arrays(library="numpy")
+    delayed = f["Coincidences_delayed"].arrays(library="numpy")
+    n_prompts = len(prompts["GlobalTime1"])
+    n_delayed = len(delayed["GlobalTime1"])
+    print(f"Nb of singles       : {len(t)}")
+    print(f"Nb of prompts       : {n_prompts} (ref {len(ref_prompts)})")
+    print(f"Nb of delayed       : {n_delayed} (ref {len(ref_delayed)})")
+
+    is_ok = n_prompts > 0
+    is_ok = n_prompts == len(ref_prompts) and is_ok
+    is_ok = n_delayed == len(ref_delayed) and is_ok
+    gate.print_test(is_ok, "Same number of coincidences as offline")
+
+    # time difference within the window
+    dt = prompts["GlobalTime2"] - prompts["GlobalTime1"]
+    b = np.all((dt >= 0) & (dt < cc.window))
+    gate.print_test(b, f"Prompt time differences within the window: {np.max(dt)}")
+    is_ok = is_ok and b
+    dt = delayed["GlobalTime2"] - delayed["GlobalTime1"]
+    b = np.all(
+        (dt >= cc.delayed_window_offset) & (dt < cc.delayed_window_offset + cc.window)
+    )
+    gate.print_test(b, "Delayed time differences within the window")
+    is_ok = is_ok and b
+
+    # rates of coincidences per single
+    rates = [n_prompts / len(t), n_delayed / len(t)]
+    return is_ok, rates
+
+
+# single thread and multi-thread
+sc, cc = run_simulation(1, "st")
+is_ok, rates_st = check_coincidences(sc, cc, "single thread")
+sc, cc = run_simulation(4, "mt")
+b, rates_mt = check_coincidences(sc, cc, "multi-thread")
+is_ok = b and is_ok
+
+# the MT sorter gives the same coincidence rates (not the same particles)
+print()
+gate.warning("Compare single thread and multi-thread")
+for name, r_st, r_mt, tol in zip(
+    ["prompts", "delayed"], rates_st, rates_mt, [0.1, 0.2]
+):
+    diff = abs(r_mt - r_st) / r_st
+    b = diff < tol
+    gate.print_test(
+        b,
+        f"Nb of {name} per single: {r_st:.4f} {r_mt:.4f} -> {diff * 100:.1f}% (tol {tol * 100:.0f}%)",
+    )
+    is_ok = b and is_ok
+
+gate.test_ok(is_ok)
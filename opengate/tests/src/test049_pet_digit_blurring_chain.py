@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from test049_pet_digit_blurring_helpers import *
+
+paths = gate.get_default_test_paths(__file__, "gate_test049_pet_blur")
+
+"""
+Same as test049_pet_digit_blurring_v3, but the readout and the two blurring
+modules are fused in a single DigitizerChainActor (no intermediate digi
+collection).
+"""
+
+# create the simulation
+sim = gate.Simulation()
+create_simulation(sim, singles_name="Singles_readout")
+
+# const
+ns = gate.g4_units("ns")
+keV = gate.g4_units("keV")
+
+# replace the readout by a chain: readout + time blur + energy blur
+ro = sim.get_actor_user_info("Singles_readout")
+chain = sim.add_actor("DigitizerChainActor", "Singles")
+chain.output = ro.output
+chain.input_digi_collection = ro.input_digi_collection
+chain.stages = [
+    {
+        "type": "readout",
+        "group_volume": ro.group_volume,
+        "discretize_volume": ro.discretize_volume,
+        "policy": ro.policy,
+    },
+    {
+        "type": "blurring",
+        "blur_attribute": "GlobalTime",
+        "blur_method": "Gaussian",
+        "blur_fwhm": 100 * ns,
+    },
+    {
+        "type": "blurring",
+        "blur_attribute": "TotalEnergyDeposit",
+        "blur_method": "InverseSquare",
+        "blur_resolution": 0.18,
+        "blur_reference_value": 511 * keV,
+    },
+]
+
+# start simulation
+output = sim.start()
+
+# print results
+stats = output.get_actor("Stats")
+print(stats)
+
+# ----------------------------------------------------------------------------------------------------------
+readout = output.get_actor("Singles_readout")
+chain = output.get_actor("Singles")
+ig = readout.GetIgnoredHitsCount()
+ig_chain = chain.GetIgnoredHitsCount()
+print()
+print(f"Nb of ignored hits : {ig} (readout) {ig_chain} (chain)")
+
+# check stats
+print()
+gate.warning(f"Check stats")
+p = paths.gate_output
+stats_ref = gate.read_stat_file(p / "stats_blur.txt")
+is_ok = gate.assert_stats(stats, stats_ref, 0.025)
+
+# check root singles
+f = p / "pet_blur.root"
+bc = output.get_actor("Singles").user_info
+is_ok = (
+    check_root_singles(paths, 1, f, bc.output, png_output="test049_singles_chain.png")
+    and is_ok
+)
+
+# timing
+b = check_timing(f, bc.output)
+is_ok = is_ok and b
+
+gate.test_ok(is_ok)
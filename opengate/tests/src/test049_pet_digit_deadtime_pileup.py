@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from test049_pet_digit_blurring_helpers import *
+import numpy as np
+import uproot
+
+paths = gate.get_default_test_paths(__file__, "gate_test049_pet_blur")
+
+"""
+PET simulation with dead time (paralyzable and non paralyzable) and pile-up
+modules applied to the singles. The results are compared to the ones
+computed offline from the singles (sorted in time).
+"""
+
+# create the simulation
+sim = gate.Simulation()
+create_simulation(sim)
+
+# const
+ns = gate.g4_units("ns")
+
+# dead time and pile-up, per crystal
+output = paths.output / "test049_deadtime_pileup.root"
+dt1 = sim.add_actor("DigitizerDeadTimeActor", "Singles_deadtime")
+dt1.output = output
+dt1.input_digi_collection = "Singles"
+dt1.dead_time = 300 * ns
+dt1.mode = "nonparalyzable"
+
+dt2 = sim.add_actor("DigitizerDeadTimeActor", "Singles_deadtime_paralyzable")
+dt2.output = output
+dt2.input_digi_collection = "Singles"
+dt2.dead_time = 300 * ns
+dt2.mode = "paralyzable"
+
+pu = sim.add_actor("DigitizerPileupActor", "Singles_pileup")
+pu.output = output
+pu.input_digi_collection = "Singles"
+pu.pileup_time = 300 * ns
+
+# start simulation
+output = sim.start()
+
+# print results
+stats = output.get_actor("Stats")
+print(stats)
+
+
+# ----------------------------------------------------------------------------------------------------------
+def dead_time(t, vol, tau, paralyzable):
+    end = {}
+    accepted = 0
+    for ti, v in zip(t, vol):
+        e = end.get(v, -np.inf)
+        if ti < e:
+            if paralyzable:
+                end[v] = max(e, ti + tau)
+            continue
+        end[v] = ti + tau
+        accepted += 1
+    return accepted
+
+
+def pileup(t, vol, tau):
+    first = {}
+    n = 0
+    for ti, v in zip(t, vol):
+        if v not in first or ti - first[v] >= tau:
+            first[v] = ti
+            n += 1
+    return n
+
+
+singles = uproot.open(output.get_actor("Singles").user_info.output)["Singles"]
+singles = singles.arrays(library="numpy")
+order = np.argsort(singles["GlobalTime"], kind="stable")
+t = singles["GlobalTime"][order]
+vol = singles["PreStepUniqueVolumeID"][order]
+print(f"Nb of singles                  : {len(t)}")
+
+f = uproot.open(dt1.output)
+is_ok = True
+for a in [dt1, dt2]:
+    n = f[a.name].num_entries
+    ref = dead_time(t, vol, a.dead_time, a.mode == "paralyzable")
+    rejected = output.get_actor(a.name).GetRejectedDigisCount()
+    b = n == ref and n + rejected == len(t)
+    gate.print_test(b, f"Dead time {a.mode:15}: {n} (ref {ref}) rejected {rejected}")
+    is_ok = is_ok and b
+
+p = f[pu.name].arrays(library="numpy")
+ref = pileup(t, vol, pu.pileup_time)
+n = len(p["GlobalTime"])
+b = n == ref
+gate.print_test(b, f"Pile-up                        : {n} (ref {ref})")
+is_ok = is_ok and b
+e1 = np.sum(p["TotalEnergyDeposit"])
+e2 = np.sum(singles["TotalEnergyDeposit"])
+b = np.isclose(e1, e2)
+gate.print_test(b, f"Pile-up total energy           : {e1} (ref {e2})")
+is_ok = is_ok and b
+
+gate.test_ok(is_ok)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from test049_pet_digit_blurring_helpers import *
+import numpy as np
+import uproot
+
+paths = gate.get_default_test_paths(__file__, "gate_test049_pet_blur")
+
+"""
+PET simulation with energy windows (DigitizerEnergyWindowsActor) on the singles.
+The windows overlap or are adjacent, and their bounds are energies of singles
+of a first simulation (same seed), so that some singles are exactly on the
+bounds. The number of singles in each window is compared to the one computed
+with numpy (windows are [min, max[ ).
+"""
+
+
+def run_simulation(name, channels=None):
+    # create the simulation
+    sim = gate.Simulation()
+    create_simulation(sim)
+    hc = sim.get_actor_user_info("Hits")
+    hc.output = paths.output / f"test049_pet_{name}.root"
+    sc = sim.get_actor_user_info("Singles")
+    sc.output = hc.output
+
+    # add the energy windows
+    ew = None
+    if channels is not None:
+        ew = sim.add_actor("DigitizerEnergyWindowsActor", "EnergyWindows")
+        ew.output = paths.output / f"test049_energy_windows_{name}.root"
+        ew.input_digi_collection = "Singles"
+        ew.channels = channels
+
+    # start simulation (in a new process, two simulations are run)
+    output = sim.start(start_new_process=True)
+
+    # print results
+    stats = output.get_actor("Stats")
+    print(stats)
+    return sc, ew
+
+
+# first simulation: energies of the singles
+sc, _ = run_simulation("energy_windows_ref")
+edep = uproot.open(sc.output)["Singles"].arrays(library="numpy")["TotalEnergyDeposit"]
+e = np.unique(edep)
+bounds = [float(e[int(q * (len(e) - 1))]) for q in [0.1, 0.3, 0.5, 0.7, 0.9, 1.0]]
+
+# overlapping (w1/w2, w2/w3, w4/w5) and adjacent (w1/w3, w3/w4) windows.
+# w3 is within w2, w5 contains all singles from bounds[0], and the singles
+# with the largest energy are outside w4 (upper bound excluded)
+channels = [
+    {"name": "w1", "min": bounds[0], "max": bounds[2]},
+    {"name": "w2", "min": bounds[1], "max": bounds[4]},
+    {"name": "w3", "min": bounds[2], "max": bounds[3]},
+    {"name": "w4", "min": bounds[3], "max": bounds[5]},
+    {"name": "w5", "min": bounds[0], "max": 2 * bounds[5]},
+]
+
+# second simulation (same seed) with the energy windows
+sc, ew = run_simulation("energy_windows", channels)
+
+# reference per window
+print()
+gate.warning("Check the energy windows")
+edep = uproot.open(sc.output)["Singles"].arrays(library="numpy")["TotalEnergyDeposit"]
+on_bounds = np.isin(edep, bounds).sum()
+is_ok = on_bounds > 0
+gate.print_test(is_ok, f"Nb of singles exactly on the bounds: {on_bounds}")
+f = uproot.open(ew.output)
+for c in channels:
+    e = f[c["name"]].arrays(library="numpy")["TotalEnergyDeposit"]
+    ref = np.count_nonzero((edep >= c["min"]) & (edep < c["max"]))
+    b = len(e) == ref and np.all((e >= c["min"]) & (e < c["max"]))
+    gate.print_test(
+        b,
+        f"Window {c['name']} [{c['min']:.6f}, {c['max']:.6f}[ : {len(e)} (ref {ref})",
+    )
+    is_ok = b and is_ok
+
+gate.test_ok(is_ok)
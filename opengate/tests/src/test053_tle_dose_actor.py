@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import opengate as gate
+import itk
+import numpy as np
+
+paths = gate.get_default_test_paths(__file__, "")
+
+# create the simulation
+sim = gate.Simulation()
+
+# main options
+ui = sim.user_info
+ui.g4_verbose = False
+ui.g4_verbose_level = 1
+ui.visu = False
+ui.random_seed = 123456789
+
+# units
+m = gate.g4_units("m")
+cm = gate.g4_units("cm")
+mm = gate.g4_units("mm")
+keV = gate.g4_units("keV")
+Bq = gate.g4_units("Bq")
+
+#  change world size
+world = sim.world
+world.size = [1 * m, 1 * m, 1 * m]
+
+# waterbox with a bone slab
+waterbox = sim.add_volume("Box", "waterbox")
+waterbox.size = [20 * cm, 20 * cm, 20 * cm]
+waterbox.material = "G4_WATER"
+bone = sim.add_volume("Box", "bone")
+bone.mother = "waterbox"
+bone.size = [20 * cm, 20 * cm, 2 * cm]
+bone.translation = [0, 0, 3 * cm]
+bone.material = "G4_BONE_COMPACT_ICRU"
+
+# physics
+p = sim.get_physics_user_info()
+p.physics_list_name = "G4EmStandardPhysics_option4"
+p.enable_decay = False
+sim.set_cut("world", "all", 1 * mm)
+
+# low energy photons (like an isotope), isotropic point source
+source = sim.add_source("GenericSource", "mysource")
+source.particle = "gamma"
+source.energy.mono = 140 * keV
+source.position.type = "point"
+source.direction.type = "iso"
+source.activity = 100000 * Bq
+
+# analog dose
+dose = sim.add_actor("DoseActor", "dose")
+dose.output = paths.output / "test053-edep.mhd"
+dose.mother = "waterbox"
+dose.size = [40, 40, 40]
+dose.spacing = [5 * mm, 5 * mm, 5 * mm]
+dose.uncertainty = True
+dose.gray = True
+
+# TLE dose, same grid
+tle = sim.add_actor("TLEDoseActor", "tle")
+tle.output = paths.output / "test053-tle-edep.mhd"
+tle.mother = "waterbox"
+tle.size = dose.size
+tle.spacing = dose.spacing
+tle.uncertainty = True
+tle.gray = True
+
+# add stat actor
+s = sim.add_actor("SimulationStatisticsActor", "Stats")
+s.track_types_flag = True
+
+# start simulation
+output = sim.start(start_new_process=True)
+
+# print results at the end
+stat = output.get_actor("Stats")
+print(stat)
+
+# tests: same dose, with a lower uncertainty for TLE
+print("\nDifference for the dose")
+is_ok = gate.assert_images(
+    paths.output / "test053-edep_dose.mhd",
+    paths.output / "test053-tle-edep_dose.mhd",
+    stat,
+    tolerance=20,
+    ignore_value=0,
+    sum_tolerance=5,
+)
+
+print("\nMean uncertainty")
+unc = itk.array_view_from_image(
+    itk.imread(paths.output / "test053-edep_uncertainty.mhd")
+)
+tle_unc = itk.array_view_from_image(
+    itk.imread(paths.output / "test053-tle-edep_uncertainty.mhd")
+)
+u = np.mean(unc[unc < 1])
+tle_u = np.mean(tle_unc[tle_unc < 1])
+b = tle_u < u
+gate.print_test(b, f"Mean uncertainty analog = {u:.3f}  TLE = {tle_u:.3f}")
+is_ok = is_ok and b
+
+gate.test_ok(is_ok)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import opengate as gate
+import numpy as np
+
+paths = gate.get_default_test_paths(__file__, "")
+
+"""
+Merge digi files (npy shards, as written by several threads) into npy and
+root files, with and without sort, and merge root files.
+The merge uses a pool of processes: the test must be run as a script (main).
+"""
+
+
+def create_shards():
+    # create some fake shards (as written by several threads)
+    rng = np.random.default_rng(123)
+    dtype = [
+        ("GlobalTime", "<f8"),
+        ("EventID", "<i4"),
+        ("PostPosition", "<f8", (3,)),
+        ("ParticleName", "S64"),
+    ]
+    shards = []
+    for i in range(4):
+        n = 5000 + 1000 * i
+        a = np.zeros(n, dtype=dtype)
+        a["GlobalTime"] = rng.uniform(0, 10, n)
+        a["EventID"] = rng.integers(0, 1000, n)
+        a["PostPosition"] = rng.normal(0, 1, (n, 3))
+        a["ParticleName"] = b"gamma"
+        f = paths.output / f"test054_shard_{i}.npy"
+        np.save(f, a)
+        shards.append(f)
+    return shards
+
+
+def read_root(filename):
+    # root tree as a dict of arrays, 3D vectors are stacked again
+    import uproot
+
+    with uproot.open(filename) as f:
+        a = f["digi"].arrays(library="np")
+    a["PostPosition"] = np.stack([a.pop(f"PostPosition_{x}") for x in "XYZ"], axis=1)
+    return a
+
+
+def same_as_root(a, ref):
+    b = len(a["GlobalTime"]) == len(ref)
+    for k in ["GlobalTime", "EventID", "PostPosition"]:
+        b = b and np.array_equal(a[k], ref[k])
+    names = np.array(a["ParticleName"], dtype="S64")
+    return b and np.array_equal(names, ref["ParticleName"])
+
+
+def same_as_flat(merged, ref):
+    # the 3D vectors read from a root file are split in _X _Y _Z attributes
+    b = len(merged) == len(ref)
+    for k in ["GlobalTime", "EventID", "ParticleName"]:
+        b = b and np.array_equal(merged[k], ref[k])
+    for j, x in enumerate("XYZ"):
+        b = b and np.array_equal(merged[f"PostPosition_{x}"], ref["PostPosition"][:, j])
+    return b
+
+
+def main():
+    shards = create_shards()
+    ref = np.concatenate([np.load(f) for f in shards])
+    ref_sorted = ref[np.argsort(ref["GlobalTime"], kind="stable")]
+
+    # merge (small chunks to test the streaming)
+    output = paths.output / "test054_merged.npy"
+    n = gate.merge_digi_files(shards, output, chunk_size=3000, processes=2)
+    merged = np.load(output)
+    is_ok = n == len(ref) and np.array_equal(merged, ref)
+    gate.print_test(is_ok, f"Merged without sort: {n} rows")
+
+    # merge and sort by time (external merge sort)
+    output = paths.output / "test054_merged_sorted.npy"
+    n = gate.merge_digi_files(
+        shards, output, sort_key="GlobalTime", chunk_size=3000, processes=2
+    )
+    merged = np.load(output)
+    b = n == len(ref) and np.all(np.diff(merged["GlobalTime"]) >= 0)
+    gate.print_test(b, f"Merged and sorted by GlobalTime: {n} rows")
+    is_ok = is_ok and b
+    b = np.array_equal(merged, ref_sorted)
+    gate.print_test(b, "Same values as the sorted reference")
+    is_ok = is_ok and b
+
+    # sort by EventID (many equal keys)
+    output = paths.output / "test054_merged_sorted_event.npy"
+    gate.merge_digi_files(shards, output, sort_key="EventID", chunk_size=2000)
+    merged = np.load(output)
+    b = np.all(np.diff(merged["EventID"]) >= 0)
+    b = b and np.allclose(np.sort(merged["GlobalTime"]), np.sort(ref["GlobalTime"]))
+    gate.print_test(b, "Merged and sorted by EventID")
+    is_ok = is_ok and b
+
+    # root output (streamed, several chunks)
+    root_output = paths.output / "test054_merged.root"
+    n = gate.merge_digi_files(shards, root_output, chunk_size=3000, processes=2)
+    b = n == len(ref) and same_as_root(read_root(root_output), ref)
+    gate.print_test(b, f"Merged into a root file: {n} rows")
+    is_ok = is_ok and b
+
+    root_sorted = paths.output / "test054_merged_sorted.root"
+    n = gate.merge_digi_files(
+        shards, root_sorted, sort_key="GlobalTime", chunk_size=3000, processes=2
+    )
+    b = n == len(ref) and same_as_root(read_root(root_sorted), ref_sorted)
+    gate.print_test(b, f"Merged and sorted into a root file: {n} rows")
+    is_ok = is_ok and b
+
+    # root inputs (the two root files above), into npy and root
+    output = paths.output / "test054_merged_from_root.npy"
+    n = gate.merge_digi_files(
+        [root_output, root_sorted], output, chunk_size=4000, processes=2
+    )
+    merged = np.load(output)
+    b = n == 2 * len(ref)
+    b = b and same_as_flat(merged[: len(ref)], ref)
+    b = b and same_as_flat(merged[len(ref) :], ref_sorted)
+    gate.print_test(b, f"Merged root files into npy: {n} rows")
+    is_ok = is_ok and b
+
+    output = paths.output / "test054_merged_from_root_sorted.root"
+    n = gate.merge_digi_files(
+        [root_output], output, sort_key="GlobalTime", chunk_size=4000, processes=2
+    )
+    b = n == len(ref) and same_as_root(read_root(output), ref_sorted)
+    gate.print_test(b, f"Merged and sorted root file into root: {n} rows")
+    is_ok = is_ok and b
+
+    gate.test_ok(is_ok)
+
+
+if __name__ == "__main__":
+    main()
@@ -61,5 +61,7 @@ setuptools.setup(
         "opengate/bin/split_spect_projections",
         "opengate/bin/voxelize_iec_phantom",
         "opengate/bin/opengate_visu",
+        "opengate/bin/opengate_merge_digi",
+        "opengate/bin/opengate_export_onnx",
     ],
 )